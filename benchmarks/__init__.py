@@ -0,0 +1,2 @@
+""" Benchmark scripts, run from the project root as python -m benchmarks.<name>
+"""
@@ -0,0 +1,52 @@
+""" Back to back rank commands: one cli.py process each vs one batch
+
+Runs against the database in DB_CONNECTION, which should already be loaded.
+
+Usage: python -m benchmarks.bench_batch [--commands N]
+"""
+import argparse
+import subprocess
+import sys
+
+from benchmarks import common
+
+
+#: Commands cycled through
+COMMANDS = ('rank-genre 10', 'rank-personnel 10', 'rank-personnel 100')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=30)
+    args = parser.parse_args()
+
+    commands = [
+        COMMANDS[i % len(COMMANDS)] for i in range(args.commands)
+    ]
+
+    with common.Timer() as process_timer:
+        for command in commands:
+            subprocess.run(
+                [sys.executable, 'cli.py'] + command.split(),
+                stdout=subprocess.DEVNULL, check=True
+            )
+
+    with common.Timer() as batch_timer:
+        subprocess.run(
+            [sys.executable, 'cli.py', 'batch', '-'],
+            input='\n'.join(commands), universal_newlines=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+
+    print('Mode\t\tSeconds\tCommands/sec')
+    print('----\t\t-------\t------------')
+    for name, timer in (
+            ('per process', process_timer), ('batch', batch_timer)
+    ):
+        print('%s\t%.3f\t%.1f' % (
+            name.ljust(11), timer.elapsed, args.commands / timer.elapsed
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+""" Query cache: uncached queries vs memory and disk cache hits
+
+Runs against the database in DB_CONNECTION, which should already be loaded.
+
+Usage: python -m benchmarks.bench_cache [--repeat N]
+"""
+import argparse
+import logging
+import os
+
+import src.controller.cache
+import src.controller.movie
+import src.controller.stats
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+#: Queries timed, as (name, action class, query kwargs)
+QUERIES = (
+    ('genre', src.controller.stats.GenreProfit, {}),
+    ('person', src.controller.stats.PersonProfit, {}),
+    ('person top 10', src.controller.stats.PersonProfit, {'limit': 10}),
+    ('movie', src.controller.movie.FindMovies, {'movie_title': 'avatar'}),
+)
+
+
+def use_cache(mode: str, directory: str):
+    """ Switches default cache to mode, with empty memory tier """
+    os.environ['QUERY_CACHE'] = mode
+    os.environ['QUERY_CACHE_DIR'] = directory
+    src.controller.cache.reset_default_cache()
+
+
+def time_query(action_class, kwargs, repeat: int) -> float:
+    """ Returns mean milliseconds of a query over repeated calls """
+    with common.Timer() as timer:
+        for _ in range(repeat):
+            action_class(logger).query(**kwargs)
+    return 1000 * timer.elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print('%-14s\tUncached ms\tMemory hit ms\tDisk hit ms' % 'Query')
+    print('%-14s\t-----------\t-------------\t-----------' % '-----')
+    with common.temp_directory() as directory:
+        for name, action_class, kwargs in QUERIES:
+            use_cache('off', directory)
+            uncached = time_query(action_class, kwargs, args.repeat)
+
+            use_cache('memory', directory)
+            expected = action_class(logger).query(**kwargs)
+            memory_hit = time_query(action_class, kwargs, args.repeat)
+
+            # Fill disk tier, then time reads with memory tier dropped
+            use_cache('disk', directory)
+            action_class(logger).query(**kwargs)
+            with common.Timer() as timer:
+                for _ in range(args.repeat):
+                    src.controller.cache.reset_default_cache()
+                    result = action_class(logger).query(**kwargs)
+            disk_hit = 1000 * timer.elapsed / args.repeat
+            if result != expected:
+                raise ValueError('Cached %s results differ' % name)
+
+            print('%-14s\t%.3f\t\t%.3f\t\t%.3f' % (
+                name, uncached, memory_hit, disk_hit
+            ))
+
+
+if __name__ == '__main__':
+    main()
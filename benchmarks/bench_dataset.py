@@ -0,0 +1,119 @@
+""" Dataset loading time and memory: inferred dtypes vs pinned schema vs
+the parsed dataset cache
+
+Builds a scaled-up copy of the dataset by repeating its records, then loads
+it with the old bare read_csv loader, with load_df_from_dataset without the
+dataset cache, and with it: first filling a fresh cache, then reading it.
+
+Usage: python -m benchmarks.bench_dataset [file name] [--scale N]
+"""
+import argparse
+import logging
+import os
+import shutil
+import tracemalloc
+
+import pandas as pd
+
+import src.utils
+from benchmarks import common
+
+
+def load_df_inferred(file_name: str) -> pd.DataFrame:
+    """ Old loader: every column with inferred dtypes, then drops records
+    with entries in the trailing unnamed column
+    """
+    df = pd.read_csv(file_name)
+    bad_columns = [
+        column for column in df.columns
+        if column.startswith('Unnamed:') and not column.endswith(' 0')
+    ]
+    for bad_column_name in bad_columns[-1:]:
+        df = df.drop(df[df[bad_column_name].notna()].index)
+        df = df.drop(columns=[bad_column_name])
+    return df
+
+
+def load_df_pinned(file_name: str) -> pd.DataFrame:
+    """ Parses csv with pinned schema, without the dataset cache """
+    os.environ['DATASET_CACHE'] = 'off'
+    try:
+        return src.utils.load_df_from_dataset(file_name)
+    finally:
+        os.environ['DATASET_CACHE'] = 'on'
+
+
+def write_scaled_copy(file_name: str, directory: str, scale: int) -> str:
+    """ Writes copy of dataset with its records repeated scale times """
+    with open(file_name, encoding='utf-8') as in_file:
+        header = in_file.readline()
+        body = in_file.read()
+    if not body.endswith('\n'):
+        body += '\n'
+
+    scaled_name = os.path.join(directory, 'scaled.csv')
+    with open(scaled_name, 'w', encoding='utf-8') as out_file:
+        out_file.write(header)
+        for _ in range(scale):
+            out_file.write(body)
+    return scaled_name
+
+
+def measure(load, file_name, reset=None):
+    """ Returns seconds, peak traced MB, and frame MB of a load
+
+    Time and memory are measured in separate loads, as tracing slows
+    allocation heavy loaders down more than others.
+
+    :param reset: Optional function called before each load
+    """
+    if reset is not None:
+        reset()
+    with common.Timer() as timer:
+        load(file_name)
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    df = load(file_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_size = df.memory_usage(deep=True).sum()
+    return timer.elapsed, peak / 1e6, frame_size / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'file_name', nargs='?',
+        default=src.utils.get_default_dataset_filename()
+    )
+    parser.add_argument('--scale', type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with common.temp_directory() as directory:
+        scaled_name = write_scaled_copy(args.file_name, directory, args.scale)
+        cache_dir = os.path.join(directory, 'cache')
+        os.environ['DATASET_CACHE'] = 'on'
+        os.environ['DATASET_CACHE_DIR'] = cache_dir
+
+        def clear_cache():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        loaders = (
+            ('inferred', load_df_inferred, None),
+            ('pinned', load_df_pinned, None),
+            ('cache miss', src.utils.load_df_from_dataset, clear_cache),
+            ('cache hit', src.utils.load_df_from_dataset, None),
+        )
+        print('Loader\t\tSeconds\tPeak MB\tFrame MB')
+        print('------\t\t-------\t-------\t--------')
+        for name, load, reset in loaders:
+            print('%-10s\t%.3f\t%.1f\t%.1f' % (
+                (name, ) + measure(load, scaled_name, reset)
+            ))
+
+
+if __name__ == '__main__':
+    main()
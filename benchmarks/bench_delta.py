@@ -0,0 +1,126 @@
+""" Incremental load cost: full reload vs delta load of a file with churn
+
+Builds a scaled-up copy of the dataset whose repeated records get distinct
+titles, loads it into a fresh database, then writes a copy of it with
+--churn percent of its records changed. Times loading that copy into
+copies of the database with load-data --full and with a delta load, and a
+second delta load of the same file, which should be skipped.
+
+Loads run as `cli.py load-data` processes, with the dataset cache off.
+
+Usage: python -m benchmarks.bench_delta [file name] [--scale N] [--churn P]
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import src.utils
+from benchmarks import common
+
+
+def write_distinct_copy(file_name: str, out_name: str, scale: int):
+    """ Writes copy of dataset with records repeated scale times, titles of
+    each repeat suffixed with its number
+    """
+    with open(file_name, encoding='utf-8', newline='') as in_file:
+        rows = list(csv.reader(in_file))
+    header, records = rows[0], rows[1:]
+    title_column = header.index('movie_title')
+
+    with open(out_name, 'w', encoding='utf-8', newline='') as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(header)
+        for repeat in range(scale):
+            for record in records:
+                record = list(record)
+                if repeat and title_column < len(record):
+                    record[title_column] = '%s (%s)' % (
+                        record[title_column].strip(), repeat
+                    )
+                writer.writerow(record)
+
+
+def write_churned_copy(file_name: str, out_name: str, churn: float) -> int:
+    """ Writes copy of dataset with churn percent of records' imdb scores
+    changed
+
+    :return: Number of changed records
+    """
+    with open(file_name, encoding='utf-8', newline='') as in_file:
+        rows = list(csv.reader(in_file))
+    header, records = rows[0], rows[1:]
+    score_column = header.index('imdb_score')
+
+    changed_ids = random.Random(0).sample(
+        range(len(records)), int(len(records) * churn / 100)
+    )
+    for record_id in changed_ids:
+        records[record_id][score_column] = '%.1f' % (
+            float(records[record_id][score_column] or 0) + 0.1
+        )
+
+    with open(out_name, 'w', encoding='utf-8', newline='') as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(header)
+        writer.writerows(records)
+    return len(changed_ids)
+
+
+def run_load(db_url: str, file_name: str, *options: str) -> float:
+    """ Runs load-data in a process, returns its seconds """
+    env = dict(os.environ, DB_CONNECTION=db_url, DATASET_CACHE='off')
+    with common.Timer() as timer:
+        subprocess.run(
+            [sys.executable, 'cli.py', 'load-data'] + list(options)
+            + [file_name],
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+    return timer.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'file_name', nargs='?',
+        default=src.utils.get_default_dataset_filename()
+    )
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--churn', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with common.temp_directory() as directory:
+        base_name = os.path.join(directory, 'base.csv')
+        churned_name = os.path.join(directory, 'churned.csv')
+        write_distinct_copy(args.file_name, base_name, args.scale)
+        num_changed = write_churned_copy(base_name, churned_name, args.churn)
+
+        base_url = common.get_temp_db_url(directory, 'base')
+        initial_time = run_load(base_url, base_name)
+
+        db_urls = {}
+        for name in ('full', 'delta'):
+            shutil.copy(
+                os.path.join(directory, 'base.sqlite'),
+                os.path.join(directory, name + '.sqlite')
+            )
+            db_urls[name] = common.get_temp_db_url(directory, name)
+
+        print('%s changed records' % num_changed)
+        print('Load\t\t\tSeconds')
+        print('----\t\t\t-------')
+        print('initial\t\t\t%.3f' % initial_time)
+        print('full reload\t\t%.3f' % run_load(
+            db_urls['full'], churned_name, '--full'
+        ))
+        print('delta\t\t\t%.3f' % run_load(db_urls['delta'], churned_name))
+        print('unchanged file\t\t%.3f' % run_load(
+            db_urls['delta'], churned_name
+        ))
+
+
+if __name__ == '__main__':
+    main()
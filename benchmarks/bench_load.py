@@ -0,0 +1,75 @@
+""" Movie record load throughput: per-row AddMovie vs BulkAddMovies
+
+Usage: python -m benchmarks.bench_load [file name] [--rows N] [--batch-size N]
+"""
+import argparse
+import logging
+
+import src.controller.movie
+import src.utils
+from src.view import ingest
+from src.view.cli import load_data
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_per_row(session, movie_rows):
+    """ Writes movies the old way, one AddMovie action per row """
+    action = src.controller.movie.AddMovie(
+        logger=logger, session=session, commit_enabled=False
+    )
+    for row in movie_rows:
+        kwargs = dict(row)
+        kwargs['color_pk'] = kwargs.pop('movie_color_pk')
+        action.execute(**kwargs)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'file_name', nargs='?',
+        default=src.utils.get_default_dataset_filename()
+    )
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument(
+        '--batch-size', type=int,
+        default=src.controller.movie.DEFAULT_BATCH_SIZE
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    data = src.utils.load_df_from_dataset(args.file_name)
+    if args.rows is not None:
+        data = data.head(args.rows)
+    records = ingest.drop_duplicate_movies(ingest.normalize_records(data))
+    num_rows = len(records)
+
+    with common.temp_directory() as directory:
+        # Per-row path gets its movie rows prebuilt, so only writes are timed
+        session = common.make_temp_session(directory, 'per_row')
+        movie_rows = ingest.build_movie_rows(
+            records, load_data.process_category_fields(records, session)
+        )
+        with common.Timer() as per_row_timer:
+            run_per_row(session, movie_rows)
+
+        # Bulk path is timed including column-wise row building from records
+        session = common.make_temp_session(directory, 'bulk')
+        lookups = load_data.process_category_fields(records, session)
+        with common.Timer() as bulk_timer:
+            movie_rows = ingest.build_movie_rows(records, lookups)
+            src.controller.movie.BulkAddMovies(
+                logger=logger, session=session
+            ).execute(movie_rows=movie_rows, batch_size=args.batch_size)
+
+    print('Path\tSeconds\tRows/sec')
+    print('----\t-------\t--------')
+    for name, timer in (('per-row', per_row_timer), ('bulk', bulk_timer)):
+        print('%s\t%.3f\t%d' % (name, timer.elapsed, num_rows / timer.elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+""" Lookup indexes: dicts built from whole records vs sorted lookups built
+from streamed columns
+
+Builds a synthetic database of --movies movies (default 1M) and a fifth as
+many persons, then builds the person and movie lookup indexes both ways,
+timing them, and with tracemalloc on, measuring the peak memory taken while
+building and the memory the lookup keeps. Both are checked to have the same
+items.
+
+Usage: python -m benchmarks.bench_lookup [--movies N]
+"""
+import argparse
+import logging
+import os
+import tracemalloc
+
+import src.controller.movie
+import src.controller.person
+import src.model.db
+import src.model.movie
+import src.model.person
+from benchmarks import bench_memory_engine
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+
+def query_person_dict(session):
+    """ Old person lookup: dict of lower case name to pk, from records """
+    return {
+        record.name.lower(): record.pk
+        for record in session.query(src.model.person.Person).all()
+    }
+
+
+def query_movie_dict(session):
+    """ Old movie lookup: dict of (lower case title, year) to pk, from
+    records
+    """
+    return {
+        (record.movie_title.lower(), record.title_year): record.pk
+        for record in session.query(src.model.movie.Movie).all()
+    }
+
+
+def query_person_lookup(session):
+    return src.controller.person.PersonIndexLookup(
+        logger, session=session
+    ).query()
+
+
+def query_movie_lookup(session):
+    return src.controller.movie.MovieLookupIndex(
+        logger, session=session
+    ).query()
+
+
+def build(query):
+    """ Returns lookup built by query in a fresh session """
+    src.model.db.EngineWrapper.remove_session()
+    return query(src.model.db.EngineWrapper.get_session())
+
+
+def measure_memory(query):
+    """ Returns lookup built by query, the peak bytes traced while building
+    it and the bytes it keeps
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        lookup = build(query)
+        src.model.db.EngineWrapper.remove_session()
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return lookup, peak - before, kept - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=1000000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    cases = (
+        ('person', 'dict', query_person_dict),
+        ('person', 'sorted', query_person_lookup),
+        ('movie', 'dict', query_movie_dict),
+        ('movie', 'sorted', query_movie_lookup),
+    )
+
+    with common.temp_directory() as directory:
+        session = common.make_temp_session(directory, 'synthetic', 'bulk-load')
+        bench_memory_engine.make_synthetic_db(session, args.movies)
+        session.close()
+        session.get_bind().dispose()
+        os.environ['DB_CONNECTION'] = common.get_temp_db_url(
+            directory, 'synthetic'
+        )
+
+        print('Lookup\tBuild\tItems\tSeconds\tPeak MB\tKept MB')
+        print('------\t-----\t-----\t-------\t-------\t-------')
+        lookups = {}
+        for name, kind, query in cases:
+            with common.Timer() as timer:
+                lookup = build(query)
+            del lookup
+
+            lookup, peak, kept = measure_memory(query)
+            print('%s\t%s\t%s\t%.3f\t%.1f\t%.1f' % (
+                name, kind, len(lookup), timer.elapsed, peak / 1e6,
+                kept / 1e6
+            ))
+            lookups[name, kind] = dict(lookup.items())
+            del lookup
+
+        for name in ('person', 'movie'):
+            if lookups[name, 'dict'] != lookups[name, 'sorted']:
+                raise ValueError('%s lookups differ' % name)
+        src.model.db.EngineWrapper.remove_session()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+""" Profit rankings: SQL aggregation and summary tables vs the NumPy memory
+engine
+
+Builds a synthetic database of --movies movies (default 1M), with genres,
+actors and directors drawn at random and some directors also acting in
+their movies, then times:
+    sql aggregate: computing every group's profit with GROUP BY
+    sql summary: reading the precomputed summary tables, query cache off
+    memory load: loading the memory engine's arrays
+    memory rank: ranking from the loaded arrays
+
+Rankings of both engines are checked to match.
+
+Usage: python -m benchmarks.bench_memory_engine [--movies N] [--limit N]
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+import src.controller.memory_stats
+import src.controller.stats
+import src.controller.version
+import src.model.common
+import src.model.db
+import src.model.fields
+import src.model.movie
+import src.model.person
+from benchmarks import bench_stats
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+#: Rows per insert statement batch
+INSERT_CHUNK_SIZE = 50000
+
+
+def insert_rows(session, table, columns, rows):
+    """ Inserts rows, given as tuples of column values, in chunks """
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        session.execute(table.insert(), [
+            dict(zip(columns, row))
+            for row in rows[start:start+INSERT_CHUNK_SIZE]
+        ])
+
+
+def get_random_pairs(rng, num_movies, num_groups, per_movie):
+    """ Returns distinct (movie pk, group pk) pairs, up to per_movie for each
+    movie
+    """
+    movie_pks = np.repeat(np.arange(1, num_movies + 1), per_movie)
+    group_pks = rng.integers(1, num_groups + 1, len(movie_pks))
+    keys = np.unique(movie_pks * (num_groups + 1) + group_pks)
+    return keys // (num_groups + 1), keys % (num_groups + 1)
+
+
+def make_synthetic_db(session, num_movies: int, seed: int=0):
+    """ Fills empty database with random movies, refreshes its profit
+    summaries and bumps its data version
+    """
+    rng = np.random.default_rng(seed)
+    num_genres = 24
+    num_persons = max(num_movies // 5, 1)
+
+    insert_rows(
+        session, src.model.fields.Genre.__table__, ('pk', 'name'),
+        [(pk, 'genre %02d' % pk) for pk in range(1, num_genres + 1)]
+    )
+    insert_rows(
+        session, src.model.person.Person.__table__, ('pk', 'name'),
+        [(pk, 'person %07d' % pk) for pk in range(1, num_persons + 1)]
+    )
+
+    budgets = rng.lognormal(16, 1.5, num_movies).round()
+    grosses = (budgets * rng.lognormal(0, 1, num_movies)).round()
+    budgets[rng.random(num_movies) < 0.15] = np.nan
+    grosses[rng.random(num_movies) < 0.2] = np.nan
+    director_pks = rng.integers(1, num_persons + 1, num_movies)
+    directed = rng.random(num_movies) >= 0.05
+    years = rng.integers(1920, 2020, num_movies)
+    insert_rows(
+        session, src.model.movie.Movie.__table__,
+        ('pk', 'movie_title', 'title_year', 'budget', 'gross', 'director_pk'),
+        [
+            (
+                pk, 'movie %07d' % pk, str(year),
+                None if np.isnan(budget) else budget,
+                None if np.isnan(gross) else gross,
+                director_pk if has_director else None
+            )
+            for pk, year, budget, gross, director_pk, has_director in zip(
+                range(1, num_movies + 1), years.tolist(), budgets.tolist(),
+                grosses.tolist(), director_pks.tolist(), directed.tolist()
+            )
+        ]
+    )
+
+    movie_pks, genre_pks = get_random_pairs(rng, num_movies, num_genres, 3)
+    insert_rows(
+        session, src.model.common.movie_genres, ('movie_pk', 'genre_pk'),
+        list(zip(movie_pks.tolist(), genre_pks.tolist()))
+    )
+
+    # Some directors act in their own movies, who should count them once
+    movie_pks, actor_pks = get_random_pairs(rng, num_movies, num_persons, 3)
+    acting = np.flatnonzero(directed & (rng.random(num_movies) < 0.1))
+    keys = np.union1d(
+        movie_pks * (num_persons + 1) + actor_pks,
+        (acting + 1) * (num_persons + 1) + director_pks[acting]
+    )
+    insert_rows(
+        session, src.model.common.movie_actors, ('movie_pk', 'actor_pk'),
+        list(zip(
+            (keys // (num_persons + 1)).tolist(),
+            (keys % (num_persons + 1)).tolist()
+        ))
+    )
+
+    src.controller.stats.RefreshProfitSummaries(
+        logger, session=session, commit_enabled=False
+    ).execute()
+    src.controller.version.BumpDataVersion(
+        logger, session=session, commit_enabled=False
+    ).execute()
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ['QUERY_CACHE'] = 'off'
+
+    cases = (
+        (
+            'genre', src.controller.stats.get_genre_profit_select,
+            src.controller.stats.GenreProfit,
+            src.controller.memory_stats.MemoryGenreProfit
+        ),
+        (
+            'person', src.controller.stats.get_person_profit_select,
+            src.controller.stats.PersonProfit,
+            src.controller.memory_stats.MemoryPersonProfit
+        ),
+    )
+
+    with common.temp_directory() as directory:
+        session = common.make_temp_session(directory, 'synthetic', 'bulk-load')
+        with common.Timer() as timer:
+            make_synthetic_db(session, args.movies)
+        session.close()
+        session.get_bind().dispose()
+        print('%s movies built in %.1f seconds' % (args.movies, timer.elapsed))
+
+        os.environ['DB_CONNECTION'] = common.get_temp_db_url(
+            directory, 'synthetic'
+        )
+        session = src.model.db.EngineWrapper.get_session()
+
+        print('Query\tPath\t\tSeconds')
+        print('-----\t----\t\t-------')
+        with common.Timer() as timer:
+            src.controller.memory_stats.get_profit_arrays(
+                src.controller.memory_stats.MemoryGenreProfit(logger)
+            )
+        print('all\tmemory load\t%.3f' % timer.elapsed)
+
+        for name, get_select, sql_action, memory_action in cases:
+            with common.Timer() as timer:
+                session.execute(get_select()).fetchall()
+            print('%s\tsql aggregate\t%.3f' % (name, timer.elapsed))
+
+            for limit in (args.limit, None):
+                label = 'top %s' % limit if limit else 'all'
+                with common.Timer() as timer:
+                    sql_values = sql_action(logger).query(limit=limit)
+                print('%s\tsql summary %s\t%.3f' % (
+                    name, label, timer.elapsed
+                ))
+
+                with common.Timer() as timer:
+                    memory_values = memory_action(logger).query(limit=limit)
+                print('%s\tmemory %s\t%.3f' % (name, label, timer.elapsed))
+
+                if list(sql_values) != list(memory_values):
+                    raise ValueError('%s rankings differ' % name)
+            print('%s\tmax relative difference: %.2e' % (
+                name, bench_stats.max_difference(sql_values, memory_values)
+            ))
+
+        src.model.db.EngineWrapper.remove_session()
+
+
+if __name__ == '__main__':
+    main()
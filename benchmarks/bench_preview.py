@@ -0,0 +1,67 @@
+""" show-raw preview time: whole dataset load vs reading only the records
+shown
+
+Builds a scaled-up copy of the dataset by repeating its records, then
+times the old preview (load_df_from_dataset then head, without the dataset
+cache) against load_df_preview at the start and middle of the file, and
+load_df_tail_preview.
+
+Usage: python -m benchmarks.bench_preview [file name] [--scale N]
+    [--rows N]
+"""
+import argparse
+import logging
+import os
+
+import src.utils
+from benchmarks import bench_dataset
+from benchmarks import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'file_name', nargs='?',
+        default=src.utils.get_default_dataset_filename()
+    )
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ['DATASET_CACHE'] = 'off'
+
+    with common.temp_directory() as directory:
+        scaled_name = bench_dataset.write_scaled_copy(
+            args.file_name, directory, args.scale
+        )
+        with open(scaled_name, 'rb') as in_file:
+            num_records = sum(1 for _ in in_file) - 1
+
+        cases = (
+            ('whole load', lambda: src.utils.load_df_from_dataset(
+                scaled_name
+            ).head(args.rows)),
+            ('head', lambda: src.utils.load_df_preview(
+                scaled_name, args.rows
+            )),
+            ('middle', lambda: src.utils.load_df_preview(
+                scaled_name, args.rows, num_records // 2
+            )),
+            ('tail', lambda: src.utils.load_df_tail_preview(
+                scaled_name, args.rows
+            )),
+        )
+
+        print('%s records, %.1f MB' % (
+            num_records, os.path.getsize(scaled_name) / 1e6
+        ))
+        print('Preview\t\tSeconds\tRecords')
+        print('-------\t\t-------\t-------')
+        for name, preview in cases:
+            with common.Timer() as timer:
+                df = preview()
+            print('%-10s\t%.4f\t%s' % (name, timer.elapsed, len(df)))
+
+
+if __name__ == '__main__':
+    main()
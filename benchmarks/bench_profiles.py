@@ -0,0 +1,95 @@
+""" Load and read times of database engine profiles
+
+Loads the dataset into a fresh database with each write profile, then loads
+it again (matching existing movies, nothing to write), and times repeated
+rank queries against the loaded database with each read profile.
+
+Usage: python -m benchmarks.bench_profiles [file name] [--reads N]
+"""
+import argparse
+import contextlib
+import io
+import logging
+
+import sqlalchemy.orm
+
+import src.controller.movie
+import src.controller.stats
+import src.model.db
+import src.utils
+from src.view import ingest
+from src.view.cli import load_data
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+#: Profiles timed loading data
+WRITE_PROFILES = ('default', 'bulk-load')
+
+#: Profiles timed reading rankings
+READ_PROFILES = ('default', 'read')
+
+
+def time_load(session, records) -> float:
+    """ Returns seconds to load normalized records with session """
+    # Progress output of the load isn't part of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        with common.Timer() as timer:
+            load_data.load_chunk(
+                session, records, {}, src.controller.movie.DEFAULT_BATCH_SIZE
+            )
+    return timer.elapsed
+
+
+def time_reads(url: str, profile: str, num_reads: int) -> float:
+    """ Returns seconds to run genre and person rankings num_reads times """
+    engine = src.model.db.create_profile_engine(url, profile)
+    session_factory = sqlalchemy.orm.sessionmaker(bind=engine)
+    with common.Timer() as timer:
+        for _ in range(num_reads):
+            session = session_factory()
+            src.controller.stats.GenreProfit(logger, session=session).query()
+            src.controller.stats.PersonProfit(logger, session=session).query()
+            session.close()
+    engine.dispose()
+    return timer.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'file_name', nargs='?',
+        default=src.utils.get_default_dataset_filename()
+    )
+    parser.add_argument('--reads', type=int, default=50)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    records = ingest.normalize_records(
+        src.utils.load_df_from_dataset(args.file_name)
+    )
+
+    print('Profile\tLoad s\tReload s')
+    print('-------\t------\t--------')
+    with common.temp_directory() as directory:
+        for profile in WRITE_PROFILES:
+            session = common.make_temp_session(directory, profile, profile)
+            load_time = time_load(session, records)
+            reload_time = time_load(session, records)
+            session.close()
+            session.get_bind().dispose()
+            print('%s\t%.3f\t%.3f' % (profile, load_time, reload_time))
+
+        print('')
+        print('Profile\tRank s (x%s)' % args.reads)
+        print('-------\t-----------')
+        url = common.get_temp_db_url(directory, WRITE_PROFILES[-1])
+        for profile in READ_PROFILES:
+            print('%s\t%.3f' % (
+                profile, time_reads(url, profile, args.reads)
+            ))
+
+
+if __name__ == '__main__':
+    main()
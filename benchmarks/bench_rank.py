@@ -0,0 +1,96 @@
+""" Generic rankings: one aggregate query per ranking vs per-group loops
+
+Times rankings over a range of dimensions, metrics and aggregates with the
+query cache off, counting the statements each one runs, and compares a
+ranking of countries by median imdb_score against looping over each
+country's movies.
+
+Runs against the database in DB_CONNECTION, which should already be loaded.
+
+Usage: python -m benchmarks.bench_rank
+"""
+import collections
+import logging
+import os
+import statistics
+
+import src.controller.rank
+import src.model.db
+import src.model.fields
+from benchmarks import bench_stats
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+#: Rankings timed, as (dimension, metric, aggregate, min count)
+RANKINGS = (
+    ('genre', 'profit', 'avg', 1),
+    ('genre', 'roi', 'median', 1),
+    ('person', 'profit', 'avg', 1),
+    ('actor', 'imdb_score', 'avg', 5),
+    ('director', 'gross', 'sum', 1),
+    ('country', 'imdb_score', 'median', 20),
+    ('language', 'num_voted_users', 'avg', 1),
+    ('content_rating', 'duration', 'median', 1),
+    ('keyword', 'profit', 'count', 1),
+    ('year', 'imdb_score', 'avg', 1),
+)
+
+
+def country_median_score_per_record(session):
+    """ Median imdb_score of each country, lazy loading its movies """
+    country_values = {}
+    for country_record in session.query(src.model.fields.Country).all():
+        scores = [
+            movie.imdb_score for movie in country_record.movies
+            if movie.imdb_score is not None
+        ]
+        if len(scores) >= 20:
+            country_values[country_record.name] = statistics.median(scores)
+    return collections.OrderedDict(sorted(
+        country_values.items(), key=lambda item: (-item[1], item[0])
+    ))
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    os.environ['QUERY_CACHE'] = 'off'
+    counter = bench_stats.QueryCounter(src.model.db.EngineWrapper.get_engine())
+
+    print('Ranking\t\t\t\t\tSeconds\tStatements\tGroups')
+    print('-------\t\t\t\t\t-------\t----------\t------')
+    for dimension, metric, aggregate, min_count in RANKINGS:
+        src.model.db.EngineWrapper.remove_session()
+        counter.count = 0
+        with common.Timer() as timer:
+            values = src.controller.rank.GroupRank(logger).query(
+                dimension, metric, aggregate, min_count
+            )
+        print('%-40s%.3f\t%s\t\t%s' % (
+            '%s %s %s' % (dimension, aggregate, metric), timer.elapsed,
+            counter.count, len(values)
+        ))
+
+    src.model.db.EngineWrapper.remove_session()
+    counter.count = 0
+    with common.Timer() as timer:
+        old_values = country_median_score_per_record(
+            src.model.db.EngineWrapper.get_session()
+        )
+    print('%-40s%.3f\t%s\t\t%s' % (
+        'country median imdb_score, loop', timer.elapsed, counter.count,
+        len(old_values)
+    ))
+
+    new_values = src.controller.rank.GroupRank(logger).query(
+        'country', 'imdb_score', 'median', 20
+    )
+    print('country median imdb_score max relative difference: %.2e' % (
+        bench_stats.max_difference(old_values, new_values)
+    ))
+    src.model.db.EngineWrapper.remove_session()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+""" Rest service load test: latency percentiles and throughput
+
+Starts `cli.py serve` on a free local port against the database in
+DB_CONNECTION (which should already be loaded), unless --address of a
+running server is given. Then --connections keep-alive clients each send
+--requests requests, cycling through the endpoints.
+
+Usage: python -m benchmarks.bench_rest [--connections N] [--requests N]
+    [--threads N] [--address HOST:PORT]
+"""
+import argparse
+import asyncio
+import logging
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+from benchmarks import common
+
+
+#: Request targets cycled through by each client
+TARGETS = (
+    '/rank-genre?limit=10',
+    '/rank-personnel?limit=10',
+    '/movie?title=avatar',
+    '/movie?title=the%20dark%20knight%20rises&year=2012',
+    '/rank-personnel?limit=100',
+)
+
+
+def get_free_port() -> int:
+    """ Returns a local port nothing is listening on """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(host: str, port: int, timeout: float):
+    """ Waits until server accepts connections on port """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+async def fetch(reader, writer, host: str, target: str) -> int:
+    """ Sends GET request on keep-alive connection, returns status """
+    writer.write((
+        'GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (target, host)
+    ).encode('latin-1'))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            content_length = int(value)
+    await reader.readexactly(content_length)
+    return status
+
+
+async def run_client(
+        host: str, port: int, client_id: int, num_requests: int
+) -> List[Tuple[float, int]]:
+    """ Sends requests one after the other on one connection
+
+    :return: List of (latency seconds, status) per request
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    results = []
+    try:
+        for request_id in range(num_requests):
+            target = TARGETS[(client_id + request_id) % len(TARGETS)]
+            start = time.perf_counter()
+            status = await fetch(reader, writer, host, target)
+            results.append((time.perf_counter() - start, status))
+    finally:
+        writer.close()
+    return results
+
+
+async def run_clients(
+        host: str, port: int, num_clients: int, num_requests: int
+) -> List[Tuple[float, int]]:
+    """ Runs clients concurrently, returns all their results """
+    client_results = await asyncio.gather(*[
+        run_client(host, port, client_id, num_requests)
+        for client_id in range(num_clients)
+    ])
+    return [result for results in client_results for result in results]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """ Returns value at fraction of the sorted values """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--address', default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    server = None
+    if args.address is None:
+        host, port = '127.0.0.1', get_free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, 'cli.py', 'serve', '--host', host,
+                '--port', str(port), '--threads', str(args.threads)
+            ],
+            stdout=subprocess.DEVNULL
+        )
+    else:
+        host, port = args.address.rsplit(':', 1)
+        port = int(port)
+
+    try:
+        wait_for_port(host, port, timeout=30)
+        with common.Timer() as timer:
+            results = asyncio.run(run_clients(
+                host, port, args.connections, args.requests
+            ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, status in results if status != 200)
+    print('Requests\tErrors\tSeconds\tReq/sec\tp50 ms\tp99 ms\tMean ms')
+    print('--------\t------\t-------\t-------\t------\t------\t-------')
+    print('%s\t\t%s\t%.3f\t%.1f\t%.2f\t%.2f\t%.2f' % (
+        len(results), errors, timer.elapsed, len(results) / timer.elapsed,
+        1000 * percentile(latencies, 0.5), 1000 * percentile(latencies, 0.99),
+        1000 * statistics.mean(latencies)
+    ))
+
+
+if __name__ == '__main__':
+    main()
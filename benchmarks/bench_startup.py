@@ -0,0 +1,87 @@
+""" cli.py startup: imports and wall time of commands
+
+Runs commands under `python -X importtime` and reports their wall time, the
+number of modules imported, total import time, and whether pandas and
+sqlalchemy got imported. The "all views" row imports every view module, as
+cli.py did before views were loaded lazily.
+
+Rank commands run against the database in DB_CONNECTION.
+
+Usage: python -m benchmarks.bench_startup [--repeat N]
+"""
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks import common
+
+
+#: Heavy packages reported on
+HEAVY_PACKAGES = ('pandas', 'sqlalchemy')
+
+
+def get_cases() -> Dict[str, List[str]]:
+    """ Returns map of case name to python arguments """
+    view_modules = [
+        '.'.join(file_name[:-3].split(os.path.sep))
+        for file_name in sorted(glob.glob(
+            os.path.join('src', 'view', 'cli', '*.py')
+        ))
+    ]
+    return {
+        'help': ['cli.py', 'help'],
+        'help rank-genre': ['cli.py', 'help', 'rank-genre'],
+        'rank-genre': ['cli.py', 'rank-genre'],
+        'all views': ['-c', 'import %s' % ', '.join(view_modules)],
+    }
+
+
+def run_case(args: List[str]):
+    """ Runs python with import timing
+
+    :return: Wall seconds, and map of top level module to cumulative import
+        microseconds
+    """
+    with common.Timer() as timer:
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime'] + args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True
+        )
+
+    imports = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = int(cumulative)
+    return timer.elapsed, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('Case\t\t\tSeconds\tModules\t%s' % '\t'.join(HEAVY_PACKAGES))
+    print('----\t\t\t-------\t-------\t%s' % '\t'.join(
+        '-' * len(name) for name in HEAVY_PACKAGES
+    ))
+    for name, case_args in get_cases().items():
+        runs = [run_case(case_args) for _ in range(args.repeat)]
+        seconds = statistics.median(elapsed for elapsed, _ in runs)
+        imports = runs[-1][1]
+        print('%-16s\t%.3f\t%s\t%s' % (
+            name, seconds, len(imports), '\t'.join(
+                'yes' if package in imports else 'no'
+                for package in HEAVY_PACKAGES
+            )
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+""" Profit ranking queries: old per-record loops vs SQL aggregation vs
+reading the precomputed summary tables
+
+Runs against the database in DB_CONNECTION, which should already be loaded.
+
+Usage: python -m benchmarks.bench_stats
+"""
+import logging
+
+import sqlalchemy.event
+
+import src.controller.stats
+import src.model.db
+import src.model.fields
+import src.model.person
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+
+def genre_profit_per_record(session):
+    """ Old GenreProfit logic, lazy loading each genre's movies """
+    genre_values = {}
+    for genre_record in session.query(src.model.fields.Genre).all():
+        profits = [
+            profit for profit in map(
+                src.controller.stats.get_moview_profit, genre_record.movies
+            )
+            if profit is not None
+        ]
+        if profits:
+            genre_values[genre_record.name] = sum(profits) / len(profits)
+    return genre_values
+
+
+def person_profit_per_record(session):
+    """ Old PersonProfit logic, lazy loading acted and directed movies """
+    person_values = {}
+    for person_record in session.query(src.model.person.Person).all():
+        movies = {
+            movie.pk: movie
+            for movie in person_record.acted_movies
+            + person_record.directed_movies
+        }
+        profits = [
+            profit for profit in map(
+                src.controller.stats.get_moview_profit, movies.values()
+            )
+            if profit is not None
+        ]
+        if profits:
+            person_values[person_record.name] = sum(profits) / len(profits)
+    return person_values
+
+
+class QueryCounter(object):
+    """ Counts statements executed on an engine """
+    def __init__(self, engine):
+        self.count = 0
+        sqlalchemy.event.listen(
+            engine, 'before_cursor_execute', self.on_execute
+        )
+
+    def on_execute(self, *args):
+        self.count += 1
+
+
+def max_difference(expected, actual):
+    """ Returns largest relative difference between two profit maps """
+    if expected.keys() != actual.keys():
+        raise ValueError('Profit maps have different keys')
+    return max(
+        abs(expected[name] - actual[name]) / max(abs(expected[name]), 1.0)
+        for name in expected
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    engine = src.model.db.EngineWrapper.get_engine()
+    counter = QueryCounter(engine)
+
+    cases = (
+        (
+            'genre', genre_profit_per_record,
+            src.controller.stats.get_genre_profit_select,
+            src.controller.stats.GenreProfit
+        ),
+        (
+            'person', person_profit_per_record,
+            src.controller.stats.get_person_profit_select,
+            src.controller.stats.PersonProfit
+        ),
+    )
+
+    print('Query\tPath\tSeconds\tStatements')
+    print('-----\t----\t-------\t----------')
+    for name, old_query, get_select, action_class in cases:
+        # Fresh session each run, so nothing comes from the identity map
+        src.model.db.EngineWrapper.remove_session()
+        counter.count = 0
+        with common.Timer() as timer:
+            old_values = old_query(src.model.db.EngineWrapper.get_session())
+        print('%s\tloop\t%.3f\t%s' % (name, timer.elapsed, counter.count))
+
+        src.model.db.EngineWrapper.remove_session()
+        counter.count = 0
+        with common.Timer() as timer:
+            src.model.db.EngineWrapper.get_session().execute(
+                get_select()
+            ).fetchall()
+        print('%s\tsql\t%.3f\t%s' % (name, timer.elapsed, counter.count))
+
+        src.model.db.EngineWrapper.remove_session()
+        counter.count = 0
+        with common.Timer() as timer:
+            new_values = action_class(logger).query()
+        print('%s\tsummary\t%.3f\t%s' % (
+            name, timer.elapsed, counter.count
+        ))
+
+        print('%s\tmax relative difference: %.2e' % (
+            name, max_difference(old_values, new_values)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+""" Benchmark suite: load-data and rank commands over synthetic data sets
+
+For each of --scales numbers of records (default 10k, 100k and 1M), writes
+a synthetic data set with benchmarks.synthetic_dataset, loads it into a
+fresh database with cli.py load-data, then times rank-genre and
+rank-personnel, best of --repeat runs. Each command runs in its own process
+with the query and dataset caches off, so timings include start up.
+
+Results are written as JSON to --output, and compared with those in
+--baseline: commands slower than the baseline by more than --tolerance (a
+fraction) and MIN_REGRESSION_SECONDS are flagged, and the exit status is 1
+if any are. With --save-baseline, results are written as the baseline
+instead. Baselines are only comparable on the machine they were saved on.
+
+Data sets are written to a temporary directory, or kept in --data-directory
+to be reused by later runs.
+
+Usage: python -m benchmarks.bench_suite [--scales N,N,..] [--repeat N]
+    [--output FILE] [--baseline FILE] [--tolerance F] [--save-baseline]
+    [--data-directory DIR]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks import common
+from benchmarks import synthetic_dataset
+
+
+#: Default numbers of records of the data sets
+SCALES = (10000, 100000, 1000000)
+
+#: Rank commands timed after each load
+RANK_COMMANDS = ('rank-genre', 'rank-personnel')
+
+#: Default baseline file
+BASELINE_FILE_NAME = os.path.join('benchmarks', 'baseline.json')
+
+#: Seed of the synthetic data sets, fixed so runs time the same data
+SEED = 0
+
+#: Least slow down in seconds flagged as a regression, as process start up
+#: alone varies by a few hundred milliseconds between runs
+MIN_REGRESSION_SECONDS = 0.5
+
+
+def parse_scales(value: str) -> List[int]:
+    """ Parses comma separated numbers of records """
+    try:
+        scales = [int(scale) for scale in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Invalid scales "%s"' % value)
+    if not scales or min(scales) < 1:
+        raise argparse.ArgumentTypeError('Invalid scales "%s"' % value)
+    return scales
+
+
+def run_command(argv: List[str], env: Dict[str, str]) -> float:
+    """ Runs cli.py command in its own process, returning seconds taken """
+    with common.Timer() as timer:
+        subprocess.run(
+            [sys.executable, 'cli.py'] + argv, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+    return timer.elapsed
+
+
+def get_dataset(directory: str, num_records: int) -> str:
+    """ Returns name of synthetic data set of num_records in directory,
+    writing it unless it already exists
+    """
+    file_name = os.path.join(
+        directory, 'synthetic-%s-%s.csv' % (num_records, SEED)
+    )
+    if not os.path.exists(file_name):
+        with common.Timer() as timer:
+            synthetic_dataset.generate_dataset(file_name, num_records, SEED)
+        print('Wrote %s records in %.1f seconds' % (
+            num_records, timer.elapsed
+        ), file=sys.stderr)
+    return file_name
+
+
+def time_scale(
+        data_directory: str, db_directory: str, num_records: int, repeat: int
+) -> Dict[str, float]:
+    """ Returns seconds taken by each command at scale """
+    file_name = get_dataset(data_directory, num_records)
+    env = dict(
+        os.environ, QUERY_CACHE='off', DATASET_CACHE='off',
+        DB_CONNECTION=common.get_temp_db_url(
+            db_directory, 'suite-%s' % num_records
+        )
+    )
+
+    timings = {'load-data': run_command(['load-data', file_name], env)}
+    for command in RANK_COMMANDS:
+        timings[command] = min(
+            run_command([command], env) for _ in range(repeat)
+        )
+    return timings
+
+
+def compare_results(
+        results: Dict, baseline: Dict, tolerance: float
+) -> List[str]:
+    """ Prints results against baseline, returning regressed commands """
+    print('Scale\tCommand\t\tSeconds\tBaseline\tChange\tStatus')
+    print('-----\t-------\t\t-------\t--------\t------\t------')
+    regressions = []
+    for scale, timings in results['timings'].items():
+        base_timings = baseline.get('timings', {}).get(scale, {})
+        for command, seconds in timings.items():
+            base_seconds = base_timings.get(command)
+            if base_seconds is None:
+                print('%s\t%-15s\t%.3f\t-\t\t-\tnew' % (
+                    scale, command, seconds
+                ))
+                continue
+
+            is_regression = (
+                seconds > base_seconds * (1 + tolerance)
+                and seconds - base_seconds > MIN_REGRESSION_SECONDS
+            )
+            if is_regression:
+                regressions.append('%s %s' % (scale, command))
+            print('%s\t%-15s\t%.3f\t%.3f\t\t%+.0f%%\t%s' % (
+                scale, command, seconds, base_seconds,
+                100 * (seconds / base_seconds - 1),
+                'REGRESSION' if is_regression else 'ok'
+            ))
+    return regressions
+
+
+def write_json(file_name: str, data: Dict):
+    """ Writes data as indented JSON """
+    directory = os.path.dirname(file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_name, 'w') as out_file:
+        json.dump(data, out_file, indent=2)
+        out_file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', type=parse_scales, default=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--baseline', default=BASELINE_FILE_NAME)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--data-directory', default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    now = datetime.datetime.now()
+    results = {
+        'created': now.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': SEED,
+        'timings': {},
+    }
+    with common.temp_directory() as directory:
+        data_directory = args.data_directory or directory
+        os.makedirs(data_directory, exist_ok=True)
+        for num_records in args.scales:
+            results['timings'][str(num_records)] = time_scale(
+                data_directory, directory, num_records, args.repeat
+            )
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print('Saved baseline "%s"' % args.baseline)
+        return
+
+    output = args.output or os.path.join(
+        'data', 'bench-suite-%s.json' % now.strftime('%Y%m%d-%H%M%S')
+    )
+    write_json(output, results)
+    print('Saved results "%s"' % output)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as in_file:
+            baseline = json.load(in_file)
+    else:
+        print('No baseline "%s"' % args.baseline)
+
+    regressions = compare_results(results, baseline, args.tolerance)
+    if regressions:
+        print('Regressions: %s' % ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+""" Profit ranking throughput from many threads sharing the engine pool
+
+Each request checks a session out of EngineWrapper, runs the genre and
+person profit rankings, and removes the session again. Pool wait is the
+time a request spends getting a connection for its session.
+
+Runs against the database in DB_CONNECTION, which should already be loaded.
+Pool settings come from the DB_POOL_* environment variables, or
+--pool-size, which also turns off pool overflow.
+
+Usage: python -m benchmarks.bench_threads [--threads N ...] [--requests N]
+    [--pool-size N]
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import time
+
+import src.controller.stats
+import src.model.db
+from benchmarks import common
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_request(limit: int):
+    """ Runs the rankings in a thread session
+
+    :return: Seconds waited for a pooled connection, and ranking results
+    """
+    session = src.model.db.EngineWrapper.get_session()
+    try:
+        start = time.perf_counter()
+        session.connection()
+        pool_wait = time.perf_counter() - start
+
+        results = (
+            src.controller.stats.GenreProfit(logger).query(limit=limit),
+            src.controller.stats.PersonProfit(logger).query(limit=limit),
+        )
+    finally:
+        src.model.db.EngineWrapper.remove_session()
+    return pool_wait, results
+
+
+def run_threads(num_threads: int, num_requests: int, limit: int):
+    """ Runs requests spread over threads
+
+    :return: Seconds taken, list of pool waits, and list of results
+    """
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        with common.Timer() as timer:
+            outcomes = list(executor.map(
+                run_request, [limit] * num_requests
+            ))
+    pool_waits = [pool_wait for pool_wait, _ in outcomes]
+    results = [result for _, result in outcomes]
+    return timer.elapsed, pool_waits, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16]
+    )
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--pool-size', type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.pool_size is not None:
+        os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+        os.environ['DB_MAX_OVERFLOW'] = '0'
+        src.model.db.EngineWrapper.reset()
+
+    # Single threaded results to check the threaded ones against
+    _, expected = run_request(args.limit)
+
+    print('Threads\tSeconds\tReq/sec\tMean wait ms\tMax wait ms')
+    print('-------\t-------\t-------\t------------\t-----------')
+    for num_threads in args.threads:
+        elapsed, pool_waits, results = run_threads(
+            num_threads, args.requests, args.limit
+        )
+        if any(result != expected for result in results):
+            raise ValueError(
+                'Results from %s threads differ from single thread' % (
+                    num_threads
+                )
+            )
+
+        print('%s\t%.3f\t%.1f\t%.3f\t\t%.3f' % (
+            num_threads, elapsed, args.requests / elapsed,
+            1000 * sum(pool_waits) / len(pool_waits), 1000 * max(pool_waits)
+        ))
+
+
+if __name__ == '__main__':
+    main()
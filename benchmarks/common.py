@@ -0,0 +1,39 @@
+""" Shared helpers for benchmark scripts """
+import os
+import tempfile
+import time
+
+import sqlalchemy.orm
+
+import src.model.db
+import src.model.movie
+
+
+def get_temp_db_url(directory: str, name: str) -> str:
+    """ Returns connection string of sqlite database file in directory """
+    return 'sqlite:///%s' % os.path.join(directory, name + '.sqlite')
+
+
+def make_temp_session(directory: str, name: str, profile: str='default'):
+    """ Returns session to a fresh sqlite database file in directory """
+    engine = src.model.db.create_profile_engine(
+        get_temp_db_url(directory, name), profile
+    )
+    src.model.db.ModelBase.metadata.create_all(engine)
+    return sqlalchemy.orm.sessionmaker(bind=engine)()
+
+
+def temp_directory():
+    """ Returns temporary directory context for benchmark databases """
+    return tempfile.TemporaryDirectory(prefix='bench-')
+
+
+class Timer(object):
+    """ Context manager recording elapsed wall time in seconds """
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
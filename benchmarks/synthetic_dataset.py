@@ -0,0 +1,316 @@
+""" Synthetic data sets with the bundled data set's columns, at any scale
+
+Each record copies its genres, ratings, money, year and other figures
+together from a record of the source data set drawn at random, keeping
+their joint distribution. Directors, actors and plot keywords are drawn
+from pools that grow with the number of records, with Zipf distributed
+popularity, and titles from the source's title words. Missing values,
+titles with commas, duplicate movies and records with an unquoted comma in
+the title (which load_df_from_dataset drops) occur at the source's rates.
+
+Usage: python -m benchmarks.synthetic_dataset <file name> [--rows N]
+    [--seed N] [--source FILE]
+"""
+import argparse
+import csv
+import logging
+import math
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import src.utils
+
+
+#: Columns copied together from a source record drawn at random
+RECORD_COLUMNS = (
+    'color', 'num_critic_for_reviews', 'duration', 'director_facebook_likes',
+    'actor_3_facebook_likes', 'actor_1_facebook_likes', 'gross', 'genres',
+    'num_voted_users', 'cast_total_facebook_likes', 'facenumber_in_poster',
+    'num_user_for_reviews', 'language', 'country', 'content_rating',
+    'budget', 'title_year', 'actor_2_facebook_likes', 'imdb_score',
+    'aspect_ratio', 'movie_facebook_likes',
+)
+
+#: Actor columns, drawn from the same pool of persons
+ACTOR_COLUMNS = ('actor_1_name', 'actor_2_name', 'actor_3_name')
+
+#: Persons and keywords in the pools per record, so that about as many
+#: distinct ones per record are used as in the bundled data set
+PERSONS_PER_RECORD = 2
+KEYWORDS_PER_RECORD = 2
+
+#: Step between the popularity ranks of actors given to consecutive
+#: director ranks, a prime so every person is reached
+DIRECTOR_RANK_STEP = 7919
+
+#: Exponent of the Zipf distributions of person, keyword and title word
+#: popularity
+ZIPF_EXPONENT = 0.6
+
+#: Movie link template, filled with a serial number
+LINK_TEMPLATE = 'http://www.imdb.com/title/tt%07d/?ref_=fn_tt_tt_1'
+
+
+def split_values(values: pd.Series) -> List[List[str]]:
+    """ Returns lists of '|' separated values of column, empty if missing """
+    return [value.split('|') if value else [] for value in values]
+
+
+def get_by_frequency(values) -> List[str]:
+    """ Returns distinct values, most frequent first """
+    return pd.Series(values, dtype=object).value_counts().index.tolist()
+
+
+class SourceProfile(object):
+    """ Records and rates of a source data set that synthetic records are
+    drawn from
+    """
+    def __init__(self, file_name: str):
+        df = pd.read_csv(file_name, dtype=str, keep_default_na=False)
+        bad_column_name = src.utils.find_suspicious_column(df.columns)
+        self.num_defects = 0
+        if bad_column_name is not None:
+            is_defect = df[bad_column_name] != ''
+            self.num_defects = int(is_defect.sum())
+            df = df[~is_defect].drop(columns=[bad_column_name])
+        self.columns = list(df.columns)
+        self.num_records = len(df)
+        self.records = {
+            column: df[column].to_numpy() for column in RECORD_COLUMNS
+        }
+
+        titles = df['movie_title'].str.strip('\xa0 ')
+        self.comma_rate = titles.str.contains(',', regex=False).mean()
+        self.duplicate_rate = df.duplicated(
+            ['movie_title', 'title_year']
+        ).mean()
+        self.defect_rate = self.num_defects / (
+            self.num_records + self.num_defects
+        )
+        title_words = split_values(titles.str.replace(
+            ',', '', regex=False
+        ).str.replace(' ', '|', regex=False))
+        self.title_lengths = np.array([len(words) for words in title_words])
+        self.title_words = get_by_frequency(
+            word for words in title_words for word in words
+        )
+
+        self.person_missing_rates = {
+            column: (df[column] == '').mean()
+            for column in ('director_name',) + ACTOR_COLUMNS
+        }
+        person_names = [
+            name for column in self.person_missing_rates
+            for name in df[column] if name
+        ]
+        self.first_names = get_by_frequency(
+            name.split(' ', 1)[0] for name in person_names
+        )
+        last_names = get_by_frequency(
+            name.rsplit(' ', 1)[-1] for name in person_names if ' ' in name
+        )
+        # First and last name of person n are n modulo the number of each,
+        # unique for every pair while the numbers are coprime
+        while math.gcd(len(self.first_names), len(last_names)) > 1:
+            last_names.pop()
+        self.last_names = last_names
+
+        keywords = split_values(df['plot_keywords'])
+        self.keyword_missing_rate = (df['plot_keywords'] == '').mean()
+        self.keyword_counts = np.array([
+            len(values) for values in keywords if values
+        ])
+        self.keywords = get_by_frequency(
+            keyword for values in keywords for keyword in values
+        )
+
+    def get_person_name(self, rank: int) -> str:
+        """ Returns name of person of popularity rank """
+        name = '%s %s' % (
+            self.first_names[rank % len(self.first_names)],
+            self.last_names[rank % len(self.last_names)]
+        )
+        cycle = rank // (len(self.first_names) * len(self.last_names))
+        return name if cycle == 0 else '%s %s' % (name, cycle + 1)
+
+    def get_keyword(self, rank: int) -> str:
+        """ Returns keyword of popularity rank """
+        keyword = self.keywords[rank % len(self.keywords)]
+        cycle = rank // len(self.keywords)
+        return keyword if cycle == 0 else '%s %s' % (keyword, cycle + 1)
+
+
+def draw_ranks(rng, pool_size: int, size: int) -> np.ndarray:
+    """ Returns size popularity ranks from 0 to pool_size-1, Zipf
+    distributed
+    """
+    weights = np.arange(1, pool_size + 1, dtype='float64') ** -ZIPF_EXPONENT
+    cdf = np.cumsum(weights)
+    return np.minimum(
+        np.searchsorted(cdf, rng.random(size) * cdf[-1]), pool_size - 1
+    )
+
+
+def draw_names(rng, get_name, pool_size: int, size: int) -> np.ndarray:
+    """ Returns size names drawn from pool, only naming those drawn """
+    ranks, inverse = np.unique(
+        draw_ranks(rng, pool_size, size), return_inverse=True
+    )
+    return np.array([get_name(rank) for rank in ranks.tolist()])[inverse]
+
+
+def draw_optional_names(
+        rng, get_name, pool_size: int, size: int, missing_rate: float
+) -> np.ndarray:
+    """ Returns size names drawn from pool, empty at missing_rate """
+    names = draw_names(rng, get_name, pool_size, size).astype(object)
+    names[rng.random(size) < missing_rate] = ''
+    return names
+
+
+def generate_dataset(
+        file_name: str, num_records: int, seed: int=0,
+        source_file_name: str=None
+):
+    """ Writes csv of num_records synthetic records
+
+    :param file_name: Name of csv to write
+    :param num_records: Number of records, including duplicates and
+        defective records
+    :param seed: Random seed, the same seed writes the same file
+    :param source_file_name: Data set to draw records and rates from,
+        defaults to the bundled data set
+    :return: Number of duplicate and defective records written
+    """
+    source = SourceProfile(
+        source_file_name or src.utils.get_default_dataset_filename()
+    )
+    rng = np.random.default_rng(seed)
+    record_ids = rng.integers(0, source.num_records, num_records)
+
+    num_persons = PERSONS_PER_RECORD * num_records
+    person_columns = {
+        column: draw_optional_names(
+            rng, source.get_person_name, num_persons, num_records,
+            missing_rate
+        )
+        for column, missing_rate in source.person_missing_rates.items()
+    }
+    # Directors draw from the same pool as actors, in their own order of
+    # popularity, so some also act
+    person_columns['director_name'] = draw_optional_names(
+        rng, lambda rank: source.get_person_name(
+            (rank * DIRECTOR_RANK_STEP + 1) % num_persons
+        ), num_persons, num_records,
+        source.person_missing_rates['director_name']
+    )
+
+    keyword_counts = source.keyword_counts[
+        rng.integers(0, len(source.keyword_counts), num_records)
+    ]
+    keyword_counts[rng.random(num_records) < source.keyword_missing_rate] = 0
+    keyword_ends = np.cumsum(keyword_counts).tolist()
+    keywords = draw_names(
+        rng, source.get_keyword, KEYWORDS_PER_RECORD * num_records,
+        keyword_ends[-1] if keyword_ends else 0
+    ).tolist()
+
+    title_lengths = source.title_lengths[
+        rng.integers(0, len(source.title_lengths), num_records)
+    ]
+    title_ends = np.cumsum(title_lengths).tolist()
+    title_words = np.array(source.title_words)[draw_ranks(
+        rng, len(source.title_words), title_ends[-1] if title_ends else 0
+    )].tolist()
+    has_comma = (rng.random(num_records) < source.comma_rate).tolist()
+
+    # Duplicates repeat an earlier record. Defects get an unquoted comma in
+    # the title, which shifts their last value into the unnamed column.
+    is_duplicate = rng.random(num_records) < source.duplicate_rate
+    is_duplicate[0] = False
+    duplicate_of = (rng.random(num_records) * np.arange(num_records)).astype(
+        'int64'
+    ).tolist()
+    for record_id in np.flatnonzero(is_duplicate).tolist():
+        if is_duplicate[duplicate_of[record_id]]:
+            duplicate_of[record_id] = duplicate_of[duplicate_of[record_id]]
+    is_defect = (rng.random(num_records) < source.defect_rate).tolist()
+
+    record_columns = {
+        column: values[record_ids].tolist()
+        for column, values in source.records.items()
+    }
+    person_columns = {
+        column: values.tolist() for column, values in person_columns.items()
+    }
+
+    def get_row(record_id: int) -> List[str]:
+        """ Returns column values of record """
+        words = title_words[
+            title_ends[record_id] - title_lengths[record_id]:
+            title_ends[record_id]
+        ]
+        title = ' '.join(words) or 'Untitled'
+        if has_comma[record_id] or is_defect[record_id]:
+            title = '%s, %s' % (title, record_id + 1)
+        else:
+            title = '%s %s' % (title, record_id + 1)
+
+        values = {
+            'movie_title': title + '\xa0',
+            'plot_keywords': '|'.join(dict.fromkeys(keywords[
+                keyword_ends[record_id] - keyword_counts[record_id]:
+                keyword_ends[record_id]
+            ])),
+            'movie_imdb_link': LINK_TEMPLATE % (record_id + 1),
+        }
+        for column, column_values in record_columns.items():
+            values[column] = column_values[record_id]
+        for column, column_values in person_columns.items():
+            values[column] = column_values[record_id]
+        return [values[column] for column in source.columns]
+
+    title_index = source.columns.index('movie_title')
+    with open(file_name, 'w', encoding='utf-8', newline='') as out_file:
+        writer = csv.writer(out_file, lineterminator='\n')
+        writer.writerow(source.columns + [''])
+        for record_id in range(num_records):
+            if is_duplicate[record_id]:
+                row = get_row(duplicate_of[record_id])
+            else:
+                row = get_row(record_id)
+
+            if is_defect[record_id] and not is_duplicate[record_id]:
+                row[title_index:title_index+1] = row[title_index].split(',', 1)
+                row[-1] = row[-1] or '0'
+                writer.writerow(row)
+            else:
+                writer.writerow(row + [''])
+
+    return int(is_duplicate.sum()), sum(
+        defect and not duplicate
+        for defect, duplicate in zip(is_defect, is_duplicate.tolist())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_name')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    num_duplicates, num_defects = generate_dataset(
+        args.file_name, args.rows, args.seed, args.source
+    )
+    print('Wrote %s records to "%s", %s duplicates and %s defective' % (
+        args.rows, args.file_name, num_duplicates, num_defects
+    ))
+
+
+if __name__ == '__main__':
+    main()
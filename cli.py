@@ -1,34 +1,77 @@
 """ Command line interface to the application
 
-Dynamically loads classes in view/cli/*.py that inherit views
+Finds classes in view/cli/*.py that inherit views, through a manifest that
+is only rebuilt for changed modules, and imports just the view of the
+command being run
 """
-import glob
-import importlib
-import inspect
+import cProfile
+import json
 import logging
 import os
 import sys
-from typing import List
+import time
+from typing import List, Tuple
 
-import src.view.cli_view
+import src.view.cli_registry
+
+
+#: Cache of view module scans
+MANIFEST_FILE = os.path.join('data', 'cli_manifest.json')
+
+
+#: Directory profile dumps are written to
+PROFILE_DIRECTORY = 'data'
+
+#: Formats of --profile: a summary table on standard error, plus a JSON file
+#: of it or a cProfile dump
+PROFILE_FORMATS = ('table', 'json', 'cprofile')
+
+#: Usage of options given before the command name
+OPTIONS_USAGE = (
+    '[--db-profile <profile>] [--profile[=json|cprofile]] [--profile-memory]'
+)
 
 
 def main(argv):
     """ Script's main function """
+    profile_format = None
+    trace_memory = False
+    while len(argv) > 1 and argv[1].startswith('--'):
+        if argv[1].startswith('--db-profile'):
+            argv = pop_db_profile(argv)
+        elif argv[1] == '--profile-memory':
+            # Tracing memory slows allocation heavy code several times over,
+            # so it's only on when asked for
+            argv = argv[:1] + argv[2:]
+            trace_memory = True
+            profile_format = profile_format or 'table'
+        elif argv[1].startswith('--profile'):
+            argv, profile_format = pop_profile(argv)
+        else:
+            break
+
+    if profile_format is None:
+        run_command(argv)
+    else:
+        run_profiled_command(argv, profile_format, trace_memory)
+
+
+def run_command(argv):
+    """ Runs command named in arguments """
     cli_view_path = os.path.join('src', 'view', 'cli', '*.py')
-    cli_view_objects = load_views(cli_view_path)
-
-    # Build lookup class of view names to view objects
-    view_lookup = {
-        view.get_cli_name().lower(): view
-        for view in cli_view_objects
-    }
-    # The "help" view is special in that in needs access to other views
-    help_view = view_lookup['help']
-    help_view.view_lookup = view_lookup
+
+    # Lazy lookup of view names to view objects
+    view_lookup = src.view.cli_registry.ViewRegistry(
+        cli_view_path, MANIFEST_FILE
+    )
+
     if len(argv) == 1:
-        print('Usage: %s <command> [<arg>, <arg>, ...]' % sys.argv[0])
-        help_view.do_command([])
+        print(
+            'Usage: %s %s <command> [<arg>, <arg>, ...]' % (
+                sys.argv[0], OPTIONS_USAGE
+            )
+        )
+        view_lookup['help'].do_command([])
 
     elif len(argv) > 1:
         command_name = argv[1].lower()
@@ -41,46 +84,84 @@ def main(argv):
             print('Error, "%s" is not a recognized command' % command_name)
 
 
-def load_views(path_name: str) -> List[src.view.cli_view.CliView]:
-    """ Loads cli views in a given path """
-    views = []
-
-    logger.info('Searching view modules in path "%s"' % path_name)
-    for python_file in glob.glob(path_name):
-        module_name = script_name_to_module(python_file)
-        logger.info('Loading module "%s"' % module_name)
-        module = importlib.import_module(module_name)
-
-        for attr_name in dir(module):
-            if attr_name[0] == '_':
-                # Skip anything starting with underscore
-                continue
-
-            module_attr = getattr(module, attr_name)
-            if not inspect.isclass(module_attr):
-                # Skip anything that isn't a class
-                continue
+def pop_db_profile(argv: List[str]) -> List[str]:
+    """ Applies --db-profile option given before the command name
 
-            try:
-                if issubclass(module_attr, src.view.cli_view.CliView):
-                    logger.info(
-                        'Loading class: "%s.%s"' % (module_name, attr_name)
-                    )
-                    views.append(module_attr())
-
-            except TypeError as ex:
-                logger.error('Bad attribute: %s' % attr_name)
-                raise ex
-
-    return views
-
-
-def script_name_to_module(file_name: str) -> str:
-    """ Converts python file name to importable module name """
-    if file_name[-3:] != '.py':
-        raise ValueError('Script name "%s" should end in ".py' % file_name)
-    parts = file_name[:-3].split(os.path.sep)
-    return '.'.join(parts)
+    :return: Arguments with the option removed
+    """
+    argv = list(argv)
+    if len(argv) > 1 and argv[1].startswith('--db-profile'):
+        option = argv.pop(1)
+        if '=' in option:
+            profile = option.split('=', 1)[1]
+        elif len(argv) > 1:
+            profile = argv.pop(1)
+        else:
+            raise ValueError('Missing profile for --db-profile')
+
+        # Imported here, so commands without database work skip sqlalchemy
+        import src.model.db
+        logger.info('Using database profile "%s"' % profile)
+        src.model.db.EngineWrapper.set_profile(profile)
+    return argv
+
+
+def pop_profile(argv: List[str]) -> Tuple[List[str], str]:
+    """ Removes --profile[=format] option given before the command name
+
+    :return: Arguments with the option removed, and the profile format
+    """
+    argv = list(argv)
+    option = argv.pop(1)
+    profile_format = 'table'
+    if '=' in option:
+        profile_format = option.split('=', 1)[1]
+    if profile_format not in PROFILE_FORMATS:
+        raise ValueError(
+            'Unknown --profile format "%s", expected one of: %s' % (
+                profile_format, ', '.join(PROFILE_FORMATS)
+            )
+        )
+    return argv, profile_format
+
+
+def run_profiled_command(
+        argv: List[str], profile_format: str, trace_memory: bool
+):
+    """ Runs command with instrumentation enabled, then prints its summary
+    on standard error and writes any JSON or cProfile dump
+
+    :param trace_memory: Whether to trace memory, for peaks of stages
+    """
+    # Imported here, so commands without profiling skip sqlalchemy
+    import src.profiling
+
+    command_name = argv[1].lower() if len(argv) > 1 else 'help'
+    file_name = os.path.join(PROFILE_DIRECTORY, 'profile-%s-%s' % (
+        command_name, time.strftime('%Y%m%d-%H%M%S')
+    ))
+    profiler = src.profiling.profiler
+    profiler.enable(trace_memory)
+    cprofile = None
+    if profile_format == 'cprofile':
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+    try:
+        run_command(argv)
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+        profiler.disable()
+        summary = profiler.get_summary()
+        print(profiler.format_summary(summary), file=sys.stderr)
+
+        if profile_format == 'json':
+            with open(file_name + '.json', 'w', encoding='utf-8') as out_file:
+                json.dump(summary, out_file, indent=1)
+            print('Wrote %s.json' % file_name, file=sys.stderr)
+        elif cprofile is not None:
+            cprofile.dump_stats(file_name + '.prof')
+            print('Wrote %s.prof' % file_name, file=sys.stderr)
 
 
 # Setup logger
@@ -3,6 +3,7 @@ import logging
 from typing import Optional
 
 import src.model.db
+import src.profiling
 
 
 class ControllerAction(object):
@@ -24,6 +25,20 @@ class ControllerAction(object):
         self._session = session
         self._commit_enabled = commit_enabled
 
+    def __init_subclass__(cls, **kwargs):
+        """ Instruments query and execute methods of action classes, so
+        their calls are recorded while profiling, see src.profiling
+        """
+        super().__init_subclass__(**kwargs)
+        for method_name in ('query', 'execute'):
+            method = cls.__dict__.get(method_name)
+            if method is not None and not getattr(
+                    method, '__isabstractmethod__', False
+            ):
+                setattr(
+                    cls, method_name, src.profiling.instrument_action(method)
+                )
+
     @property
     def logger(self):
         return self._logger
@@ -39,7 +54,11 @@ class ControllerAction(object):
         pass
 
     def get_session(self):
-        """ Returns sqlalchemy session """
+        """ Returns sqlalchemy session
+
+        Without a session given to the action, this is the calling thread's
+        session from EngineWrapper, shared with other actions in the thread.
+        """
         if self._session is None:
             return src.model.db.EngineWrapper.get_session()
         else:
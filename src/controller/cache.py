@@ -0,0 +1,210 @@
+""" Result cache for read-only controller queries
+
+Results are keyed by database, action, query arguments and data version
+stamp.
+load-data bumps the data version in the same transaction as the data, and
+each cached call reads the version in the transaction its query would run
+in, so results from before a load are never served after it.
+
+Settings come from environment variables:
+    QUERY_CACHE: "off", "memory" (default), or "disk" for memory plus
+        pickle files under QUERY_CACHE_DIR, shared between processes
+    QUERY_CACHE_DIR: Directory of the disk tier, defaults to "data/cache"
+    QUERY_CACHE_SIZE: Number of results kept in memory, defaults to 128
+"""
+import collections
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+import src.controller.version
+
+
+logger = logging.getLogger(__name__)
+
+#: Cache modes for QUERY_CACHE
+CACHE_MODES = ('off', 'memory', 'disk')
+
+
+class QueryCache(object):
+    """ LRU of pickled query results, with optional directory of pickle
+    files behind it
+
+    Results are stored pickled, so callers can't change cached values.
+    Disk entries are grouped by database and data version stamp; storing a
+    result of one stamp deletes the other stamps of that database. Only
+    point the disk tier at directories this application writes.
+    """
+    def __init__(self, max_entries: int=128, directory: Optional[str]=None):
+        """
+        :param max_entries: Number of results kept in memory
+        :param directory: Optional directory of disk tier
+        """
+        self._max_entries = max_entries
+        self._directory = directory
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_key: str, stamp: str, key: str) -> Tuple[bool, object]:
+        """ Returns whether result was found, and the result """
+        memory_key = (db_key, stamp, key)
+        with self._lock:
+            data = self._entries.get(memory_key)
+            if data is not None:
+                self._entries.move_to_end(memory_key)
+
+        if data is None and self._directory is not None:
+            try:
+                with open(self.get_file_name(db_key, stamp, key), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.put_memory(memory_key, data)
+
+        if data is None:
+            return False, None
+        return True, pickle.loads(data)
+
+    def put(self, db_key: str, stamp: str, key: str, result):
+        """ Stores result """
+        data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        self.put_memory((db_key, stamp, key), data)
+        if self._directory is not None:
+            try:
+                self.put_file(db_key, stamp, key, data)
+            except OSError as ex:
+                logger.warning('Could not write cache file: %s' % ex)
+
+    def put_memory(self, memory_key: Tuple, data: bytes):
+        """ Stores pickled result in memory, evicting least recently used """
+        with self._lock:
+            self._entries[memory_key] = data
+            self._entries.move_to_end(memory_key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def put_file(self, db_key: str, stamp: str, key: str, data: bytes):
+        """ Writes pickled result to disk, and drops other stamps """
+        file_name = self.get_file_name(db_key, stamp, key)
+        version_dir = os.path.dirname(file_name)
+        os.makedirs(version_dir, exist_ok=True)
+
+        # Write then rename, so other processes never read partial files
+        fd, temp_name = tempfile.mkstemp(dir=version_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_name, file_name)
+
+        # Results of other stamps can't be served again once the data moved
+        # on, so drop them. At worst this drops results another process is
+        # storing for a newer stamp, which just get computed again.
+        db_dir = os.path.dirname(version_dir)
+        for dir_name in os.listdir(db_dir):
+            if dir_name != stamp:
+                shutil.rmtree(
+                    os.path.join(db_dir, dir_name), ignore_errors=True
+                )
+
+    def get_file_name(self, db_key: str, stamp: str, key: str) -> str:
+        """ Returns disk tier file name of a result """
+        return os.path.join(
+            self._directory, hash_key(db_key), stamp,
+            hash_key(key) + '.pickle'
+        )
+
+    def clear(self):
+        """ Drops all results, in memory and on disk """
+        with self._lock:
+            self._entries.clear()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def hash_key(key: str) -> str:
+    """ Returns file name safe hash of key """
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[QueryCache]:
+    """ Returns cache configured by environment, or None if turned off """
+    global _default_cache
+    mode = os.environ.get('QUERY_CACHE', 'memory')
+    if mode not in CACHE_MODES:
+        raise ValueError('Unknown QUERY_CACHE "%s", expected one of: %s' % (
+            mode, ', '.join(CACHE_MODES)
+        ))
+    if mode == 'off':
+        return None
+
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                directory = None
+                if mode == 'disk':
+                    directory = os.environ.get(
+                        'QUERY_CACHE_DIR', os.path.join('data', 'cache')
+                    )
+                _default_cache = QueryCache(
+                    int(os.environ.get('QUERY_CACHE_SIZE', 128)), directory
+                )
+    return _default_cache
+
+
+def reset_default_cache():
+    """ Drops default cache, so the next one picks up new settings """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = None
+
+
+def cached_query(query):
+    """ Decorates ControllerAction.query method to cache its results
+
+    Only for queries without side effects whose results depend on nothing
+    but their arguments and the loaded data. Arguments need a repr that
+    identifies their value.
+    """
+    signature = inspect.signature(query)
+
+    @functools.wraps(query)
+    def wrapper(self, *args, **kwargs):
+        cache = get_default_cache()
+        if cache is None:
+            return query(self, *args, **kwargs)
+
+        session = self.get_session()
+        stamp = src.controller.version.CurrentDataVersion(
+            self.logger, session=session
+        ).query()
+        if stamp is None:
+            return query(self, *args, **kwargs)
+
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        key = repr((
+            type(self).__module__, type(self).__qualname__,
+            sorted(list(arguments.arguments.items())[1:])
+        ))
+        db_key = str(session.get_bind().url)
+
+        found, result = cache.get(db_key, stamp, key)
+        if found:
+            return result
+
+        result = query(self, *args, **kwargs)
+        cache.put(db_key, stamp, key, result)
+        return result
+
+    return wrapper
@@ -1,36 +1,140 @@
 """ Controller for movie category fields """
 import abc
-from typing import Dict, List
+import array
+import bisect
+import collections.abc
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+import sqlalchemy
 
 from src.controller import action
 import src.model.db
 import src.model.fields
 
 
+#: Max number of names sent per IN query, within sqlite's variable limit
+IN_QUERY_CHUNK_SIZE = 500
+
+#: Rows fetched at a time when streaming lookup indexes
+LOOKUP_BATCH_SIZE = 10000
+
+
+class SortedLookupItems(collections.abc.ItemsView):
+    """ Items of a SortedLookup, iterated in key order without looking up
+    each key
+    """
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+
+class SortedLookup(collections.abc.Mapping):
+    """ Read only map of keys to record pks, held as a sorted list of keys
+    with a parallel array of pks
+
+    Takes a fraction of the memory of a dict of the same items, as there
+    are no hash table entries or int objects for pks. Lookups are binary
+    searches. Subclasses may store keys encoded as strings, see
+    encode_key().
+    """
+    def __init__(self, items: Iterable[Tuple[Any, int]]):
+        keys = []
+        pks = array.array('q')
+        for key, pk in items:
+            keys.append(self.encode_key(key))
+            pks.append(pk)
+
+        # Of keys given more than once, the last one's pk is kept, like a
+        # dict. The sort is stable, so it is the last of its run.
+        self._keys = []
+        self._pks = array.array('q')
+        for position in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[position]
+            if self._keys and self._keys[-1] == key:
+                self._pks[-1] = pks[position]
+            else:
+                self._keys.append(key)
+                self._pks.append(pks[position])
+
+    def encode_key(self, key):
+        """ Returns key as stored """
+        return key
+
+    def decode_key(self, key):
+        """ Returns stored key as given """
+        return key
+
+    def __getitem__(self, key) -> int:
+        try:
+            encoded = self.encode_key(key)
+            position = bisect.bisect_left(self._keys, encoded)
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        if position < len(self._keys) and self._keys[position] == encoded:
+            return self._pks[position]
+        raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator:
+        return map(self.decode_key, self._keys)
+
+    def iter_items(self) -> Iterator[Tuple[Any, int]]:
+        """ Returns iterator of (key, pk) in key order """
+        return zip(map(self.decode_key, self._keys), self._pks)
+
+    def items(self) -> SortedLookupItems:
+        return SortedLookupItems(self)
+
+
 class AddMovieFieldBaseClass(action.ControllerAction):
     """ Base class for adding category fields """
-    def execute_add(self, names: List[str], model_class, class_name: str):
-        """
+    def execute_add(
+            self, names: List[str], model_class, class_name: str
+    ) -> Dict[str, int]:
+        """ Adds missing records in bulk
+
+        Existing names are fetched with chunked IN queries, and the missing
+        ones inserted with a single executemany.
+
         :param names: List of names of records to add
         :param model_class: Model class
         :param class_name: Name of class to log
+        :return: Map of every given name to its record pk
         """
         session = self.get_session()
-        for name in names:
-            # Check if record exists in db
-            old_record = session.query(
-                model_class
-            ).filter(
-                model_class.name == name
-            ).one_or_none()
-
-            if old_record is None:
-                self.logger.info(
-                    'Creating new %s record "%s"' % (class_name, name)
-                )
-                session.add(model_class(name=name))
+        names = list(dict.fromkeys(names))
+
+        name_pks = self.query_name_pks(session, names, model_class)
+        missing_names = [name for name in names if name not in name_pks]
+        if missing_names:
+            self.logger.info(
+                'Creating %s new %s records' % (len(missing_names), class_name)
+            )
+            session.execute(
+                model_class.__table__.insert(),
+                [{'name': name} for name in missing_names]
+            )
+            name_pks.update(
+                self.query_name_pks(session, missing_names, model_class)
+            )
 
         self.commit(session)
+        return name_pks
+
+    @staticmethod
+    def query_name_pks(
+            session, names: List[str], model_class
+    ) -> Dict[str, int]:
+        """ Returns map of name to pk for records in db with given names """
+        name_pks = {}
+        for start in range(0, len(names), IN_QUERY_CHUNK_SIZE):
+            name_pks.update(session.query(
+                model_class.name, model_class.pk
+            ).filter(
+                model_class.name.in_(names[start:start+IN_QUERY_CHUNK_SIZE])
+            ))
+        return name_pks
 
     @abc.abstractmethod
     def execute(self, **kwargs):
@@ -40,17 +144,26 @@ class AddMovieFieldBaseClass(action.ControllerAction):
         pass
 
 
+def stream_rows(session, select, batch_size: int=LOOKUP_BATCH_SIZE):
+    """ Returns rows of select, fetched batch_size at a time rather than
+    all at once
+    """
+    return session.execute(select.execution_options(yield_per=batch_size))
+
+
 class MovieFieldIndexLookup(action.ControllerAction):
     """ Base class for building lookup of record id by name
 
-    Builds dictionary mapping lower case name to record pk
+    Builds SortedLookup mapping lower case name to record pk, from a stream
+    of name and pk columns rather than whole records
     """
-    def query_index_lookup(self, model_class):
+    def query_index_lookup(self, model_class) -> SortedLookup:
         session = self.get_session()
-        return {
-            record.name.lower(): record.pk
-            for record in session.query(model_class).all()
-        }
+        table = model_class.__table__
+        rows = stream_rows(session, sqlalchemy.select(
+            table.c.name, table.c.pk
+        ).order_by(table.c.pk))
+        return SortedLookup((name.lower(), pk) for name, pk in rows)
 
     @abc.abstractmethod
     def query(self, **kwargs):
@@ -62,71 +175,83 @@ class MovieFieldIndexLookup(action.ControllerAction):
 
 class AddMovieColors(AddMovieFieldBaseClass):
     """ Action to add list of movie colors to db, if they don't exist """
-    def execute(self, color_names: List[str]):
-        self.execute_add(color_names, src.model.fields.MovieColor, 'moviecolor')
+    def execute(self, color_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            color_names, src.model.fields.MovieColor, 'moviecolor'
+        )
 
 
 class MovieColorIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of movie color id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.MovieColor)
 
 
 class AddCountries(AddMovieFieldBaseClass):
     """ Action to add list of counties to db, if they don't exist """
-    def execute(self, country_names: List[str]):
-        self.execute_add(country_names, src.model.fields.Country, 'country')
+    def execute(self, country_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            country_names, src.model.fields.Country, 'country'
+        )
 
 
 class CountryIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of country id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.Country)
 
 
 class AddLanguages(AddMovieFieldBaseClass):
     """ Action to add list of languages to db, if they don't exist """
-    def execute(self, language_names: List[str]):
-        self.execute_add(language_names, src.model.fields.Language, 'language')
+    def execute(self, language_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            language_names, src.model.fields.Language, 'language'
+        )
 
 
 class LanguageIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of language id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.Language)
 
 
 class AddContentRating(AddMovieFieldBaseClass):
     """ Action to add list of content ratings to db, if they don't exist """
-    def execute(self, rating_names: List[str]):
-        self.execute_add(rating_names, src.model.fields.ContentRating, 'rating')
+    def execute(self, rating_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            rating_names, src.model.fields.ContentRating, 'rating'
+        )
 
 
 class ContentRatingIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of content rating id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.ContentRating)
 
 
 class AddGenres(AddMovieFieldBaseClass):
     """ Action to add list of genres to db, if they don't exist """
-    def execute(self, genre_names: List[str]):
-        self.execute_add(genre_names, src.model.fields.Genre, 'genre')
+    def execute(self, genre_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            genre_names, src.model.fields.Genre, 'genre'
+        )
 
 
 class GenreIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of grenre id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.Genre)
 
 
 class AddPlotKeywords(AddMovieFieldBaseClass):
     """ Action to add list of keyword posts to db, if they don't exist """
-    def execute(self, keyword_names: List[str]):
-        self.execute_add(keyword_names, src.model.fields.Keyword, 'keyword')
+    def execute(self, keyword_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(
+            keyword_names, src.model.fields.Keyword, 'keyword'
+        )
 
 
 class PlotKeywordIndexLookup(MovieFieldIndexLookup):
     """ Action for building lookup of plot keyword id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.fields.Keyword)
@@ -0,0 +1,104 @@
+""" Data load bookkeeping actions, for skipping unchanged files and movies """
+import abc
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy
+
+from src.controller import action
+import src.controller.fields
+import src.model.load
+import src.model.movie
+
+
+class LastDataLoad(action.ControllerAction):
+    """ Returns fingerprint of the last finished load """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self) -> Optional[Dict]:
+        """
+        :return: Dict of file_name, file_size, file_sha256 and
+            delete_missing of the last load, or None if there was none
+        """
+        session = self.get_session()
+        table = src.model.load.DataLoad.__table__
+        record = session.execute(sqlalchemy.select(
+            table.c.file_name, table.c.file_size, table.c.file_sha256,
+            table.c.delete_missing
+        ).order_by(table.c.pk.desc()).limit(1)).one_or_none()
+        if record is None:
+            return None
+        return dict(record._mapping)
+
+
+class RecordDataLoad(action.ControllerAction):
+    """ Records fingerprint of a finished load """
+    def execute(
+            self, file_name: str, file_size: int, file_sha256: str,
+            delete_missing: bool
+    ):
+        session = self.get_session()
+        session.add(src.model.load.DataLoad(
+            file_name=file_name, file_size=file_size,
+            file_sha256=file_sha256, delete_missing=delete_missing
+        ))
+        self.commit(session)
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
+
+
+class MovieContentHashes(action.ControllerAction):
+    """ Returns content hashes of loaded movies """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self) -> Dict[Tuple[str, str], Tuple[int, str]]:
+        """
+        :return: Map of movie (lower title, year) key to its pk and content
+            hash, for movies that have one
+        """
+        session = self.get_session()
+        movie_table = src.model.movie.Movie.__table__
+        hash_table = src.model.load.MovieContentHash.__table__
+        records = session.execute(sqlalchemy.select(
+            movie_table.c.pk, movie_table.c.movie_title,
+            movie_table.c.title_year, hash_table.c.content_hash
+        ).join_from(
+            movie_table, hash_table,
+            movie_table.c.pk == hash_table.c.movie_pk
+        ))
+        return {
+            (movie_title.lower(), title_year): (movie_pk, content_hash)
+            for movie_pk, movie_title, title_year, content_hash in records
+        }
+
+
+class SetMovieContentHashes(action.ControllerAction):
+    """ Sets content hashes of movies, replacing their old ones """
+    def execute(self, content_hashes: Dict[int, str]):
+        """
+        :param content_hashes: Map of movie pk to content hash
+        """
+        session = self.get_session()
+        table = src.model.load.MovieContentHash.__table__
+        movie_pks = sorted(content_hashes)
+
+        chunk_size = src.controller.fields.IN_QUERY_CHUNK_SIZE
+        for start in range(0, len(movie_pks), chunk_size):
+            session.execute(table.delete().where(
+                table.c.movie_pk.in_(movie_pks[start:start+chunk_size])
+            ))
+        if movie_pks:
+            session.execute(table.insert(), [
+                {'movie_pk': movie_pk, 'content_hash': content_hashes[movie_pk]}
+                for movie_pk in movie_pks
+            ])
+        self.commit(session)
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
@@ -0,0 +1,316 @@
+""" In-memory profit rankings over NumPy arrays
+
+Alternative to the SQL summary tables behind stats.GenreProfit and
+stats.PersonProfit. The movie budget and gross columns, and the genre,
+actor and director relations, are loaded into arrays once per data version
+and kept in memory. Each ranking is then one vectorized pass over them.
+
+Groups of movies are kept in CSR layout: the movies of group i are
+movie_index[indptr[i]:indptr[i+1]], positions into the movie arrays.
+"""
+import abc
+import collections
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import sqlalchemy
+
+from src.controller import action
+import src.controller.version
+import src.model.common
+import src.model.fields
+import src.model.movie
+import src.model.person
+
+
+#: Movie groups in CSR layout
+#: names: Array of group names
+#: indptr: Array of each group's start in movie_index, plus the end
+#: movie_index: Array of movie positions, grouped
+MovieGroups = collections.namedtuple(
+    'MovieGroups', ['names', 'indptr', 'movie_index']
+)
+
+
+def fetch_columns(session, select, dtypes: List[str]) -> List[np.ndarray]:
+    """ Returns an array of each column of select, which has no NULL values
+
+    Rows are read from the DBAPI cursor straight into arrays, without
+    building row objects.
+    """
+    connection = session.connection()
+    statement = str(select.compile(dialect=connection.dialect))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(statement)
+        if len(dtypes) == 1:
+            return [np.fromiter(
+                (row[0] for row in cursor), dtype=dtypes[0]
+            )]
+        values = np.array(cursor.fetchall(), dtype=object)
+    finally:
+        cursor.close()
+
+    if len(values) == 0:
+        values = values.reshape(0, len(dtypes))
+    return [
+        values[:, column].astype(dtype) for column, dtype in enumerate(dtypes)
+    ]
+
+
+def fetch_pairs(session, select) -> Tuple[np.ndarray, np.ndarray]:
+    """ Returns arrays of the two integer columns of select """
+    connection = session.connection()
+    statement = str(select.compile(dialect=connection.dialect))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(statement)
+        values = np.fromiter(
+            itertools.chain.from_iterable(cursor), dtype='int64'
+        ).reshape(-1, 2)
+    finally:
+        cursor.close()
+    return values[:, 0], values[:, 1]
+
+
+def get_positions(sorted_pks: np.ndarray, pks: np.ndarray) -> np.ndarray:
+    """ Returns position of each pk in sorted_pks, which contains them all """
+    num_pks = len(sorted_pks)
+    if num_pks and sorted_pks[-1] - sorted_pks[0] == num_pks - 1:
+        # Pks without gaps, as after a fresh load
+        return pks - sorted_pks[0]
+    return np.searchsorted(sorted_pks, pks)
+
+
+def get_unique_keys(*keys: np.ndarray) -> np.ndarray:
+    """ Returns sorted union of key arrays """
+    keys = np.sort(np.concatenate(keys), kind='stable')
+    if len(keys) == 0:
+        return keys
+    is_first = np.empty(len(keys), dtype=bool)
+    is_first[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=is_first[1:])
+    return keys[is_first]
+
+
+def get_pair_keys(
+        group_positions: np.ndarray, movie_positions: np.ndarray,
+        num_movies: int
+) -> np.ndarray:
+    """ Returns int64 key of each (group, movie) position pair, ordered by
+    group then movie
+    """
+    return (
+        np.asarray(group_positions, dtype='int64') * num_movies
+        + np.asarray(movie_positions, dtype='int64')
+    )
+
+
+def build_groups(
+        names: np.ndarray, pair_keys: np.ndarray, num_movies: int
+) -> MovieGroups:
+    """ Builds CSR groups from sorted, distinct pair keys
+
+    :param names: Array of group names, in group position order
+    :param pair_keys: Keys from get_pair_keys(), sorted
+    :param num_movies: Number of movies the keys were made with
+    """
+    group_positions = pair_keys // num_movies
+    indptr = np.zeros(len(names) + 1, dtype='int64')
+    np.cumsum(
+        np.bincount(group_positions, minlength=len(names)), out=indptr[1:]
+    )
+    return MovieGroups(names, indptr, pair_keys % num_movies)
+
+
+class ProfitArrays(object):
+    """ Movie profits, with genre and person groups of movies """
+    def __init__(
+            self, profits: np.ndarray, genres: MovieGroups,
+            persons: MovieGroups
+    ):
+        """
+        :param profits: Profit of each movie, nan where gross or budget is
+            missing
+        :param genres: Movies of each genre
+        :param persons: Movies each person acted in or directed
+        """
+        self.profits = profits
+        self.genres = genres
+        self.persons = persons
+
+    @classmethod
+    def load(cls, session) -> 'ProfitArrays':
+        """ Loads arrays from database """
+        movie = src.model.movie.Movie.__table__
+        movie_genres = src.model.common.movie_genres
+        movie_actors = src.model.common.movie_actors
+        genre = src.model.fields.Genre.__table__
+        person = src.model.person.Person.__table__
+
+        # Movies, genres and persons are numbered by their position in pk
+        # order
+        movie_pks, = fetch_columns(session, sqlalchemy.select(
+            movie.c.pk
+        ).order_by(movie.c.pk), ['int64'])
+        num_movies = len(movie_pks)
+
+        profit_pks, profit_values = fetch_columns(session, sqlalchemy.select(
+            movie.c.pk, movie.c.gross - movie.c.budget
+        ).where(
+            movie.c.gross.isnot(None), movie.c.budget.isnot(None)
+        ), ['int64', 'float64'])
+        profits = np.full(num_movies, np.nan)
+        profits[get_positions(movie_pks, profit_pks)] = profit_values
+
+        genre_pks, genre_names = fetch_columns(session, sqlalchemy.select(
+            genre.c.pk, genre.c.name
+        ).order_by(genre.c.pk), ['int64', object])
+        genre_pair_pks, genre_movie_pks = fetch_pairs(
+            session, sqlalchemy.select(
+                movie_genres.c.genre_pk, movie_genres.c.movie_pk
+            )
+        )
+
+        person_pks, person_names = fetch_columns(session, sqlalchemy.select(
+            person.c.pk, person.c.name
+        ).order_by(person.c.pk), ['int64', object])
+        actor_pks, acted_movie_pks = fetch_pairs(session, sqlalchemy.select(
+            movie_actors.c.actor_pk, movie_actors.c.movie_pk
+        ))
+        director_pks, directed_movie_pks = fetch_pairs(
+            session, sqlalchemy.select(
+                movie.c.director_pk, movie.c.pk
+            ).where(movie.c.director_pk.isnot(None))
+        )
+
+        # Persons who acted in and directed a movie count it once, so the
+        # union of both pair sets is taken over combined pair keys
+        person_keys = get_unique_keys(
+            get_pair_keys(
+                get_positions(person_pks, actor_pks),
+                get_positions(movie_pks, acted_movie_pks), num_movies
+            ),
+            get_pair_keys(
+                get_positions(person_pks, director_pks),
+                get_positions(movie_pks, directed_movie_pks), num_movies
+            )
+        )
+        genre_keys = np.sort(get_pair_keys(
+            get_positions(genre_pks, genre_pair_pks),
+            get_positions(movie_pks, genre_movie_pks), num_movies
+        ))
+
+        return cls(
+            profits,
+            build_groups(genre_names, genre_keys, num_movies),
+            build_groups(person_names, person_keys, num_movies)
+        )
+
+
+def get_group_profits(
+        groups: MovieGroups, profits: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """ Returns each group's number of movies with a profit, and their mean
+    profit (nan for groups without any)
+    """
+    pair_profits = profits[groups.movie_index]
+    has_profit = ~np.isnan(pair_profits)
+    pair_profits[~has_profit] = 0
+
+    # reduceat sums from each start to the next, so empty groups are left
+    # out of the starts and keep zero
+    counts = np.zeros(len(groups.names), dtype='int64')
+    totals = np.zeros(len(groups.names))
+    non_empty = np.flatnonzero(np.diff(groups.indptr))
+    if len(non_empty):
+        starts = groups.indptr[non_empty]
+        counts[non_empty] = np.add.reduceat(has_profit, starts, dtype='int64')
+        totals[non_empty] = np.add.reduceat(pair_profits, starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return counts, totals / counts
+
+
+def rank_groups(
+        names: np.ndarray, values: np.ndarray, limit: Optional[int]
+) -> Dict[str, float]:
+    """ Returns ordered map of name to value, highest first, with name
+    breaking ties like the SQL rankings. Nan values are left out.
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    if limit is not None and limit < len(positions):
+        # Only sort the top values, plus any tied with the last of them
+        threshold = -np.partition(-values[positions], limit - 1)[limit - 1]
+        positions = positions[values[positions] >= threshold]
+
+    positions = positions[
+        np.lexsort((names[positions], -values[positions]))
+    ][:limit]
+    return collections.OrderedDict(
+        zip(names[positions].tolist(), values[positions].tolist())
+    )
+
+
+#: Map of database url to data version stamp and its loaded arrays
+_loaded_arrays = {}
+_loaded_arrays_lock = threading.Lock()
+
+
+def get_profit_arrays(action_instance: action.ControllerAction):
+    """ Returns profit arrays of the action's database, loading them when
+    the data version changed since they were last loaded
+    """
+    session = action_instance.get_session()
+    url = str(session.get_bind().url)
+    stamp = src.controller.version.CurrentDataVersion(
+        action_instance.logger, session=session
+    ).query()
+
+    with _loaded_arrays_lock:
+        loaded = _loaded_arrays.get(url)
+        if loaded is not None and stamp is not None and loaded[0] == stamp:
+            return loaded[1]
+
+        action_instance.logger.info('Loading profit arrays')
+        arrays = ProfitArrays.load(session)
+        _loaded_arrays[url] = (stamp, arrays)
+        return arrays
+
+
+class MemoryGenreProfit(action.ControllerAction):
+    """ Returns mapping of genres to profitability, like stats.GenreProfit,
+    computed from in-memory arrays
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self, limit: Optional[int]=None) -> Dict[str, float]:
+        """
+        :param limit: Optional number of most profitable genres to return
+        :return: Ordered map of genre name to average profit, descending
+        """
+        arrays = get_profit_arrays(self)
+        _, means = get_group_profits(arrays.genres, arrays.profits)
+        return rank_groups(arrays.genres.names, means, limit)
+
+
+class MemoryPersonProfit(action.ControllerAction):
+    """ Returns mapping of directors/actors to profitability, like
+    stats.PersonProfit, computed from in-memory arrays
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self, limit: Optional[int]=None) -> Dict[str, float]:
+        """
+        :param limit: Optional number of most profitable persons to return
+        :return: Ordered map of person name to average profit, descending
+        """
+        arrays = get_profit_arrays(self)
+        _, means = get_group_profits(arrays.persons, arrays.profits)
+        return rank_groups(arrays.persons.names, means, limit)
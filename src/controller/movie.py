@@ -1,8 +1,13 @@
 import abc
+import collections
 import sqlalchemy
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from src.controller import action
+import src.controller.cache
+import src.controller.fields
+import src.model.common
+import src.model.load
 import src.model.movie
 import src.model.fields
 import src.model.person
@@ -69,23 +74,419 @@ class AddMovie(action.ControllerAction):
         pass
 
 
+def get_movie_key(movie_fields) -> Tuple[str, str]:
+    """ Returns (lower case title, year) key identifying a movie """
+    return movie_fields['movie_title'].lower(), movie_fields['title_year']
+
+
+#: Translation table lower casing only ASCII letters, like sqlite's lower()
+SQL_LOWER_TABLE = str.maketrans(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'
+)
+
+
+def get_sql_lower(text: str) -> str:
+    """ Lower cases text the same way sqlite's lower() function does
+
+    Used to match titles in SQL; non-ASCII letters are compared afterwards.
+    """
+    return text.translate(SQL_LOWER_TABLE)
+
+
+def get_title_condition(movie_title: str):
+    """ Returns SQL condition matching movie titles to a title, ignoring case
+
+    ASCII titles are matched on lower(movie_title), using its index. The
+    case of other letters can't be folded in sqlite, so titles with them
+    match any letter in their place, and callers should compare the titles
+    afterwards.
+    """
+    lower_title = sqlalchemy.func.lower(src.model.movie.Movie.movie_title)
+    sql_title = get_sql_lower(movie_title)
+    if sql_title.isascii():
+        return lower_title == sql_title
+
+    pattern = ''.join(
+        char if char.isascii() else '_'
+        for char in sql_title.replace(
+            '\\', '\\\\'
+        ).replace('%', '\\%').replace('_', '\\_')
+    )
+    return lower_title.like(pattern, escape='\\')
+
+
+#: Default number of rows sent per executemany batch
+DEFAULT_BATCH_SIZE = 500
+
+#: Movie columns written by bulk loads, besides title and year
+MOVIE_VALUE_FIELDS = (
+    'content_rating_pk', 'country_pk', 'director_pk', 'language_pk',
+    'movie_color_pk', 'aspect_ratio', 'budget', 'cast_facebook_likes',
+    'duration', 'facenum', 'gross', 'imdb_id', 'imdb_score',
+    'movie_facebook_likes', 'num_critic_for_reviews', 'num_user_for_reviews',
+    'num_voted_users'
+)
+
+#: Movie stat columns, ie value fields that aren't foreign keys
+MOVIE_STAT_FIELDS = tuple(
+    field for field in MOVIE_VALUE_FIELDS if not field.endswith('_pk')
+)
+
+
+#: Result of a bulk movie write
+#: movie_pks: Map of every written movie's (lower title, year) key to its pk
+#: changed_pks: Pks of movies that were inserted or had some value changed
+#: replaced_director_pks: Pks of directors replaced on updated movies
+MovieChanges = collections.namedtuple(
+    'MovieChanges', ['movie_pks', 'changed_pks', 'replaced_director_pks']
+)
+
+#: Result of a bulk association write
+#: attached: (movie_pk, other_pk) pairs that were newly attached
+#: detached: Pairs removed from movies whose pairs were replaced
+PairChanges = collections.namedtuple('PairChanges', ['attached', 'detached'])
+
+
+def get_existing_movies_select(titles: Iterable[str], years: Iterable[str]):
+    """ Returns select of pk, title, year and value fields of movies matching
+    any of the titles and years
+
+    Titles are matched case-insensitively on lower(movie_title), which the
+    ix_movie_lower_title_year index covers. Can match extra movies, so
+    callers should filter by get_movie_key().
+    """
+    movie_table = src.model.movie.Movie.__table__
+    lower_title = sqlalchemy.func.lower(movie_table.c.movie_title)
+    return sqlalchemy.select(
+        movie_table.c.pk, movie_table.c.title_year,
+        movie_table.c.movie_title,
+        *[movie_table.c[field] for field in MOVIE_VALUE_FIELDS]
+    ).where(
+        lower_title.in_({get_sql_lower(title) for title in titles})
+    ).where(
+        movie_table.c.title_year.in_(set(years))
+    )
+
+
+def query_existing_movies(
+        session, movie_rows: List[Dict]
+) -> Dict[Tuple[str, str], Dict]:
+    """ Returns map of (lower title, year) to field dict of the rows' movies
+    that are in the database
+    """
+    records = session.execute(get_existing_movies_select(
+        {row['movie_title'] for row in movie_rows},
+        {row['title_year'] for row in movie_rows}
+    ))
+    movie_keys = {get_movie_key(row) for row in movie_rows}
+    existing_records = {}
+    for record in records.mappings():
+        movie_key = get_movie_key(record)
+        if movie_key in movie_keys:
+            existing_records[movie_key] = dict(record)
+    return existing_records
+
+
+def insert_movie_rows(
+        session, movie_rows: List[Dict]
+) -> Dict[Tuple[str, str], int]:
+    """ Inserts movie rows, returning map of their (lower title, year) keys
+    to new pks
+
+    Rows go in with one executemany, and their pks are looked up with one
+    select. Drivers like sqlite3 can't match the rows returned by an
+    executemany to its parameters, so inserting with RETURNING would cost an
+    insert per row.
+    """
+    session.execute(src.model.movie.Movie.__table__.insert(), movie_rows)
+    return {
+        movie_key: record['pk']
+        for movie_key, record in query_existing_movies(
+            session, movie_rows
+        ).items()
+    }
+
+
+def get_attached_pairs_select(table, other_column: str, movie_pks: List[int]):
+    """ Returns select of (movie_pk, other_pk) pairs in association table
+    for the given movies
+    """
+    return sqlalchemy.select(
+        table.c.movie_pk, table.c[other_column]
+    ).where(table.c.movie_pk.in_(movie_pks))
+
+
+class BulkAddMovies(action.ControllerAction):
+    """ Adds movie records in batches, updating the ones that already exist
+
+    Takes rows of movie column values keyed by model field name. Like
+    AddMovie, existing records are matched by lower case title and year.
+    Each batch costs one lookup query plus one executemany insert and one
+    executemany update, instead of a query and flush per movie. Existing
+    movies whose values are unchanged are left alone. Pks of new movies are
+    looked up with a second query after the insert.
+    """
+    def execute(
+            self, movie_rows: List[Dict],
+            batch_size: int=DEFAULT_BATCH_SIZE
+    ) -> MovieChanges:
+        """
+        :param movie_rows: List of movie field dicts, with unique title+year
+        :param batch_size: Number of rows to send to the database at once
+        :return: Pks of all given and changed movies, and of directors they
+            no longer have
+        """
+        session = self.get_session()
+        movie_table = src.model.movie.Movie.__table__
+        changes = MovieChanges({}, set(), set())
+
+        update_statement = movie_table.update().where(
+            movie_table.c.pk == sqlalchemy.bindparam('b_pk')
+        ).values({
+            field: sqlalchemy.bindparam('b_' + field)
+            for field in ('movie_title', ) + MOVIE_VALUE_FIELDS
+        })
+
+        for start in range(0, len(movie_rows), batch_size):
+            batch = movie_rows[start:start+batch_size]
+            existing_records = query_existing_movies(session, batch)
+
+            new_rows = []
+            old_rows = []
+            for row in batch:
+                movie_key = get_movie_key(row)
+                old_record = existing_records.get(movie_key)
+                if old_record is None:
+                    new_rows.append(row)
+                    continue
+
+                changes.movie_pks[movie_key] = old_record['pk']
+                if any(
+                        old_record[field] != row[field]
+                        for field in ('movie_title', ) + MOVIE_VALUE_FIELDS
+                ):
+                    old_row = {'b_' + k: v for k, v in row.items()}
+                    old_row['b_pk'] = old_record['pk']
+                    old_rows.append(old_row)
+
+                    changes.changed_pks.add(old_record['pk'])
+                    if old_record['director_pk'] != row['director_pk']:
+                        changes.replaced_director_pks.add(
+                            old_record['director_pk']
+                        )
+
+            if new_rows:
+                new_pks = insert_movie_rows(session, new_rows)
+                changes.changed_pks.update(new_pks.values())
+                changes.movie_pks.update(new_pks)
+            if old_rows:
+                session.execute(update_statement, old_rows)
+
+            self.logger.info(
+                'Inserted %s and updated %s movie records' % (
+                    len(new_rows), len(old_rows)
+                )
+            )
+
+        changes.replaced_director_pks.discard(None)
+        self.commit(session)
+        return changes
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
+
+
+class MovieKeyLookup(src.controller.fields.SortedLookup):
+    """ SortedLookup of movie (lower case title, year) keys, each stored as
+    a single string rather than a tuple of two
+    """
+    #: Between title and year of stored keys, a character titles lack
+    KEY_SEPARATOR = '\0'
+
+    def encode_key(self, key: Tuple[str, str]) -> str:
+        title, year = key
+        return title + self.KEY_SEPARATOR + year
+
+    def decode_key(self, key: str) -> Tuple[str, str]:
+        title, year = key.rsplit(self.KEY_SEPARATOR, 1)
+        return title, year
+
+
 class MovieLookupIndex(action.ControllerAction):
-    """ Action to build lookup table of movie (title, year) tuple to id """
+    """ Action to build lookup table of movie (title, year) tuple to id
+
+    Built from a stream of title, year and pk columns rather than whole
+    records.
+    """
     @abc.abstractmethod
     def execute(self, **kwargs):
         pass
 
-    def query(self):
+    def query(self) -> MovieKeyLookup:
+        session = self.get_session()
+        movie_table = src.model.movie.Movie.__table__
+        rows = src.controller.fields.stream_rows(session, sqlalchemy.select(
+            movie_table.c.movie_title, movie_table.c.title_year,
+            movie_table.c.pk
+        ).order_by(movie_table.c.pk))
+        return MovieKeyLookup(
+            ((title.lower(), title_year), pk)
+            for title, title_year, pk in rows
+        )
+
+
+class DeleteMovies(action.ControllerAction):
+    """ Deletes movies, with their genre, keyword and actor mappings and
+    content hashes
+
+    Genres, keywords and persons themselves are kept.
+    """
+    def execute(self, movie_pks: Iterable[int]):
+        session = self.get_session()
+        movie_pks = sorted(movie_pks)
+        movie_table = src.model.movie.Movie.__table__
+        # Rows referring to movies go first
+        movie_columns = (
+            src.model.common.movie_genres.c.movie_pk,
+            src.model.common.movie_keywords.c.movie_pk,
+            src.model.common.movie_actors.c.movie_pk,
+            src.model.load.MovieContentHash.__table__.c.movie_pk,
+            movie_table.c.pk,
+        )
+
+        chunk_size = src.controller.fields.IN_QUERY_CHUNK_SIZE
+        for start in range(0, len(movie_pks), chunk_size):
+            chunk = movie_pks[start:start+chunk_size]
+            for column in movie_columns:
+                session.execute(
+                    column.table.delete().where(column.in_(chunk))
+                )
+
+        self.logger.info('Deleted %s movie records' % len(movie_pks))
+        self.commit(session)
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
+
+
+class BulkAttachMovieBaseClass(action.ControllerAction):
+    """ Base class for attaching records to movies in bulk
+
+    Works straight on the association table with (movie_pk, other_pk) pairs,
+    without loading any ORM objects. Pairs already in the table, or repeated
+    in the input, are skipped. Movies given as replaced end up with exactly
+    the given pairs: their other pairs are removed.
+    """
+    def execute_attach(
+            self, pairs: Iterable[Tuple[int, int]], table, other_column,
+            replaced_movie_pks: Iterable[int]=()
+    ) -> PairChanges:
+        """
+        :param pairs: Iterable of (movie_pk, other_pk) pairs to attach
+        :param table: Association table
+        :param other_column: Name of the table's non-movie pk column
+        :param replaced_movie_pks: Pks of movies whose pairs that aren't
+            given are removed, eg movies whose records changed
+        :return: Lists of pairs that were newly attached and removed
+        """
         session = self.get_session()
-        return {
-            (record.movie_title.lower(), record.title_year): record.pk
-            for record in session.query(src.model.movie.Movie).all()
-        }
+        pairs = list(dict.fromkeys(pairs))
+        replaced_movie_pks = set(replaced_movie_pks)
+        movie_pks = sorted(
+            {movie_pk for movie_pk, _ in pairs} | replaced_movie_pks
+        )
+
+        # Fetch pairs already attached to the movies
+        existing_pairs = set()
+        chunk_size = src.controller.fields.IN_QUERY_CHUNK_SIZE
+        for start in range(0, len(movie_pks), chunk_size):
+            existing_pairs.update(
+                tuple(pair) for pair in session.execute(
+                    get_attached_pairs_select(
+                        table, other_column, movie_pks[start:start+chunk_size]
+                    )
+                )
+            )
+
+        given_pairs = set(pairs)
+        old_pairs = sorted(
+            pair for pair in existing_pairs
+            if pair[0] in replaced_movie_pks and pair not in given_pairs
+        )
+        if old_pairs:
+            session.execute(
+                table.delete().where(
+                    table.c.movie_pk == sqlalchemy.bindparam('b_movie_pk')
+                ).where(
+                    table.c[other_column] == sqlalchemy.bindparam('b_other_pk')
+                ),
+                [
+                    {'b_movie_pk': movie_pk, 'b_other_pk': other_pk}
+                    for movie_pk, other_pk in old_pairs
+                ]
+            )
+
+        new_pairs = [pair for pair in pairs if pair not in existing_pairs]
+        if new_pairs:
+            session.execute(table.insert(), [
+                {'movie_pk': movie_pk, other_column: other_pk}
+                for movie_pk, other_pk in new_pairs
+            ])
+
+        self.commit(session)
+        return PairChanges(new_pairs, old_pairs)
+
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
+
+
+class BulkAttachMovieGenres(BulkAttachMovieBaseClass):
+    """ Attaches (movie_pk, genre_pk) pairs. Records must exist in db. """
+    def execute(
+            self, pairs: Iterable[Tuple[int, int]],
+            replaced_movie_pks: Iterable[int]=()
+    ) -> PairChanges:
+        return self.execute_attach(
+            pairs, src.model.common.movie_genres, 'genre_pk',
+            replaced_movie_pks
+        )
+
+
+class BulkAttachMoviePlotKeywords(BulkAttachMovieBaseClass):
+    """ Attaches (movie_pk, keyword_pk) pairs. Records must exist in db. """
+    def execute(
+            self, pairs: Iterable[Tuple[int, int]],
+            replaced_movie_pks: Iterable[int]=()
+    ) -> PairChanges:
+        return self.execute_attach(
+            pairs, src.model.common.movie_keywords, 'keyword_pk',
+            replaced_movie_pks
+        )
+
+
+class BulkAttachMovieActors(BulkAttachMovieBaseClass):
+    """ Attaches (movie_pk, actor_pk) pairs. Records must exist in db. """
+    def execute(
+            self, pairs: Iterable[Tuple[int, int]],
+            replaced_movie_pks: Iterable[int]=()
+    ) -> PairChanges:
+        return self.execute_attach(
+            pairs, src.model.common.movie_actors, 'actor_pk',
+            replaced_movie_pks
+        )
 
 
 class AttachMovieGenre(action.ControllerAction):
     """ Attaches genres to movie. Records must exist in db. """
-    def execute(self, movie_pk: int, genre_pks: List[int]):
+    def execute(self, movie_pk: int, genre_pks: List[int]) -> List[int]:
+        """ Returns pks of records that weren't already attached """
         session = self.get_session()
 
         # Fetch movie record
@@ -98,12 +499,15 @@ class AttachMovieGenre(action.ControllerAction):
             src.model.fields.Genre
         ).filter(src.model.fields.Genre.pk.in_(genre_pks)).all()
 
+        attached_pks = []
         for genre_record in genre_records:
             if genre_record in movie_record.genres:
                 continue
             movie_record.genres.append(genre_record)
+            attached_pks.append(genre_record.pk)
 
         self.commit(session)
+        return attached_pks
 
     @abc.abstractmethod
     def query(self, **kwargs):
@@ -112,7 +516,8 @@ class AttachMovieGenre(action.ControllerAction):
 
 class AttachMoviePlotKeywords(action.ControllerAction):
     """ Attaches keywords to movie. Records must exist in db. """
-    def execute(self, movie_pk: int, keyword_pks: List[int]):
+    def execute(self, movie_pk: int, keyword_pks: List[int]) -> List[int]:
+        """ Returns pks of records that weren't already attached """
         session = self.get_session()
 
         # Fetch movie record
@@ -125,12 +530,15 @@ class AttachMoviePlotKeywords(action.ControllerAction):
             src.model.fields.Keyword
         ).filter(src.model.fields.Keyword.pk.in_(keyword_pks)).all()
 
+        attached_pks = []
         for keyword_record in keyword_records:
             if keyword_record in movie_record.keywords:
                 continue
             movie_record.keywords.append(keyword_record)
+            attached_pks.append(keyword_record.pk)
 
         self.commit(session)
+        return attached_pks
 
     @abc.abstractmethod
     def query(self, **kwargs):
@@ -139,7 +547,8 @@ class AttachMoviePlotKeywords(action.ControllerAction):
 
 class AttachMovieActors(action.ControllerAction):
     """ Attaches actors to movie. Records must exist in db. """
-    def execute(self, movie_pk: int, actor_pks: List[int]):
+    def execute(self, movie_pk: int, actor_pks: List[int]) -> List[int]:
+        """ Returns pks of records that weren't already attached """
         session = self.get_session()
 
         # Fetch movie record
@@ -152,13 +561,96 @@ class AttachMovieActors(action.ControllerAction):
             src.model.person.Person
         ).filter(src.model.person.Person.pk.in_(actor_pks)).all()
 
+        attached_pks = []
         for person_record in person_records:
             if person_record in movie_record.actors:
                 continue
             movie_record.actors.append(person_record)
+            attached_pks.append(person_record.pk)
 
         self.commit(session)
+        return attached_pks
 
     @abc.abstractmethod
     def query(self, **kwargs):
         pass
+
+
+class FindMovies(action.ControllerAction):
+    """ Looks up movies by title, along with names of their category fields,
+    genres, plot keywords and actors
+
+    Results are cached until the next load.
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    @src.controller.cache.cached_query
+    def query(
+            self, movie_title: str, title_year: Optional[str]=None
+    ) -> List[Dict]:
+        """
+        :param movie_title: Title to match, ignoring case
+        :param title_year: Optional year to match, as stored (eg '2009.0')
+        :return: List of movie field dicts, ordered by year
+        """
+        session = self.get_session()
+        movie = src.model.movie.Movie
+        fields = src.model.fields
+        person = src.model.person.Person
+        movie_title = movie_title.strip()
+
+        select = sqlalchemy.select(
+            movie.pk, movie.movie_title, movie.title_year,
+            person.name.label('director'),
+            fields.ContentRating.name.label('content_rating'),
+            fields.Country.name.label('country'),
+            fields.Language.name.label('language'),
+            fields.MovieColor.name.label('color'),
+            *[getattr(movie, field) for field in MOVIE_STAT_FIELDS]
+        ).outerjoin(
+            person, person.pk == movie.director_pk
+        ).outerjoin(
+            fields.ContentRating,
+            fields.ContentRating.pk == movie.content_rating_pk
+        ).outerjoin(
+            fields.Country, fields.Country.pk == movie.country_pk
+        ).outerjoin(
+            fields.Language, fields.Language.pk == movie.language_pk
+        ).outerjoin(
+            fields.MovieColor, fields.MovieColor.pk == movie.movie_color_pk
+        ).where(
+            get_title_condition(movie_title)
+        ).order_by(movie.title_year, movie.pk)
+        if title_year is not None:
+            select = select.where(movie.title_year == title_year)
+
+        # SQL only lower cases ASCII, so compare full titles here
+        movies = [
+            dict(record) for record in session.execute(select).mappings()
+            if record['movie_title'].lower() == movie_title.lower()
+        ]
+
+        movie_pks = [movie_fields['pk'] for movie_fields in movies]
+        for key, table, other_column, model in (
+                ('genres', src.model.common.movie_genres, 'genre_pk',
+                 fields.Genre),
+                ('plot_keywords', src.model.common.movie_keywords,
+                 'keyword_pk', fields.Keyword),
+                ('actors', src.model.common.movie_actors, 'actor_pk', person),
+        ):
+            movie_names = collections.defaultdict(list)
+            for movie_pk, name in session.execute(sqlalchemy.select(
+                table.c.movie_pk, model.name
+            ).join(
+                model, model.pk == table.c[other_column]
+            ).where(
+                table.c.movie_pk.in_(movie_pks)
+            ).order_by(model.name)):
+                movie_names[movie_pk].append(name)
+
+            for movie_fields in movies:
+                movie_fields[key] = movie_names[movie_fields['pk']]
+
+        return movies
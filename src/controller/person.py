@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Mapping
 
 from src.controller import fields
 import src.model.person
@@ -10,11 +10,11 @@ class AddPersons(fields.AddMovieFieldBaseClass):
     Kludgy to use fields controller as base class, but given
     time constraints it'll do.
     """
-    def execute(self, person_names: List[str]):
-        self.execute_add(person_names, src.model.person.Person, 'person')
+    def execute(self, person_names: List[str]) -> Dict[str, int]:
+        return self.execute_add(person_names, src.model.person.Person, 'person')
 
 
 class PersonIndexLookup(fields.MovieFieldIndexLookup):
     """ Looks up person id by name """
-    def query(self) -> Dict[str, int]:
+    def query(self) -> Mapping[str, int]:
         return self.query_index_lookup(src.model.person.Person)
@@ -0,0 +1,284 @@
+""" Generic rankings of movie groups by an aggregate of a movie metric
+
+A ranking is given by the dimension movies are grouped by, eg genre or
+country, a metric of each movie, eg profit or imdb_score, and the aggregate
+of the metric over each group's movies. Every combination compiles to a
+single aggregate query.
+"""
+import abc
+import collections
+from typing import Dict, Optional
+
+import sqlalchemy
+
+from src.controller import action
+from src.controller import cache
+import src.controller.stats
+import src.model.common
+import src.model.fields
+import src.model.movie
+import src.model.person
+import src.model.stats
+
+
+#: Dimensions that are a column of movie, to that column's name and the
+#: model class of group names, None where the column is the name
+MOVIE_COLUMN_DIMENSIONS = {
+    'color': ('movie_color_pk', src.model.fields.MovieColor),
+    'content_rating': ('content_rating_pk', src.model.fields.ContentRating),
+    'country': ('country_pk', src.model.fields.Country),
+    'director': ('director_pk', src.model.person.Person),
+    'language': ('language_pk', src.model.fields.Language),
+    'year': ('title_year', None),
+}
+
+#: Dimensions that are a movie association table, to that table, its group
+#: column's name and the model class of group names
+ASSOCIATION_DIMENSIONS = {
+    'actor': (
+        src.model.common.movie_actors, 'actor_pk', src.model.person.Person
+    ),
+    'genre': (
+        src.model.common.movie_genres, 'genre_pk', src.model.fields.Genre
+    ),
+    'keyword': (
+        src.model.common.movie_keywords, 'keyword_pk',
+        src.model.fields.Keyword
+    ),
+}
+
+#: Dimensions movies can be grouped by. Persons are grouped by movies they
+#: acted in or directed, each counted once.
+DIMENSIONS = tuple(sorted(
+    list(MOVIE_COLUMN_DIMENSIONS) + list(ASSOCIATION_DIMENSIONS) + ['person']
+))
+
+#: Numeric movie columns usable as metrics
+METRIC_COLUMNS = (
+    'aspect_ratio', 'budget', 'cast_facebook_likes', 'duration', 'facenum',
+    'gross', 'imdb_score', 'movie_facebook_likes', 'num_critic_for_reviews',
+    'num_user_for_reviews', 'num_voted_users',
+)
+
+#: Metrics of movies. profit is gross minus budget, and roi is gross per
+#: unit of budget.
+METRICS = ('profit', 'roi') + METRIC_COLUMNS
+
+#: Aggregates of a group's metric values. count is the number of movies
+#: with a value.
+AGGREGATES = ('avg', 'count', 'median', 'sum')
+
+#: Dimensions with profit summary tables kept up to date by load-data, to
+#: the summary class and its group column's name
+SUMMARY_DIMENSIONS = {
+    'genre': (src.model.stats.GenreProfitSummary, 'genre_pk'),
+    'person': (src.model.stats.PersonProfitSummary, 'person_pk'),
+}
+
+#: Aggregates of profit read from summary table columns
+SUMMARY_AGGREGATES = {
+    'avg': 'avg_profit',
+    'count': 'num_movies',
+    'sum': 'total_profit',
+}
+
+
+def get_metric_column(metric: str):
+    """ Returns SQL expression of movie metric, null if not applicable """
+    movie = src.model.movie.Movie
+    if metric == 'profit':
+        return src.controller.stats.get_movie_profit_column()
+    elif metric == 'roi':
+        return sqlalchemy.case((movie.budget > 0, movie.gross / movie.budget))
+    elif metric in METRIC_COLUMNS:
+        return getattr(movie, metric)
+    raise ValueError('Unknown metric "%s", expected one of: %s' % (
+        metric, ', '.join(METRICS)
+    ))
+
+
+def get_dimension_source(dimension: str):
+    """ Returns source of (group, movie) pairs of dimension, its group and
+    movie columns, and the model class of group names, None where the group
+    column is the name
+    """
+    movie_table = src.model.movie.Movie.__table__
+    if dimension in MOVIE_COLUMN_DIMENSIONS:
+        column_name, name_class = MOVIE_COLUMN_DIMENSIONS[dimension]
+        return (
+            movie_table, movie_table.c[column_name], movie_table.c.pk,
+            name_class
+        )
+    elif dimension in ASSOCIATION_DIMENSIONS:
+        table, column_name, name_class = ASSOCIATION_DIMENSIONS[dimension]
+        return table, table.c[column_name], table.c.movie_pk, name_class
+    elif dimension == 'person':
+        person_movies = src.controller.stats.get_person_movies_subquery()
+        return (
+            person_movies, person_movies.c.person_pk,
+            person_movies.c.movie_pk, src.model.person.Person
+        )
+    raise ValueError('Unknown dimension "%s", expected one of: %s' % (
+        dimension, ', '.join(DIMENSIONS)
+    ))
+
+
+def get_values_select(source, group_column, movie_column, metric: str):
+    """ Returns select of group key and metric value of each (group, movie)
+    pair with both set
+    """
+    movie_table = src.model.movie.Movie.__table__
+    value = get_metric_column(metric)
+    select = sqlalchemy.select(
+        group_column.label('group_key'), value.label('value')
+    ).select_from(source)
+
+    # Movie column dimensions already select from the movie table
+    if source is not movie_table:
+        select = select.join(movie_table, movie_table.c.pk == movie_column)
+    return select.where(group_column.isnot(None), value.isnot(None))
+
+
+def get_aggregate_select(values, aggregate: str):
+    """ Returns select of group key, number of values and their aggregate,
+    from subquery of group keys and values
+    """
+    if aggregate == 'median':
+        ordered = sqlalchemy.select(
+            values.c.group_key, values.c.value,
+            sqlalchemy.func.row_number().over(
+                partition_by=values.c.group_key, order_by=values.c.value
+            ).label('position'),
+            sqlalchemy.func.count().over(
+                partition_by=values.c.group_key
+            ).label('num_movies')
+        ).subquery()
+
+        # Middle value, or mean of the two middle values of even counts
+        return sqlalchemy.select(
+            ordered.c.group_key,
+            sqlalchemy.func.max(ordered.c.num_movies).label('num_movies'),
+            sqlalchemy.func.avg(ordered.c.value).label('value')
+        ).where(ordered.c.position.between(
+            (ordered.c.num_movies + 1) // 2, ordered.c.num_movies // 2 + 1
+        )).group_by(ordered.c.group_key)
+
+    functions = {
+        'avg': sqlalchemy.func.avg,
+        'count': sqlalchemy.func.count,
+        'sum': sqlalchemy.func.sum,
+    }
+    if aggregate not in functions:
+        raise ValueError('Unknown aggregate "%s", expected one of: %s' % (
+            aggregate, ', '.join(AGGREGATES)
+        ))
+    return sqlalchemy.select(
+        values.c.group_key,
+        sqlalchemy.func.count(values.c.value).label('num_movies'),
+        functions[aggregate](values.c.value).label('value')
+    ).group_by(values.c.group_key)
+
+
+def get_summary_select(dimension: str, aggregate: str):
+    """ Returns select of group key, number of movies and aggregate of
+    profit from dimension's summary table
+    """
+    summary_class, column_name = SUMMARY_DIMENSIONS[dimension]
+    summary_table = summary_class.__table__
+    return sqlalchemy.select(
+        summary_table.c[column_name].label('group_key'),
+        summary_table.c.num_movies,
+        summary_table.c[SUMMARY_AGGREGATES[aggregate]].label('value')
+    )
+
+
+def get_rank_select(
+        dimension: str, metric: str='profit', aggregate: str='avg',
+        min_count: int=1, limit: Optional[int]=None,
+        from_summary: bool=True
+):
+    """ Returns select of group name and aggregate of metric, for groups of
+    dimension with at least min_count movies with the metric, highest first
+
+    Avg, sum and count of profit by genre or person are read from the
+    profit summary tables, unless from_summary is false.
+
+    :param dimension: One of DIMENSIONS
+    :param metric: One of METRICS
+    :param aggregate: One of AGGREGATES
+    :param min_count: Least number of movies with the metric a group needs
+    :param limit: Optional number of groups to return
+    :param from_summary: Whether profit summary tables can be read
+    """
+    source, group_column, movie_column, name_class = get_dimension_source(
+        dimension
+    )
+    if (
+            from_summary and dimension in SUMMARY_DIMENSIONS
+            and metric == 'profit' and aggregate in SUMMARY_AGGREGATES
+    ):
+        aggregates = get_summary_select(dimension, aggregate).subquery()
+    else:
+        values = get_values_select(
+            source, group_column, movie_column, metric
+        )
+        if name_class is None:
+            # Movies without a year have an empty one rather than null,
+            # which isn't a group
+            values = values.where(group_column != '')
+        values = values.subquery()
+        aggregates = get_aggregate_select(values, aggregate).subquery()
+
+    if name_class is None:
+        name_column = aggregates.c.group_key
+        select = sqlalchemy.select(name_column, aggregates.c.value)
+    else:
+        name_column = name_class.name
+        select = sqlalchemy.select(
+            name_column, aggregates.c.value
+        ).join_from(
+            aggregates, name_class, name_class.pk == aggregates.c.group_key
+        )
+
+    if min_count > 1:
+        select = select.where(aggregates.c.num_movies >= min_count)
+    return src.controller.stats.order_profit_select(
+        select, name_column, aggregates.c.value, limit
+    )
+
+
+class GroupRank(action.ControllerAction):
+    """ Returns mapping of groups of a dimension to an aggregate of a movie
+    metric, eg median imdb_score by country
+
+    Profit summary tables that are missing or empty are aggregated from
+    movies instead. Results are cached until the next load.
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    @cache.cached_query
+    def query(
+            self, dimension: str, metric: str='profit', aggregate: str='avg',
+            min_count: int=1, limit: Optional[int]=None
+    ) -> Dict[str, float]:
+        """
+        :param dimension: One of DIMENSIONS
+        :param metric: One of METRICS
+        :param aggregate: One of AGGREGATES
+        :param min_count: Least number of movies with the metric a group
+            needs
+        :param limit: Optional number of groups to return
+        :return: Ordered map of group name to aggregate, descending
+        """
+        session = self.get_session()
+        from_summary = (
+            dimension in SUMMARY_DIMENSIONS
+            and src.controller.stats.HasProfitSummary(
+                self.logger, session=session
+            ).query(SUMMARY_DIMENSIONS[dimension][0])
+        )
+        return collections.OrderedDict(session.execute(get_rank_select(
+            dimension, metric, aggregate, min_count, limit, from_summary
+        )).all())
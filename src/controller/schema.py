@@ -0,0 +1,242 @@
+""" Schema maintenance actions for existing databases """
+import abc
+import collections
+import warnings
+from typing import Dict, List, Set
+
+import sqlalchemy
+import sqlalchemy.exc
+
+from src.controller import action
+import src.controller.movie
+import src.controller.stats
+import src.controller.version
+import src.model.common
+import src.model.db
+import src.model.fields
+import src.model.movie
+import src.model.person
+import src.model.stats
+
+
+#: Example keys plugged into hot query selects when explaining them
+EXAMPLE_PKS = [1, 2, 3]
+EXAMPLE_TITLES = ['Avatar', 'Spectre']
+EXAMPLE_YEARS = ['2009.0', '2015.0']
+
+
+def get_hot_query_selects() -> Dict[str, sqlalchemy.sql.Select]:
+    """ Returns ordered map of name to select, for queries run per batch by
+    data loads or per call by rank views
+    """
+    movie_controller = src.controller.movie
+    stats_controller = src.controller.stats
+    common = src.model.common
+    return collections.OrderedDict((
+        ('existing movies', movie_controller.get_existing_movies_select(
+            EXAMPLE_TITLES, EXAMPLE_YEARS
+        )),
+        ('attached genres', movie_controller.get_attached_pairs_select(
+            common.movie_genres, 'genre_pk', EXAMPLE_PKS
+        )),
+        ('attached keywords', movie_controller.get_attached_pairs_select(
+            common.movie_keywords, 'keyword_pk', EXAMPLE_PKS
+        )),
+        ('attached actors', movie_controller.get_attached_pairs_select(
+            common.movie_actors, 'actor_pk', EXAMPLE_PKS
+        )),
+        ('genre groups', stats_controller.get_genre_groups_select(
+            EXAMPLE_PKS
+        )),
+        ('person groups', stats_controller.get_person_groups_select(
+            EXAMPLE_PKS
+        )),
+        ('genre profit refresh', stats_controller.get_genre_profit_select(
+            EXAMPLE_PKS
+        )),
+        ('person profit refresh', stats_controller.get_person_profit_select(
+            EXAMPLE_PKS
+        )),
+        ('rank genres', stats_controller.get_genre_rank_select(10)),
+        ('rank persons', stats_controller.get_person_rank_select(10)),
+    ))
+
+
+def get_explain_prefix(dialect_name: str) -> str:
+    """ Returns statement prefix for showing query plans in a dialect """
+    if dialect_name == 'sqlite':
+        return 'EXPLAIN QUERY PLAN '
+    return 'EXPLAIN '
+
+
+def get_index_names(connection, table_name: str) -> Set[str]:
+    """ Returns names of indexes on a table in the database
+
+    SQLAlchemy doesn't reflect expression indexes on SQLite, so there the
+    names are read from the schema table.
+    """
+    if connection.dialect.name == 'sqlite':
+        return set(connection.execute(sqlalchemy.text(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = :table_name"
+        ), {'table_name': table_name}).scalars())
+
+    inspector = sqlalchemy.inspect(connection)
+    return {index['name'] for index in inspector.get_indexes(table_name)}
+
+
+class CreateMissingIndexes(action.ControllerAction):
+    """ Creates model tables and indexes missing from the database
+
+    Databases created before the index set was added to the models get the
+    indexes without reloading. SQLite can't add constraints to existing
+    tables, so a missing movie (title, year) unique constraint is added as a
+    unique index instead.
+    """
+    def execute(self) -> List[str]:
+        """
+        :return: Names of created indexes
+        """
+        session = self.get_session()
+        connection = session.connection()
+        metadata = src.model.db.ModelBase.metadata
+        inspector = sqlalchemy.inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+
+        # New tables come with all their indexes
+        metadata.create_all(connection)
+
+        created = []
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            index_names = get_index_names(connection, table.name)
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if index.name not in index_names:
+                    self.logger.info('Creating index %s' % index.name)
+                    index.create(connection)
+                    created.append(index.name)
+
+        if 'movie' in existing_tables:
+            unique_index = self.create_movie_unique_index(connection, inspector)
+            if unique_index is not None:
+                created.append(unique_index)
+
+        self.commit(session)
+        return created
+
+    def create_movie_unique_index(self, connection, inspector):
+        """ Creates unique index on movie (title, year), unless the table
+        already has an equivalent constraint or index
+
+        :return: Name of index if created, otherwise None
+        """
+        movie_table = src.model.movie.Movie.__table__
+        columns = ['movie_title', 'title_year']
+        with warnings.catch_warnings():
+            # Expression index on lower(movie_title) can't be reflected
+            warnings.simplefilter('ignore', sqlalchemy.exc.SAWarning)
+            unique_column_sets = [
+                constraint['column_names']
+                for constraint in inspector.get_unique_constraints('movie')
+            ] + [
+                index['column_names']
+                for index in inspector.get_indexes('movie')
+                if index['unique']
+            ]
+        if columns in unique_column_sets:
+            return None
+
+        index = sqlalchemy.Index(
+            'uq_movie_title', *[movie_table.c[column] for column in columns],
+            unique=True
+        )
+        self.logger.info('Creating unique index %s' % index.name)
+        try:
+            with connection.begin_nested():
+                index.create(connection)
+        except sqlalchemy.exc.IntegrityError:
+            self.logger.warning(
+                'Duplicate movie titles and years in database, '
+                'skipping unique index %s' % index.name
+            )
+            return None
+        finally:
+            # Drop the index from the table again, it's not part of the model
+            movie_table.indexes.discard(index)
+        return index.name
+
+    def query(self, **kwargs):
+        pass
+
+
+class FillEmptyProfitSummaries(action.ControllerAction):
+    """ Rebuilds profit summary tables while they're empty and movies exist
+
+    Summary tables created by CreateMissingIndexes start out empty, so
+    databases loaded before them get their summaries without a reload.
+    """
+    def execute(self) -> List[str]:
+        """
+        :return: Names of rebuilt summary tables
+        """
+        session = self.get_session()
+        movie_table = src.model.movie.Movie.__table__
+        if session.execute(
+                sqlalchemy.select(movie_table.c.pk).limit(1)
+        ).first() is None:
+            return []
+
+        summary_tables = [
+            src.model.stats.GenreProfitSummary.__table__,
+            src.model.stats.PersonProfitSummary.__table__,
+        ]
+        empty_tables = [
+            table.name for table in summary_tables
+            if session.execute(
+                sqlalchemy.select(table).limit(1)
+            ).first() is None
+        ]
+        if not empty_tables:
+            return []
+
+        # Empty tables are rebuilt whole, filled ones are left alone
+        src.controller.stats.RefreshProfitSummaries(
+            self.logger, session=session, commit_enabled=False
+        ).execute(genre_pks=(), person_pks=())
+        src.controller.version.BumpDataVersion(
+            self.logger, session=session, commit_enabled=False
+        ).execute()
+        self.commit(session)
+        return empty_tables
+
+    def query(self, **kwargs):
+        pass
+
+
+class ExplainHotQueries(action.ControllerAction):
+    """ Returns query plans of hot query selects """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self) -> Dict[str, List[str]]:
+        """
+        :return: Ordered map of query name to lines of its query plan
+        """
+        connection = self.get_session().connection()
+        dialect = connection.dialect
+        prefix = get_explain_prefix(dialect.name)
+
+        plans = collections.OrderedDict()
+        for name, select in get_hot_query_selects().items():
+            statement = select.compile(
+                dialect=dialect, compile_kwargs={'literal_binds': True}
+            )
+            plans[name] = [
+                str(row[-1]) for row in connection.exec_driver_sql(
+                    prefix + str(statement)
+                )
+            ]
+        return plans
@@ -1,10 +1,60 @@
 """ Stats-related queries """
 import abc
-from typing import Dict
+import collections
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlalchemy
 
 from src.controller import action
+from src.controller import cache
+from src.controller import fields
+from src.controller import version
+import src.model.common
 import src.model.fields
+import src.model.movie
 import src.model.person
+import src.model.stats
+
+
+#: Map of (database url, summary table name) to the data version stamp its
+#: rows were last found at
+_summarized_tables = {}
+
+
+class HasProfitSummary(action.ControllerAction):
+    """ Returns whether a profit summary table exists and has rows
+
+    Databases from before the summary tables, or not loaded since
+    create-indexes added them, have none, so rankings aggregate movies
+    instead. Loads can empty a table, eg by deleting every movie, so found
+    rows are only remembered until the data version changes.
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self, summary_class) -> bool:
+        """
+        :param summary_class: Summary model class to check
+        """
+        session = self.get_session()
+        key = (str(session.get_bind().url), summary_class.__tablename__)
+        stamp = version.CurrentDataVersion(
+            self.logger, session=session
+        ).query()
+        if stamp is not None and _summarized_tables.get(key) == stamp:
+            return True
+
+        inspector = sqlalchemy.inspect(session.connection())
+        if not inspector.has_table(summary_class.__tablename__):
+            return False
+        if session.execute(
+                sqlalchemy.select(summary_class.__table__).limit(1)
+        ).first() is None:
+            return False
+        if stamp is not None:
+            _summarized_tables[key] = stamp
+        return True
 
 
 def get_moview_profit(movie_record):
@@ -15,78 +65,307 @@ def get_moview_profit(movie_record):
     return movie_record.gross - movie_record.budget
 
 
-class GenreProfit(action.ControllerAction):
-    """ Return mapping of genres to profitablity """
+def get_movie_profit_column():
+    """ Returns SQL expression for movie profit, null if not applicable """
+    movie = src.model.movie.Movie
+    return movie.gross - movie.budget
+
+
+def get_person_movies_subquery(
+        movie_pks: Optional[List[int]]=None,
+        person_pks: Optional[List[int]]=None
+):
+    """ Returns subquery of distinct (person_pk, movie_pk) pairs
+
+    Pairs come from both acted and directed movies. The union drops
+    duplicates, so a person who acted in and directed a movie counts once.
+    Optional filters are applied to each side of the union, so both sides
+    can use their indexes.
+
+    :param movie_pks: Optional movies to restrict pairs to
+    :param person_pks: Optional persons to restrict pairs to
+    """
+    movie_actors = src.model.common.movie_actors
+    movie = src.model.movie.Movie
+    actor_select = sqlalchemy.select(
+        movie_actors.c.actor_pk.label('person_pk'),
+        movie_actors.c.movie_pk.label('movie_pk')
+    )
+    director_select = sqlalchemy.select(
+        movie.director_pk.label('person_pk'),
+        movie.pk.label('movie_pk')
+    ).where(movie.director_pk.isnot(None))
+
+    if movie_pks is not None:
+        actor_select = actor_select.where(
+            movie_actors.c.movie_pk.in_(movie_pks)
+        )
+        director_select = director_select.where(movie.pk.in_(movie_pks))
+    if person_pks is not None:
+        actor_select = actor_select.where(
+            movie_actors.c.actor_pk.in_(person_pks)
+        )
+        director_select = director_select.where(
+            movie.director_pk.in_(person_pks)
+        )
+    return sqlalchemy.union(actor_select, director_select).subquery()
+
+
+def get_genre_profit_select(genre_pks: Optional[List[int]]=None):
+    """ Returns select of genre pk, number of movies, total and average profit
+
+    Only movies with both gross and budget set are counted.
+
+    :param genre_pks: Optional genres to restrict select to
+    """
+    genre_pk = src.model.common.movie_genres.c.genre_pk
+    return get_group_profit_select(
+        src.model.common.movie_genres, genre_pk,
+        src.model.common.movie_genres.c.movie_pk, genre_pks
+    )
+
+
+def get_person_profit_select(person_pks: Optional[List[int]]=None):
+    """ Returns select of person pk, number of movies, total and average
+    profit, over movies the person acted in or directed
+
+    :param person_pks: Optional persons to restrict select to
+    """
+    # Persons are filtered inside the union, where indexes can be used
+    person_movies = get_person_movies_subquery(person_pks=person_pks)
+    return get_group_profit_select(
+        person_movies, person_movies.c.person_pk, person_movies.c.movie_pk,
+        None
+    )
+
+
+def get_group_profit_select(source, group_column, movie_column, group_pks):
+    """ Builds profit aggregate select over (group, movie) pair source """
+    movie = src.model.movie.Movie
+    profit = get_movie_profit_column()
+    select = sqlalchemy.select(
+        group_column, sqlalchemy.func.count().label('num_movies'),
+        sqlalchemy.func.sum(profit).label('total_profit'),
+        sqlalchemy.func.avg(profit).label('avg_profit')
+    ).select_from(
+        source
+    ).join(
+        movie, movie.pk == movie_column
+    ).where(
+        movie.gross.isnot(None)
+    ).where(
+        movie.budget.isnot(None)
+    ).group_by(group_column)
+
+    if group_pks is not None:
+        select = select.where(group_column.in_(group_pks))
+    return select
+
+
+def get_genre_groups_select(movie_pks: List[int]):
+    """ Returns select of genre pks tied to the given movies """
+    movie_genres = src.model.common.movie_genres
+    return sqlalchemy.select(
+        movie_genres.c.genre_pk
+    ).where(movie_genres.c.movie_pk.in_(movie_pks))
+
+
+def get_person_groups_select(movie_pks: List[int]):
+    """ Returns select of person pks who acted in or directed given movies """
+    person_movies = get_person_movies_subquery(movie_pks)
+    return sqlalchemy.select(person_movies.c.person_pk)
+
+
+def get_genre_rank_select(
+        limit: Optional[int]=None, from_summary: bool=True
+):
+    """ Returns select of genre name and average profit, most profitable
+    first
+
+    :param from_summary: Whether to read the summary table, rather than
+        aggregate movies
+    """
+    genre = src.model.fields.Genre
+    if from_summary:
+        summary = src.model.stats.GenreProfitSummary.__table__
+    else:
+        summary = get_genre_profit_select().subquery()
+    return order_profit_select(
+        sqlalchemy.select(genre.name, summary.c.avg_profit).join(
+            summary, summary.c.genre_pk == genre.pk
+        ),
+        genre.name, summary.c.avg_profit, limit
+    )
+
+
+def get_person_rank_select(
+        limit: Optional[int]=None, from_summary: bool=True
+):
+    """ Returns select of person name and average profit, most profitable
+    first
+
+    :param from_summary: Whether to read the summary table, rather than
+        aggregate movies
+    """
+    person = src.model.person.Person
+    if from_summary:
+        summary = src.model.stats.PersonProfitSummary.__table__
+    else:
+        summary = get_person_profit_select().subquery()
+    return order_profit_select(
+        sqlalchemy.select(person.name, summary.c.avg_profit).join(
+            summary, summary.c.person_pk == person.pk
+        ),
+        person.name, summary.c.avg_profit, limit
+    )
+
+
+def order_profit_select(select, name_column, profit_column, limit):
+    """ Orders profit select from most to least profitable, with name
+    breaking ties, and applies optional limit
+    """
+    select = select.order_by(profit_column.desc(), name_column)
+    if limit is not None:
+        select = select.limit(limit)
+    return select
+
+
+class RefreshProfitSummaries(action.ControllerAction):
+    """ Recomputes precomputed genre and person profit summary rows
+
+    Given genre and person pks, only those groups are recomputed. Without
+    them, or if a summary table is still empty, the table is rebuilt whole.
+    """
+    def execute(
+            self, genre_pks: Optional[Iterable[int]]=None,
+            person_pks: Optional[Iterable[int]]=None
+    ):
+        session = self.get_session()
+        self.refresh_summary(
+            session, src.model.stats.GenreProfitSummary,
+            src.model.stats.GenreProfitSummary.genre_pk,
+            get_genre_profit_select, genre_pks
+        )
+        self.refresh_summary(
+            session, src.model.stats.PersonProfitSummary,
+            src.model.stats.PersonProfitSummary.person_pk,
+            get_person_profit_select, person_pks
+        )
+        self.commit(session)
+
+    def refresh_summary(
+            self, session, summary_class, key_column, get_select, group_pks
+    ):
+        """ Deletes and recomputes summary rows for groups """
+        summary_table = summary_class.__table__
+        summary_columns = [
+            key_column.key, 'num_movies', 'total_profit', 'avg_profit'
+        ]
+
+        is_empty = session.query(key_column).first() is None
+        if group_pks is None or is_empty:
+            self.logger.info('Rebuilding %s' % summary_table.name)
+            session.execute(summary_table.delete())
+            session.execute(summary_table.insert().from_select(
+                summary_columns, get_select()
+            ))
+            return
+
+        group_pks = sorted(group_pks)
+        self.logger.info('Refreshing %s %s rows' % (
+            len(group_pks), summary_table.name
+        ))
+        chunk_size = fields.IN_QUERY_CHUNK_SIZE
+        for start in range(0, len(group_pks), chunk_size):
+            chunk = group_pks[start:start+chunk_size]
+            session.execute(
+                summary_table.delete().where(key_column.in_(chunk))
+            )
+            session.execute(summary_table.insert().from_select(
+                summary_columns, get_select(chunk)
+            ))
+
+    @abc.abstractmethod
+    def query(self, **kwargs):
+        pass
+
+
+class ProfitSummaryGroups(action.ControllerAction):
+    """ Returns genre and person pks whose profit summaries involve movies """
     @abc.abstractmethod
     def execute(self, **kwargs):
         pass
 
-    def query(self) -> Dict[str, float]:
+    def query(self, movie_pks: Iterable[int]) -> Tuple[Set[int], Set[int]]:
+        """
+        :param movie_pks: Movies to look up
+        :return: Set of genre pks and set of person pks tied to the movies
+        """
         session = self.get_session()
+        movie_pks = sorted(movie_pks)
 
-        # Map of genre to profit
-        genre_values = {}
+        genre_pks = set()
+        person_pks = set()
+        chunk_size = fields.IN_QUERY_CHUNK_SIZE
+        for start in range(0, len(movie_pks), chunk_size):
+            chunk = movie_pks[start:start+chunk_size]
+            genre_pks.update(session.execute(
+                get_genre_groups_select(chunk)
+            ).scalars())
+            person_pks.update(session.execute(
+                get_person_groups_select(chunk)
+            ).scalars())
 
-        genre_records = session.query(src.model.fields.Genre).all()
-        for genre_record in genre_records:
-            total_profit = 0.0
-            num_movies = 0
-            for movie_record in genre_record.movies:
-                movie_profit = get_moview_profit(movie_record)
-                if movie_profit is None:
-                    continue
+        return genre_pks, person_pks
 
-                num_movies += 1
-                total_profit += movie_profit
 
-            if num_movies > 0:
-                genre_values[genre_record.name] = total_profit / num_movies
+class GenreProfit(action.ControllerAction):
+    """ Return mapping of genres to profitablity
 
-        return genre_values
+    Reads the genre profit summary table kept up to date by data loads,
+    or aggregates movies while it's missing or empty. Results are cached
+    until the next load.
+    """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    @cache.cached_query
+    def query(self, limit: Optional[int]=None) -> Dict[str, float]:
+        """
+        :param limit: Optional number of most profitable genres to return
+        :return: Ordered map of genre name to average profit, descending
+        """
+        session = self.get_session()
+        from_summary = HasProfitSummary(
+            self.logger, session=session
+        ).query(src.model.stats.GenreProfitSummary)
+        return collections.OrderedDict(session.execute(
+            get_genre_rank_select(limit, from_summary)
+        ).all())
 
 
 class PersonProfit(action.ControllerAction):
-    """ Returns mapping of directors/actors to profitability """
+    """ Returns mapping of directors/actors to profitability
+
+    Reads the person profit summary table kept up to date by data loads,
+    or aggregates movies while it's missing or empty. Results are cached
+    until the next load.
+    """
     @abc.abstractmethod
     def execute(self, **kwargs):
         pass
 
-    def query(self) -> Dict[str, float]:
+    @cache.cached_query
+    def query(self, limit: Optional[int]=None) -> Dict[str, float]:
+        """
+        :param limit: Optional number of most profitable persons to return
+        :return: Ordered map of person name to average profit, descending
+        """
         session = self.get_session()
-
-        person_values = {}
-        person_records = session.query(src.model.person.Person).all()
-        for person_record in person_records:
-            movie_pks_used = set()
-
-            total_profit = 0.0
-            num_movies = 0
-
-            for acted_movie in person_record.acted_movies:
-                if acted_movie.pk in movie_pks_used:
-                    # Already processed movie
-                    continue
-                movie_pks_used.add(acted_movie.pk)
-
-                movie_profit = get_moview_profit(acted_movie)
-                if movie_profit is None:
-                    continue
-                num_movies += 1
-                total_profit += movie_profit
-
-            for directed_movie in person_record.directed_movies:
-                if directed_movie.pk in movie_pks_used:
-                    # Already processed movie
-                    continue
-                movie_pks_used.add(directed_movie.pk)
-
-                movie_profit = get_moview_profit(directed_movie)
-                if movie_profit is None:
-                    continue
-                num_movies += 1
-                total_profit += movie_profit
-
-            if num_movies > 0:
-                person_values[person_record.name] = total_profit / num_movies
-
-        return person_values
+        from_summary = HasProfitSummary(
+            self.logger, session=session
+        ).query(src.model.stats.PersonProfitSummary)
+        return collections.OrderedDict(session.execute(
+            get_person_rank_select(limit, from_summary)
+        ).all())
@@ -0,0 +1,81 @@
+""" Data version actions, for telling when cached results went stale """
+import abc
+import uuid
+from typing import Optional
+
+import sqlalchemy
+
+from src.controller import action
+import src.model.version
+
+
+#: Database urls known to have the data version table
+_versioned_urls = set()
+
+
+def get_version_stamp(version: int, token: str) -> str:
+    """ Returns stamp identifying a data version, eg '3-9f86d081...' """
+    return '%s-%s' % (version, token)
+
+
+class BumpDataVersion(action.ControllerAction):
+    """ Increments data version, in the same transaction as the data """
+    def execute(self) -> str:
+        """
+        :return: New data version stamp
+        """
+        session = self.get_session()
+        table = src.model.version.DataVersion.__table__
+        pk = src.model.version.DATA_VERSION_PK
+        token = uuid.uuid4().hex
+
+        result = session.execute(table.update().where(
+            table.c.pk == pk
+        ).values(version=table.c.version + 1, token=token))
+        if result.rowcount == 0:
+            session.execute(
+                table.insert().values(pk=pk, version=1, token=token)
+            )
+
+        version = session.execute(sqlalchemy.select(
+            table.c.version
+        ).where(table.c.pk == pk)).scalar_one()
+        self.logger.info('Bumped data version to %s' % version)
+
+        self.commit(session)
+        return get_version_stamp(version, token)
+
+    def query(self, **kwargs):
+        pass
+
+
+class CurrentDataVersion(action.ControllerAction):
+    """ Returns stamp of current data version """
+    @abc.abstractmethod
+    def execute(self, **kwargs):
+        pass
+
+    def query(self) -> Optional[str]:
+        """
+        :return: Data version stamp, or None if the database has no data
+            version yet
+        """
+        session = self.get_session()
+        url = str(session.get_bind().url)
+        table = src.model.version.DataVersion.__table__
+
+        # Tables aren't dropped, so only check for one until it's found
+        if url not in _versioned_urls:
+            inspector = sqlalchemy.inspect(session.connection())
+            if not inspector.has_table(table.name):
+                return None
+            _versioned_urls.add(url)
+
+        record = session.execute(sqlalchemy.select(
+            table.c.version, table.c.token
+        ).where(
+            table.c.pk == src.model.version.DATA_VERSION_PK
+        )).one_or_none()
+        if record is None:
+            return None
+        return get_version_stamp(record.version, record.token)
@@ -0,0 +1,372 @@
+""" On-disk cache of cleaned dataset frames, one NumPy file per column
+
+Parsing the csv and dropping its suspicious records is the slow part of
+reading the dataset, so the cleaned frame is saved in a binary columnar
+layout the first time it's read, and read back from there while the csv
+hasn't changed:
+    numeric columns: <column>.npy of the values
+    text columns: <column>.text.npy of the values as utf-8, each ended by
+        a NUL, <column>.offsets.npy of where each value starts, and
+        <column>.missing.npy marking missing values
+    category columns: <column>.codes.npy, plus the categories saved like a
+        text column, with parts prefixed "categories_"
+    index.npy: record ids, as returned by the csv loaders
+
+Entries are keyed by the csv's absolute path, and stamped with its size,
+modification time and sha256 hash, plus the loader's column schema. The
+hash is only taken when the size and modification time don't match, so an
+unchanged file isn't read at all, while a touched but unchanged file keeps
+its entry.
+
+Settings come from environment variables:
+    DATASET_CACHE: "on" (default) or "off"
+    DATASET_CACHE_DIR: Directory of cache entries, defaults to
+        "data/dataset_cache"
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+#: Version of the entry layout, bumped when it or the csv cleanup changes
+CACHE_VERSION = 2
+
+#: Name of the entry's metadata file
+META_FILE_NAME = 'meta.json'
+
+#: Ends each value in a text column; values containing it aren't cached
+TEXT_END = '\0'
+
+
+def get_file_stamp(file_name: str, with_hash: bool=True) -> Dict:
+    """ Returns size, modification time and optionally sha256 of file """
+    stat = os.stat(file_name)
+    stamp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(file_name, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b''):
+                digest.update(block)
+        stamp['sha256'] = digest.hexdigest()
+    return stamp
+
+
+def get_schema_key(dtypes: Dict) -> Dict[str, str]:
+    """ Returns json friendly form of loader's column dtypes """
+    return {
+        name: getattr(dtype, '__name__', str(dtype))
+        for name, dtype in dtypes.items()
+    }
+
+
+def encode_text(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """ Returns arrays of text column, see module docstring """
+    missing = np.asarray(pd.isna(values), dtype='bool')
+    texts = np.where(missing, '', values).tolist()
+    text = np.frombuffer(
+        (TEXT_END.join(texts) + TEXT_END).encode('utf-8'), dtype='uint8'
+    )
+
+    # Each value starts after the NUL ending the one before it
+    ends = np.flatnonzero(text == ord(TEXT_END))
+    if len(ends) != len(texts):
+        raise ValueError('Text contains NUL character')
+    offsets = np.zeros(len(texts) + 1, dtype='int64')
+    offsets[1:] = ends + 1
+    return {'text': text, 'offsets': offsets, 'missing': missing}
+
+
+def decode_text(
+        arrays: Dict[str, np.ndarray], start: int, stop: int
+) -> np.ndarray:
+    """ Returns object array of text column rows start to stop, with nan
+    for missing values
+    """
+    offsets = arrays['offsets']
+    values = np.empty(stop - start, dtype=object)
+    if stop > start:
+        # One decode and split of the rows' text, rather than one per value
+        text = arrays['text'][offsets[start]:offsets[stop]].tobytes()
+        values[:] = text.decode('utf-8')[:-1].split(TEXT_END)
+    values[arrays['missing'][start:stop]] = np.nan
+    return values
+
+
+class DatasetCache(object):
+    """ Directory of cleaned dataset frames, see module docstring
+
+    Failures to read or write entries are logged, and the caller falls back
+    to parsing the csv.
+    """
+    def __init__(self, directory: str):
+        """
+        :param directory: Directory entries are kept in
+        """
+        self._directory = directory
+
+    def get_entry_dir(self, file_name: str) -> str:
+        """ Returns directory of csv file's entry """
+        path_hash = hashlib.sha256(
+            os.path.abspath(file_name).encode('utf-8')
+        ).hexdigest()[:32]
+        return os.path.join(self._directory, path_hash)
+
+    def find_entry(
+            self, file_name: str, dtypes: Dict, stamp: Optional[Dict]=None
+    ) -> Optional[Dict]:
+        """ Returns metadata of csv file's entry, if it's up to date
+
+        :param stamp: Optional stamp of the file already taken by the
+            caller, so its hash isn't taken again
+        """
+        meta_file = os.path.join(self.get_entry_dir(file_name), META_FILE_NAME)
+        try:
+            with open(meta_file, encoding='utf-8') as in_file:
+                meta = json.load(in_file)
+        except FileNotFoundError:
+            return None
+
+        if (
+                meta.get('version') != CACHE_VERSION
+                or meta.get('schema') != get_schema_key(dtypes)
+        ):
+            return None
+
+        if stamp is None:
+            stamp = get_file_stamp(file_name, with_hash=False)
+        if stamp['size'] != meta['stamp']['size']:
+            return None
+
+        if stamp['mtime_ns'] != meta['stamp']['mtime_ns']:
+            # Touched, maybe changed: only the content hash can tell
+            if 'sha256' not in stamp:
+                stamp = get_file_stamp(file_name)
+            if stamp['sha256'] != meta['stamp']['sha256']:
+                return None
+            meta['stamp'] = stamp
+            write_json(meta_file, meta)
+        return meta
+
+    def load(
+            self, file_name: str, dtypes: Dict, stamp: Optional[Dict]=None
+    ) -> Optional[pd.DataFrame]:
+        """ Returns cached frame of csv file, or None if not cached
+
+        :param stamp: Optional stamp of the file, see find_entry()
+        """
+        chunks = self.iter_chunks(file_name, dtypes, None, stamp)
+        if chunks is None:
+            return None
+        return next(chunks)
+
+    def iter_chunks(
+            self, file_name: str, dtypes: Dict, chunk_size: Optional[int],
+            stamp: Optional[Dict]=None
+    ) -> Optional[Iterator[pd.DataFrame]]:
+        """ Returns iterator of cached frames of up to chunk_size records,
+        or None if not cached
+
+        Column files are memory mapped, so only the chunk being built is
+        read into memory. Without chunk_size, the whole frame is one chunk.
+
+        :param stamp: Optional stamp of the file, see find_entry()
+        """
+        try:
+            meta = self.find_entry(file_name, dtypes, stamp)
+            if meta is None:
+                return None
+            logger.info('Reading cached dataset of "%s"' % file_name)
+            columns = self.open_columns(self.get_entry_dir(file_name), meta)
+        except (OSError, ValueError, KeyError) as ex:
+            logger.warning('Could not read dataset cache: %s' % ex)
+            return None
+
+        return self.build_chunks(meta, columns, chunk_size)
+
+    @staticmethod
+    def open_columns(entry_dir: str, meta: Dict) -> Dict[str, Dict]:
+        """ Returns map of column name to its memory mapped arrays """
+        columns = {'index': {
+            'values': np.load(
+                os.path.join(entry_dir, 'index.npy'), mmap_mode='r'
+            )
+        }}
+        for name, column in meta['columns'].items():
+            columns[name] = {
+                part: np.load(
+                    os.path.join(entry_dir, '%s.%s.npy' % (name, part)),
+                    mmap_mode='r'
+                )
+                for part in column['parts']
+            }
+        return columns
+
+    @staticmethod
+    def build_chunks(
+            meta: Dict, columns: Dict[str, Dict], chunk_size: Optional[int]
+    ) -> Iterator[pd.DataFrame]:
+        """ Yields frames of up to chunk_size records from column arrays """
+        num_records = meta['num_records']
+        chunk_size = chunk_size or max(num_records, 1)
+
+        categories = {}
+        for name, column in meta['columns'].items():
+            if column['kind'] == 'category':
+                categories[name] = pd.Index(
+                    decode_text(
+                        {
+                            part[len('categories_'):]: columns[name][part]
+                            for part in column['parts']
+                            if part.startswith('categories_')
+                        },
+                        0, column['num_categories']
+                    ),
+                    dtype=column['categories_dtype']
+                )
+
+        for start in range(0, num_records, chunk_size):
+            stop = min(start + chunk_size, num_records)
+            data = {}
+            for name, column in meta['columns'].items():
+                arrays = columns[name]
+                if column['kind'] == 'numeric':
+                    data[name] = pd.Series(
+                        np.array(arrays['values'][start:stop]),
+                        dtype=column['dtype'], copy=False
+                    )
+                elif column['kind'] == 'text':
+                    data[name] = pd.Series(
+                        decode_text(arrays, start, stop),
+                        dtype=column['dtype'], copy=False
+                    )
+                else:
+                    data[name] = pd.Series(pd.Categorical.from_codes(
+                        np.array(arrays['codes'][start:stop]),
+                        categories=categories[name]
+                    ))
+
+            df = pd.DataFrame(data)
+            df.index = pd.Index(
+                np.array(columns['index']['values'][start:stop])
+            )
+            yield df
+
+    def store(
+            self, file_name: str, dtypes: Dict, stamp: Dict, df: pd.DataFrame
+    ):
+        """ Saves cleaned frame of csv file
+
+        :param stamp: Stamp of the file taken before it was parsed; nothing
+            is saved if the file changed since
+        """
+        try:
+            current = get_file_stamp(file_name, with_hash=False)
+            if (
+                    current['size'] != stamp['size']
+                    or current['mtime_ns'] != stamp['mtime_ns']
+            ):
+                logger.info('Dataset changed while read, not caching it')
+                return
+
+            self.write_entry(file_name, {
+                'version': CACHE_VERSION,
+                'schema': get_schema_key(dtypes),
+                'stamp': stamp,
+                'num_records': len(df),
+                'columns': {},
+            }, df)
+        except (OSError, ValueError) as ex:
+            logger.warning('Could not write dataset cache: %s' % ex)
+
+    def write_entry(self, file_name: str, meta: Dict, df: pd.DataFrame):
+        """ Writes entry to a temporary directory, then moves it in place """
+        os.makedirs(self._directory, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self._directory, suffix='.tmp')
+        try:
+            np.save(
+                os.path.join(temp_dir, 'index.npy'),
+                np.asarray(df.index, dtype='int64')
+            )
+            for name in df.columns:
+                column, arrays = encode_column(df[name])
+                column['parts'] = list(arrays)
+                meta['columns'][name] = column
+                for part, values in arrays.items():
+                    np.save(
+                        os.path.join(temp_dir, '%s.%s.npy' % (name, part)),
+                        values
+                    )
+            # Metadata last, so entries without it are never read
+            write_json(os.path.join(temp_dir, META_FILE_NAME), meta)
+
+            entry_dir = self.get_entry_dir(file_name)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(temp_dir, entry_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.info('Cached dataset of "%s"' % file_name)
+
+
+def encode_column(series: pd.Series):
+    """ Returns column metadata and arrays to save, see module docstring """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        arrays = {'codes': np.asarray(series.cat.codes)}
+        arrays.update(
+            ('categories_%s' % part, values)
+            for part, values in encode_text(
+                np.asarray(categories, dtype=object)
+            ).items()
+        )
+        return {
+            'kind': 'category', 'dtype': 'category',
+            'num_categories': len(categories),
+            'categories_dtype': str(categories.dtype),
+        }, arrays
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return {'kind': 'numeric', 'dtype': str(series.dtype)}, {
+            'values': series.to_numpy()
+        }
+
+    if pd.api.types.is_string_dtype(series.dtype):
+        return {'kind': 'text', 'dtype': str(series.dtype)}, encode_text(
+            series.to_numpy(dtype=object, na_value=np.nan)
+        )
+
+    raise ValueError('Cannot cache column "%s" of dtype %s' % (
+        series.name, series.dtype
+    ))
+
+
+def write_json(file_name: str, data: Dict):
+    """ Writes json file, replacing it in one step """
+    fd, temp_name = tempfile.mkstemp(
+        dir=os.path.dirname(file_name) or '.', suffix='.tmp'
+    )
+    with os.fdopen(fd, 'w', encoding='utf-8') as out_file:
+        json.dump(data, out_file)
+    os.replace(temp_name, file_name)
+
+
+def get_default_cache() -> Optional[DatasetCache]:
+    """ Returns cache configured by environment, or None if turned off """
+    mode = os.environ.get('DATASET_CACHE', 'on')
+    if mode not in ('on', 'off'):
+        raise ValueError(
+            'Unknown DATASET_CACHE "%s", expected "on" or "off"' % mode
+        )
+    if mode == 'off':
+        return None
+    return DatasetCache(os.environ.get(
+        'DATASET_CACHE_DIR', os.path.join('data', 'dataset_cache')
+    ))
@@ -1,5 +1,9 @@
-""" Common dependencies for models """
-from sqlalchemy import Column, Table, ForeignKey
+""" Common dependencies for models
+
+Association tables have a primary key of (movie_pk, other pk), which also
+indexes lookups by movie. Lookups the other way get their own index.
+"""
+from sqlalchemy import Column, Index, Table, ForeignKey
 
 from src.model import db
 
@@ -8,19 +12,22 @@ from src.model import db
 movie_genres = Table(
     'movie_genres', db.ModelBase.metadata,
     Column('movie_pk', ForeignKey('movie.pk'), primary_key=True),
-    Column('genre_pk', ForeignKey('genre.pk'), primary_key=True)
+    Column('genre_pk', ForeignKey('genre.pk'), primary_key=True),
+    Index('ix_movie_genres_genre_pk', 'genre_pk')
 )
 
 #: Many-many table for movies to keywords
 movie_keywords = Table(
     'movie_keywords', db.ModelBase.metadata,
     Column('movie_pk', ForeignKey('movie.pk'), primary_key=True),
-    Column('keyword_pk', ForeignKey('keyword.pk'), primary_key=True)
+    Column('keyword_pk', ForeignKey('keyword.pk'), primary_key=True),
+    Index('ix_movie_keywords_keyword_pk', 'keyword_pk')
 )
 
 #: Many-many table for movies to actors
 movie_actors = Table(
     'movie_actors', db.ModelBase.metadata,
     Column('movie_pk', ForeignKey('movie.pk'), primary_key=True),
-    Column('actor_pk', ForeignKey('person.pk'), primary_key=True)
+    Column('actor_pk', ForeignKey('person.pk'), primary_key=True),
+    Index('ix_movie_actors_actor_pk', 'actor_pk')
 )
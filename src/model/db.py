@@ -1,9 +1,15 @@
 """ Main file setting up model configuration """
 import logging
 import os
+import threading
+from typing import Dict
+
 import sqlalchemy
+import sqlalchemy.engine
+import sqlalchemy.event
 import sqlalchemy.ext.declarative
 import sqlalchemy.orm
+import sqlalchemy.pool
 
 
 logger = logging.getLogger(__name__)
@@ -11,11 +17,147 @@ logger = logging.getLogger(__name__)
 #: Base class for models
 ModelBase = sqlalchemy.ext.declarative.declarative_base()
 
+#: Named sets of SQLite pragmas applied to each new connection.
+#: bulk-load trades durability for write speed: with synchronous off, a
+#: power loss mid-load can corrupt the database, so only use it for data
+#: that can be loaded again. Exclusive locking keeps other connections out
+#: of the database until the connection closes, so profiles with it pool a
+#: single connection. read maps the database into
+#: memory and refuses writes. WAL journal mode sticks to the database file.
+ENGINE_PROFILES = {
+    'default': (),
+    'bulk-load': (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'OFF'),
+        ('cache_size', '-262144'),
+        ('temp_store', 'MEMORY'),
+        ('locking_mode', 'EXCLUSIVE'),
+    ),
+    'read': (
+        ('journal_mode', 'WAL'),
+        ('mmap_size', '268435456'),
+        ('cache_size', '-65536'),
+        ('query_only', 'ON'),
+    ),
+}
+
+
+def check_profile(profile: str):
+    """ Raises ValueError if profile isn't a known engine profile """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(
+            'Unknown database profile "%s", expected one of: %s' % (
+                profile, ', '.join(ENGINE_PROFILES)
+            )
+        )
+
+
+#: Environment variables for connection pool settings, mapped to their
+#: create_engine() argument and value parser
+POOL_ENV_VARS = {
+    'DB_POOL_SIZE': ('pool_size', int),
+    'DB_MAX_OVERFLOW': ('max_overflow', int),
+    'DB_POOL_TIMEOUT': ('pool_timeout', float),
+    'DB_POOL_RECYCLE': ('pool_recycle', int),
+    'DB_POOL_PRE_PING': ('pool_pre_ping', lambda value: value.lower() in (
+        '1', 'true', 'yes', 'on'
+    )),
+}
+
+
+def is_sqlite_file(url: sqlalchemy.engine.URL) -> bool:
+    """ Returns whether url is of a file-based SQLite database """
+    return (
+        url.get_backend_name() == 'sqlite'
+        and url.database not in (None, '', ':memory:')
+    )
+
+
+def get_pool_options(config_str: str) -> Dict:
+    """ Returns create_engine() pool arguments from environment variables
+
+    File-based SQLite gets a queue pool of connections shared across
+    threads. sqlite3 connections refuse use from other threads by default,
+    so the same-thread check is turned off; the pool hands each connection
+    to one thread at a time. In-memory SQLite databases only exist within
+    their connection, so they keep SQLAlchemy's default pool and settings.
+    """
+    url = sqlalchemy.engine.make_url(config_str)
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    if is_sqlite and not is_sqlite_file(url):
+        return {}
+
+    options = {}
+    for env_var, (option, parse) in POOL_ENV_VARS.items():
+        value = os.environ.get(env_var)
+        if value is not None:
+            options[option] = parse(value)
+
+    if is_sqlite:
+        options['poolclass'] = sqlalchemy.pool.QueuePool
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+def create_profile_engine(
+        config_str: str, profile: str='default', **options
+):
+    """ Creates sqlalchemy engine that applies a profile's pragmas on connect
+
+    Profiles only hold SQLite pragmas, so other databases get a plain engine.
+    Engines of SQLite files with exclusive locking pool a single connection,
+    whatever pool size is given.
+
+    :param options: Extra create_engine() arguments, eg pool settings
+    """
+    check_profile(profile)
+    pragmas = ENGINE_PROFILES[profile]
+    if (
+            ('locking_mode', 'EXCLUSIVE') in pragmas
+            and is_sqlite_file(sqlalchemy.engine.make_url(config_str))
+    ):
+        # A second connection would fail with "database is locked", so
+        # callers wait for the one connection to be returned instead
+        options = dict(options, pool_size=1, max_overflow=0)
+
+    engine = sqlalchemy.create_engine(config_str, **options)
+    if not pragmas:
+        return engine
+
+    if engine.dialect.name != 'sqlite':
+        logger.warning(
+            'Ignoring database profile "%s" for %s database' % (
+                profile, engine.dialect.name
+            )
+        )
+        return engine
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+        cursor.close()
+
+    sqlalchemy.event.listen(engine, 'connect', on_connect)
+    return engine
+
 
 class EngineWrapper(object):
-    """ Manages SQLAlchemy engine and configuration """
+    """ Manages SQLAlchemy engine and configuration
+
+    The engine profile is, in order of precedence, the one given to
+    set_profile() (eg by the cli --db-profile flag), the DB_PROFILE
+    environment variable, or the default given to set_default_profile() by
+    the running command.
+
+    Safe to use from multiple threads: the engine is created once under a
+    lock, and sessions are scoped to the calling thread.
+    """
     _engine = None
-    _session_factory = None
+    _sessions = None
+    _profile = None
+    _default_profile = 'default'
+    _lock = threading.RLock()
 
     @classmethod
     def get_config_str(cls) -> str:
@@ -23,20 +165,81 @@ class EngineWrapper(object):
             'DB_CONNECTION', 'sqlite:///data/db.sqlite'
         )
 
+    @classmethod
+    def get_profile(cls) -> str:
+        """ Returns name of engine profile in use """
+        if cls._profile is not None:
+            return cls._profile
+        return os.environ.get('DB_PROFILE', cls._default_profile)
+
+    @classmethod
+    def set_profile(cls, profile: str):
+        """ Sets engine profile, overriding DB_PROFILE and command defaults """
+        check_profile(profile)
+        cls._profile = profile
+        cls.reset()
+
+    @classmethod
+    def set_default_profile(cls, profile: str):
+        """ Sets engine profile used when none is otherwise given """
+        check_profile(profile)
+        old_profile = cls.get_profile()
+        cls._default_profile = profile
+        if cls.get_profile() != old_profile:
+            cls.reset()
+
+    @classmethod
+    def reset(cls):
+        """ Disposes of engine, so the next one picks up new settings
+
+        Sessions still open in other threads keep their connection until
+        they are removed.
+        """
+        with cls._lock:
+            if cls._sessions is not None:
+                cls._sessions.remove()
+            if cls._engine is not None:
+                cls._engine.dispose()
+            cls._engine = None
+            cls._sessions = None
+
     @classmethod
     def get_engine(cls):
         """ Returns sqlalchemy engine """
         if cls._engine is None:
-            logger.info('Connecting to database')
-            cls._engine = sqlalchemy.create_engine(cls.get_config_str())
+            with cls._lock:
+                if cls._engine is None:
+                    config_str = cls.get_config_str()
+                    profile = cls.get_profile()
+                    logger.info(
+                        'Connecting to database with %s profile' % profile
+                    )
+                    cls._engine = create_profile_engine(
+                        config_str, profile, **get_pool_options(config_str)
+                    )
         return cls._engine
 
     @classmethod
     def get_session(cls):
-        """ Returns new sqlalchemy session """
-        if cls._session_factory is None:
-            cls._session_factory = sqlalchemy.orm.sessionmaker(
-                bind=cls.get_engine()
-            )
+        """ Returns sqlalchemy session of the calling thread
+
+        Repeated calls from a thread return the same session, until it is
+        removed with remove_session().
+        """
+        if cls._sessions is None:
+            with cls._lock:
+                if cls._sessions is None:
+                    cls._sessions = sqlalchemy.orm.scoped_session(
+                        sqlalchemy.orm.sessionmaker(bind=cls.get_engine())
+                    )
 
-        return cls._session_factory()
+        return cls._sessions()
+
+    @classmethod
+    def remove_session(cls):
+        """ Closes session of the calling thread, returning its connection
+        to the pool
+        """
+        sessions = cls._sessions
+        if sessions is not None:
+            sessions.remove()
@@ -0,0 +1,45 @@
+""" Bookkeeping of data loads, used to skip unchanged files and movies """
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+
+from src.model import db
+
+
+class DataLoad(db.ModelBase):
+    """ Fingerprint of a file load-data finished loading """
+    __tablename__ = 'data_load'
+
+    #: Primary key, increasing with each load
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+
+    #: Absolute name of loaded file
+    file_name = Column(String(1024), nullable=False)
+
+    #: Size of file in bytes
+    file_size = Column(Integer, nullable=False)
+
+    #: Hex sha256 hash of file contents
+    file_sha256 = Column(String(64), nullable=False)
+
+    #: Whether movies missing from the file were deleted
+    delete_missing = Column(Boolean, nullable=False)
+
+    def __repr__(self):
+        return '<DataLoad(file_name="%s"; file_sha256=%s)>' % (
+            self.file_name, self.file_sha256
+        )
+
+
+class MovieContentHash(db.ModelBase):
+    """ Hash of the normalized dataset record a movie was last loaded from """
+    __tablename__ = 'movie_content_hash'
+
+    #: Movie primary key
+    movie_pk = Column(Integer, ForeignKey('movie.pk'), primary_key=True)
+
+    #: Hex hash of the record, from ingest.get_content_hashes()
+    content_hash = Column(String(32), nullable=False)
+
+    def __repr__(self):
+        return '<MovieContentHash(movie_pk=%s; content_hash=%s)>' % (
+            self.movie_pk, self.content_hash
+        )
@@ -13,7 +13,7 @@ Normalized movie fields:
     num_voted_users, num_user_for_reviews, plot_keywords, title_year
 """
 from sqlalchemy import (
-    Column, ForeignKey, Integer, String, UniqueConstraint, Float
+    Column, ForeignKey, Index, Integer, String, UniqueConstraint, Float, func
 )
 from sqlalchemy.orm import relationship
 
@@ -27,6 +27,11 @@ class Movie(db.ModelBase):
     """ Movie Model """
     __tablename__ = 'movie'
 
+    #: Movies are uniquely identified by title and year
+    __table_args__ = (
+        UniqueConstraint('movie_title', 'title_year', name='uq_movie_title'),
+    )
+
     # Identification fields
     #: Primary key
     pk = Column(Integer, primary_key=True, autoincrement=True)
@@ -76,23 +81,27 @@ class Movie(db.ModelBase):
 
     # Relations
     #: Foreign key to content rating
-    content_rating_pk = Column(Integer, ForeignKey('content_rating.pk'))
+    content_rating_pk = Column(
+        Integer, ForeignKey('content_rating.pk'), index=True
+    )
     content_rating = relationship('ContentRating', back_populates='movies')
 
     #: Foreign key to country
-    country_pk = Column(Integer, ForeignKey('country.pk'))
+    country_pk = Column(Integer, ForeignKey('country.pk'), index=True)
     country = relationship('Country', back_populates='movies')
 
     #: Foreign key to language
-    language_pk = Column(Integer, ForeignKey('language.pk'))
+    language_pk = Column(Integer, ForeignKey('language.pk'), index=True)
     language = relationship('Language', back_populates='movies')
 
     #: Foreign key to movie color
-    movie_color_pk = Column(Integer, ForeignKey('movie_colors.pk'))
+    movie_color_pk = Column(
+        Integer, ForeignKey('movie_colors.pk'), index=True
+    )
     movie_color = relationship('MovieColor', back_populates='movies')
 
     #: Foreign key to director person
-    director_pk = Column(Integer, ForeignKey('person.pk'))
+    director_pk = Column(Integer, ForeignKey('person.pk'), index=True)
     director = relationship('Person', back_populates='directed_movies')
 
     #: Genres relation
@@ -110,9 +119,6 @@ class Movie(db.ModelBase):
         'Person', secondary=common.movie_actors, back_populates='acted_movies'
     )
 
-    #: Movies are uniquely identified by title and year
-    UniqueConstraint('movie_title', 'title_year')
-
     def __repr__(self):
         return '<Movie(title="%s"; year="%s")>' % (
             self.movie_title, self.title_year
@@ -120,3 +126,11 @@ class Movie(db.ModelBase):
 
     def __str__(self):
         return '%s (%s)' % (self.movie_title, self.title_year)
+
+
+#: Index for looking up movies by lower case title and year, the way loads
+#: match existing records
+Index(
+    'ix_movie_lower_title_year', func.lower(Movie.movie_title),
+    Movie.title_year
+)
@@ -0,0 +1,48 @@
+""" Precomputed stats tables, maintained by data loads """
+from sqlalchemy import Column, Float, ForeignKey, Integer
+
+from src.model import db
+
+
+class GenreProfitSummary(db.ModelBase):
+    """ Profit totals over movies of a genre with both gross and budget """
+    __tablename__ = 'genre_profit'
+
+    #: Genre primary key
+    genre_pk = Column(Integer, ForeignKey('genre.pk'), primary_key=True)
+
+    #: Number of movies with a profit
+    num_movies = Column(Integer, nullable=False)
+
+    #: Sum of movie profits
+    total_profit = Column(Float, nullable=False)
+
+    #: Average movie profit
+    avg_profit = Column(Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return '<GenreProfitSummary(genre_pk=%s; avg_profit=%s)>' % (
+            self.genre_pk, self.avg_profit
+        )
+
+
+class PersonProfitSummary(db.ModelBase):
+    """ Profit totals over movies a person acted in or directed """
+    __tablename__ = 'person_profit'
+
+    #: Person primary key
+    person_pk = Column(Integer, ForeignKey('person.pk'), primary_key=True)
+
+    #: Number of movies with a profit
+    num_movies = Column(Integer, nullable=False)
+
+    #: Sum of movie profits
+    total_profit = Column(Float, nullable=False)
+
+    #: Average movie profit
+    avg_profit = Column(Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return '<PersonProfitSummary(person_pk=%s; avg_profit=%s)>' % (
+            self.person_pk, self.avg_profit
+        )
@@ -0,0 +1,28 @@
+""" Data version stamp, bumped whenever loads change the data """
+from sqlalchemy import Column, Integer, String
+
+from src.model import db
+
+
+class DataVersion(db.ModelBase):
+    """ Single row holding the current data version """
+    __tablename__ = 'data_version'
+
+    #: Primary key, always DATA_VERSION_PK
+    pk = Column(Integer, primary_key=True)
+
+    #: Version number, incremented by each load commit
+    version = Column(Integer, nullable=False)
+
+    #: Random token set by each load commit, so versions of a database that
+    #: was deleted and loaded again don't match the old ones
+    token = Column(String(32), nullable=False)
+
+    def __repr__(self):
+        return '<DataVersion(version=%s; token=%s)>' % (
+            self.version, self.token
+        )
+
+
+#: Primary key of the data version row
+DATA_VERSION_PK = 1
@@ -0,0 +1,342 @@
+""" Built-in instrumentation of controller actions and command stages
+
+Off unless enabled, eg by cli.py --profile, so instrumented code only pays
+for a flag check. When enabled, each controller action's query and execute
+calls record wall time, SQL statements and their time (from SQLAlchemy
+engine events), rows returned and rows written. Stages of commands, such
+as those of load-data, record wall time, and with memory tracing on, the
+peak of memory traced by tracemalloc while they ran. Tracing slows down
+allocation heavy code several times over, so it is only on when asked for.
+
+Action figures include nested actions they call, eg the data version
+lookup of cached queries, and stages include the actions run in them.
+"""
+import collections
+import collections.abc
+import contextlib
+import functools
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import sqlalchemy.engine
+import sqlalchemy.event
+
+
+class ActionStats(object):
+    """ Totals of an action method's calls """
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows_returned = 0
+        self.rows_written = 0
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class StageStats(object):
+    """ Totals of a stage's runs, with the highest traced memory of any run,
+    or None without memory tracing
+    """
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_memory = None
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class StageFrame(object):
+    """ Running stage, tracking the highest traced memory seen in it """
+    def __init__(self, name: str):
+        self.name = name
+        self.peak_memory = 0
+
+
+class Profiler(object):
+    """ Collects action and stage figures while enabled
+
+    Figures are shared by all threads; running actions and stages are
+    tracked per thread.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self.reset()
+
+    def reset(self):
+        """ Drops figures collected so far """
+        with self._lock:
+            self.actions = collections.defaultdict(ActionStats)
+            self.stages = collections.OrderedDict()
+            self.statements = 0
+            self.sql_seconds = 0.0
+            self.start_time = time.perf_counter()
+
+    def enable(self, trace_memory: bool=False):
+        """ Starts collecting figures
+
+        :param trace_memory: Whether to trace memory for stage peaks, which
+            slows down allocation heavy code
+        """
+        if self.enabled:
+            return
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, 'before_cursor_execute',
+            self.on_before_execute
+        )
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, 'after_cursor_execute',
+            self.on_after_execute
+        )
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """ Stops collecting figures, keeping those collected """
+        if not self.enabled:
+            return
+        self.enabled = False
+        sqlalchemy.event.remove(
+            sqlalchemy.engine.Engine, 'before_cursor_execute',
+            self.on_before_execute
+        )
+        sqlalchemy.event.remove(
+            sqlalchemy.engine.Engine, 'after_cursor_execute',
+            self.on_after_execute
+        )
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def get_action_frames(self) -> List[ActionStats]:
+        """ Returns figures of this thread's running actions, innermost
+        last
+        """
+        frames = getattr(self._local, 'actions', None)
+        if frames is None:
+            frames = self._local.actions = []
+        return frames
+
+    def get_stage_frames(self) -> List[StageFrame]:
+        """ Returns this thread's running stages, innermost last """
+        frames = getattr(self._local, 'stages', None)
+        if frames is None:
+            frames = self._local.stages = []
+        return frames
+
+    def on_before_execute(self, *args):
+        self._local.statement_start = time.perf_counter()
+
+    def on_after_execute(
+            self, connection, cursor, statement, parameters, context,
+            executemany
+    ):
+        seconds = time.perf_counter() - self._local.statement_start
+
+        # sqlite3 reports -1 for selects, and the total of executemany.
+        # Inserts with RETURNING only count rows as they are fetched, so
+        # their parameter sets are counted instead; a flat parameter tuple
+        # is a single row, as SQLAlchemy sends them one per statement.
+        rows_written = cursor.rowcount
+        if rows_written <= 0 and getattr(context, 'isinsert', False):
+            if executemany and parameters and isinstance(
+                    parameters[0], (collections.abc.Mapping, list, tuple)
+            ):
+                rows_written = len(parameters)
+            else:
+                rows_written = 1
+        rows_written = max(rows_written, 0)
+        with self._lock:
+            self.statements += 1
+            self.sql_seconds += seconds
+            for frame in self.get_action_frames():
+                frame.statements += 1
+                frame.sql_seconds += seconds
+                frame.rows_written += rows_written
+
+    def call_action(self, name: str, method, args, kwargs):
+        """ Calls action method, recording its figures under name """
+        frame = ActionStats()
+        frames = self.get_action_frames()
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            frame.seconds = time.perf_counter() - start
+            frames.pop()
+        if isinstance(result, (collections.abc.Mapping, list, set)):
+            frame.rows_returned = len(result)
+
+        with self._lock:
+            stats = self.actions[name]
+            stats.calls += 1
+            stats.seconds += frame.seconds
+            stats.statements += frame.statements
+            stats.sql_seconds += frame.sql_seconds
+            stats.rows_returned += frame.rows_returned
+            stats.rows_written += frame.rows_written
+        return result
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """ Context recording wall time and peak traced memory as a stage
+        of the running command. Does nothing while disabled.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        frames = self.get_stage_frames()
+        is_tracing = tracemalloc.is_tracing()
+        if is_tracing:
+            # Peaks are reset for the new stage, so running stages take
+            # theirs first
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            for frame in frames:
+                frame.peak_memory = max(frame.peak_memory, peak_memory)
+            # Peaks can't be reset before Python 3.9, so there stages get
+            # the peak since tracing started
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+        frame = StageFrame(name)
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            frames.pop()
+            if is_tracing and tracemalloc.is_tracing():
+                frame.peak_memory = max(
+                    frame.peak_memory, tracemalloc.get_traced_memory()[1]
+                )
+                for outer_frame in frames:
+                    outer_frame.peak_memory = max(
+                        outer_frame.peak_memory, frame.peak_memory
+                    )
+
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.seconds += seconds
+                if is_tracing:
+                    stats.peak_memory = max(
+                        stats.peak_memory or 0, frame.peak_memory
+                    )
+
+    def iter_stage(self, name: str, iterable: Iterable) -> Iterator:
+        """ Yields items of iterable, recording the time taken to produce
+        each as a run of a stage
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def get_summary(self) -> Dict:
+        """ Returns JSON serializable figures """
+        with self._lock:
+            return {
+                'seconds': time.perf_counter() - self.start_time,
+                'statements': self.statements,
+                'sql_seconds': self.sql_seconds,
+                'actions': {
+                    name: stats.to_dict()
+                    for name, stats in self.actions.items()
+                },
+                'stages': {
+                    name: stats.to_dict()
+                    for name, stats in self.stages.items()
+                },
+            }
+
+    def format_summary(self, summary: Optional[Dict]=None) -> str:
+        """ Returns figures as text tables, actions slowest first """
+        if summary is None:
+            summary = self.get_summary()
+        lines = [
+            'Action\tCalls\tSeconds\tSQL\tSQL sec\tRows out\tRows written',
+            '------\t-----\t-------\t---\t-------\t--------\t------------',
+        ]
+        actions = sorted(
+            summary['actions'].items(), key=lambda item: -item[1]['seconds']
+        )
+        for name, stats in actions:
+            lines.append('%s\t%s\t%.3f\t%s\t%.3f\t%s\t%s' % (
+                name, stats['calls'], stats['seconds'], stats['statements'],
+                stats['sql_seconds'], stats['rows_returned'],
+                stats['rows_written']
+            ))
+
+        if summary['stages']:
+            lines.extend([
+                '',
+                'Stage\tCalls\tSeconds\tPeak MB',
+                '-----\t-----\t-------\t-------',
+            ])
+            for name, stats in summary['stages'].items():
+                lines.append('%s\t%s\t%.3f\t%s' % (
+                    name, stats['calls'], stats['seconds'],
+                    '%.1f' % (stats['peak_memory'] / 1e6)
+                    if stats['peak_memory'] is not None else '-'
+                ))
+
+        lines.extend([
+            '',
+            'Total: %.3f seconds, %s SQL statements taking %.3f seconds' % (
+                summary['seconds'], summary['statements'],
+                summary['sql_seconds']
+            ),
+        ])
+        return '\n'.join(lines)
+
+
+#: Profiler of this process
+profiler = Profiler()
+
+
+def instrument_action(method):
+    """ Wraps ControllerAction query or execute method to record its calls
+    while profiling, named after the action's class
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        return profiler.call_action(
+            '%s.%s' % (type(self).__name__, method.__name__), method,
+            (self,) + args, kwargs
+        )
+
+    return wrapper
+
+
+def stage(name: str):
+    """ Returns context recording a stage of the running command, see
+    Profiler.stage()
+    """
+    return profiler.stage(name)
+
+
+def iter_stage(name: str, iterable: Iterable) -> Iterator:
+    """ Yields items of iterable, timing each as a stage while profiling """
+    if not profiler.enabled:
+        return iter(iterable)
+    return profiler.iter_stage(name, iterable)
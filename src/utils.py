@@ -1,21 +1,227 @@
 """ Miscellaneous utility functions """
+import io
+import itertools
 import logging
 import os
+import numpy as np
 import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import src.dataset_cache
 
 
 logger = logging.getLogger(__name__)
 
 
-def load_df_from_dataset(file_name: str) -> pd.DataFrame:
+#: Dataset columns used by the application, with their pinned dtypes
+DATASET_DTYPES = {
+    'color': 'category',
+    'director_name': str,
+    'num_critic_for_reviews': 'float64',
+    'duration': 'float64',
+    'actor_2_name': str,
+    'gross': 'float64',
+    'genres': str,
+    'actor_1_name': str,
+    'movie_title': str,
+    'num_voted_users': 'float64',
+    'cast_total_facebook_likes': 'float64',
+    'actor_3_name': str,
+    'facenumber_in_poster': 'float64',
+    'plot_keywords': str,
+    'movie_imdb_link': str,
+    'num_user_for_reviews': 'float64',
+    'language': 'category',
+    'country': 'category',
+    'content_rating': 'category',
+    'budget': 'float64',
+    'title_year': 'float64',
+    'imdb_score': 'float64',
+    'aspect_ratio': 'float64',
+    'movie_facebook_likes': 'float64',
+}
+
+#: Columns of DATASET_DTYPES holding numbers
+NUMERIC_COLUMNS = [
+    name for name, dtype in DATASET_DTYPES.items() if dtype == 'float64'
+]
+
+#: DATASET_DTYPES with numeric columns as text. Files with values in them
+#: that aren't numbers are read again with these, as parsing numbers as text
+#: and converting them takes twice as long.
+TEXT_DTYPES = dict(DATASET_DTYPES, **{name: str for name in NUMERIC_COLUMNS})
+
+#: Bytes read at a time when previews skip records or read them backwards
+PREVIEW_BLOCK_SIZE = 1 << 16
+
+
+def load_df_from_dataset(
+        file_name: str, file_stamp: Optional[Dict]=None
+) -> pd.DataFrame:
     """ Loads cleaned dataframe from csv
 
-    Fields with extra records get logged and dropped.
+    Fields with extra records get logged and dropped. Only the columns in
+    DATASET_DTYPES are loaded, with their dtypes pinned rather than inferred.
+    Values of numeric columns that aren't numbers are logged and loaded as
+    missing. The frame index is the record's position in the file.
+
+    The cleaned frame is cached on disk, and read from there until the file
+    changes (see src.dataset_cache).
+
+    :param file_stamp: Optional stamp of the file from
+        src.dataset_cache.get_file_stamp(), so the cache doesn't hash the
+        file again
+    """
+    cache = src.dataset_cache.get_default_cache()
+    if cache is not None:
+        df = cache.load(file_name, DATASET_DTYPES, file_stamp)
+        if df is not None:
+            return df
+        stamp = file_stamp or src.dataset_cache.get_file_stamp(file_name)
+
+    bad_record_ids, num_records = find_suspicious_records(file_name)
+    try:
+        df = pd.read_csv(
+            file_name, usecols=list(DATASET_DTYPES), dtype=DATASET_DTYPES,
+            skiprows=[record_id+1 for record_id in bad_record_ids]
+        )
+    except ValueError as ex:
+        logger.warning('Reading numbers as text: %s' % ex)
+        df = pd.read_csv(
+            file_name, usecols=list(DATASET_DTYPES), dtype=TEXT_DTYPES,
+            skiprows=[record_id+1 for record_id in bad_record_ids]
+        )
+
+    if bad_record_ids:
+        df.index = pd.RangeIndex(num_records).drop(bad_record_ids)
+    convert_numeric_columns(df)
+
+    if cache is not None:
+        cache.store(file_name, DATASET_DTYPES, stamp, df)
+    return df
+
+
+def iter_df_chunks_from_dataset(
+        file_name: str, chunk_size: int, file_stamp: Optional[Dict]=None
+) -> Iterator[pd.DataFrame]:
+    """ Streams cleaned dataframes of up to chunk_size records from csv
+
+    Same cleanup and index as load_df_from_dataset, but only one chunk of
+    the file is held in memory at a time. Chunks are read from the dataset
+    cache when it has the file, but streaming doesn't fill the cache.
+
+    :param file_stamp: Optional stamp of the file, see load_df_from_dataset
+    """
+    cache = src.dataset_cache.get_default_cache()
+    if cache is not None:
+        chunks = cache.iter_chunks(
+            file_name, DATASET_DTYPES, chunk_size, file_stamp
+        )
+        if chunks is not None:
+            yield from chunks
+            return
+
+    bad_record_ids, _ = find_suspicious_records(file_name)
+
+    # Kept record n (counting from 0) is record n + number of bad records
+    # before it. Bad id minus its rank is the first kept record it shifts.
+    bad_shifts = np.array(bad_record_ids, dtype='int64') - np.arange(
+        len(bad_record_ids), dtype='int64'
+    )
+
+    skip_rows = [record_id+1 for record_id in bad_record_ids]
+    dtypes = DATASET_DTYPES
+    num_kept = 0
+    while True:
+        chunks = pd.read_csv(
+            file_name, usecols=list(DATASET_DTYPES), dtype=dtypes,
+            skiprows=skip_rows, chunksize=chunk_size
+        )
+        try:
+            for df in chunks:
+                kept_ids = np.arange(
+                    num_kept, num_kept+len(df), dtype='int64'
+                )
+                df.index = kept_ids + np.searchsorted(
+                    bad_shifts, kept_ids, side='right'
+                )
+                num_kept += len(df)
+                yield convert_numeric_columns(df)
+            return
+
+        except ValueError as ex:
+            if dtypes is TEXT_DTYPES:
+                raise
+            logger.warning('Reading numbers as text: %s' % ex)
+
+        # Read again from the chunk that failed, skipping the records
+        # before it as well
+        dtypes = TEXT_DTYPES
+        num_done = num_kept + int(
+            np.searchsorted(bad_shifts, num_kept, side='right')
+        )
+        bad_rows = set(skip_rows)
+
+        def skip_rows(row: int) -> bool:
+            return 0 < row <= num_done or row in bad_rows
+
+
+def convert_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """ Converts numeric columns to float64 in place, for frames that may
+    have read them as text
+
+    Values that aren't numbers are logged with their record id and become
+    missing.
+
+    :return: The frame
+    """
+    for column in NUMERIC_COLUMNS:
+        if column not in df:
+            continue
+
+        texts = df[column]
+        values = pd.to_numeric(texts, errors='coerce').astype('float64')
+        is_bad = values.isna() & texts.notna()
+        for record_id, text in texts[is_bad].items():
+            logger.warning('Record #%s has "%s" for number column "%s"' % (
+                record_id, text, column
+            ))
+        df[column] = values
+    return df
+
+
+def find_suspicious_records(file_name: str) -> Tuple[List[int], int]:
+    """ Finds records with entries in a trailing unnamed column
+
+    Such records have an extra field (eg a comma in the title), which shifts
+    the rest of their values into the wrong columns. Only the suspicious
+    column itself is parsed here.
+
+    :return: List of suspicious record ids, and number of records in file
+        (only counted if there is a suspicious column)
+    """
+    bad_column_name = find_suspicious_column(
+        pd.read_csv(file_name, nrows=0).columns
+    )
+    if bad_column_name is None:
+        return [], 0
+
+    bad_column = pd.read_csv(
+        file_name, usecols=[bad_column_name], dtype=str
+    )[bad_column_name]
+    bad_record_ids = bad_column.index[bad_column.notna()].tolist()
+    for record_id in bad_record_ids:
+        logger.warning('Skipping record: #%s' % record_id)
+
+    return bad_record_ids, len(bad_column)
+
+
+def find_suspicious_column(columns: Iterable[str]) -> Optional[str]:
+    """ Returns name of the last unnamed column, other than a leading index
+    column, if any
     """
-    df = pd.read_csv(file_name)
-    bad_column = None
     bad_column_name = None
-    for column in df.columns:
+    for column in columns:
         if not column.startswith('Unnamed:'):
             # Only care about unnamed columns
             continue
@@ -26,19 +232,179 @@ def load_df_from_dataset(file_name: str) -> pd.DataFrame:
             continue
 
         bad_column_name = column
-        bad_column = df[column]
         logger.warning('Found suspicious column "%s"' % column)
 
-    if bad_column is not None:
-        # Drop records that have entries in trailing unnamed column
-        bad_records = df[bad_column.notna()]
-        for record in bad_records.iterrows():
-            logger.warning('Skipping record: #%s' % record[0])
+    return bad_column_name
 
-        df = df.drop(bad_records.index)
-        df = df.drop(columns=[bad_column_name])
 
-    return df
+def load_df_preview(
+        file_name: str, num_records: int, offset: int=0
+) -> pd.DataFrame:
+    """ Loads cleaned dataframe of num_records records from offset
+
+    Same cleanup and index as load_df_from_dataset, but with every column of
+    the file other than the suspicious one. Columns in DATASET_DTYPES get
+    their pinned dtypes, others are inferred. The records before offset are
+    skipped without parsing them, and only the records asked for are parsed
+    and checked for suspicious entries.
+    """
+    with open(file_name, 'rb') as in_file:
+        header = in_file.readline()
+        skip_records(in_file, offset)
+        records = list(itertools.islice(iter_records(in_file), num_records))
+
+    return load_df_from_lines(header, records, offset)
+
+
+def load_df_tail_preview(file_name: str, num_records: int) -> pd.DataFrame:
+    """ Loads cleaned dataframe of the last num_records records
+
+    Like load_df_preview, but the records are found by reading blocks
+    backwards from the end of the file, so its size doesn't matter. As the
+    number of records before them is unknown, the frame index counts back
+    from the end of the file, the last record being -1.
+    """
+    with open(file_name, 'rb') as in_file:
+        header = in_file.readline()
+        data_start = in_file.tell()
+
+        in_file.seek(0, os.SEEK_END)
+        position = in_file.tell()
+        data = b''
+        breaks = []
+        # One more record break than records, so the first record is whole
+        while position > data_start and len(breaks) <= num_records:
+            block_size = min(PREVIEW_BLOCK_SIZE, position - data_start)
+            position -= block_size
+            in_file.seek(position)
+            data = in_file.read(block_size) + data
+            breaks = find_record_breaks(data.rstrip(b'\r\n'))
+
+    data = data.rstrip(b'\r\n')
+    records = [
+        data[start:end] for start, end in zip(
+            [0] + [end + 1 for end in breaks], breaks + [len(data)]
+        )
+    ] if data.strip() else []
+    if position > data_start:
+        # First record may have started before the blocks read
+        records = records[1:]
+    records = records[max(0, len(records) - num_records):]
+
+    return load_df_from_lines(
+        header, [record + b'\n' for record in records], -len(records)
+    )
+
+
+def skip_records(in_file, num_records: int):
+    """ Moves binary file past its next num_records csv records, or to its
+    end
+
+    A line break inside a quoted field doesn't end a record. Quotes come in
+    pairs, doubled ones included, so splitting a block at its quotes gives
+    runs of text that are alternately outside and inside quotes, and only
+    the line breaks of runs outside quotes are counted.
+    """
+    is_quoted = False
+    while num_records > 0:
+        position = in_file.tell()
+        block = in_file.read(PREVIEW_BLOCK_SIZE)
+        if not block:
+            return
+
+        run_start = 0
+        for run_id, run in enumerate(block.split(b'"')):
+            if run_id > 0:
+                is_quoted = not is_quoted
+            if not is_quoted:
+                num_breaks = run.count(b'\n')
+                if num_breaks >= num_records:
+                    end = -1
+                    for _ in range(num_records):
+                        end = run.index(b'\n', end + 1)
+                    in_file.seek(position + run_start + end + 1)
+                    return
+                num_records -= num_breaks
+            run_start += len(run) + 1
+
+
+def iter_records(in_file) -> Iterator[bytes]:
+    """ Yields csv records of binary file from its position, each with its
+    line breaks, quoted ones included
+    """
+    record = b''
+    is_quoted = False
+    for line in in_file:
+        record += line
+        if line.count(b'"') % 2:
+            is_quoted = not is_quoted
+        if not is_quoted:
+            yield record
+            record = b''
+    if record:
+        yield record
+
+
+def find_record_breaks(data: bytes) -> List[int]:
+    """ Returns positions of the line breaks that end csv records in data
+    running to the end of a file
+
+    The file ends outside quotes, so a line break is outside them when an
+    even number of quotes comes after it.
+    """
+    breaks = []
+    num_quotes = 0
+    end = len(data)
+    position = data.rfind(b'\n')
+    while position >= 0:
+        num_quotes += data.count(b'"', position + 1, end)
+        if num_quotes % 2 == 0:
+            breaks.append(position)
+        end = position
+        position = data.rfind(b'\n', 0, end)
+    breaks.reverse()
+    return breaks
+
+
+def load_df_from_lines(
+        header: bytes, lines: List[bytes], first_record_id: int
+) -> pd.DataFrame:
+    """ Loads cleaned dataframe from csv header and record lines
+
+    Records with entries in the suspicious column are logged and dropped,
+    like find_suspicious_records does for the whole file. Every column other
+    than the suspicious one is loaded, see load_df_preview.
+
+    :param first_record_id: Index of the first record in the frame
+    """
+    data = header + b''.join(lines)
+    columns = pd.read_csv(io.BytesIO(data), nrows=0).columns
+    bad_column_name = find_suspicious_column(columns)
+    bad_record_ids = []
+    if bad_column_name is not None:
+        bad_column = pd.read_csv(
+            io.BytesIO(data), usecols=[bad_column_name], dtype=str
+        )[bad_column_name]
+        bad_record_ids = np.flatnonzero(bad_column.notna()).tolist()
+        for record_id in bad_record_ids:
+            logger.warning(
+                'Skipping record: #%s' % (record_id + first_record_id)
+            )
+
+    df = pd.read_csv(
+        io.BytesIO(data),
+        usecols=[column for column in columns if column != bad_column_name],
+        dtype={
+            column: dtype for column, dtype in TEXT_DTYPES.items()
+            if column in columns
+        },
+        skiprows=[record_id+1 for record_id in bad_record_ids]
+    )
+    record_ids = np.arange(len(df) + len(bad_record_ids), dtype='int64')
+    df.index = record_ids[~np.isin(record_ids, bad_record_ids)] + (
+        first_record_id
+    )
+    return convert_numeric_columns(df)
 
 
 def get_default_dataset_filename() -> str:
@@ -0,0 +1,197 @@
+""" Views for running many commands in one process """
+import cmd
+import logging
+import shlex
+import sys
+import time
+from typing import Iterable, List, Mapping, Tuple
+
+import src.model.db
+from src.view import cli_view
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_command(
+        view_lookup: Mapping[str, cli_view.CliView], argv: List[str]
+) -> Tuple[bool, float]:
+    """ Runs one command, reporting its time on stderr
+
+    Failures are logged and reported rather than raised, so the commands
+    after it still run. The calling thread's session is removed afterwards,
+    so the next command sees fresh data, and engine profile defaults set by
+    the command are undone.
+
+    :param view_lookup: Map of command name to view
+    :param argv: Command name followed by its arguments
+    :return: Whether command succeeded, and its seconds taken
+    """
+    command_name = argv[0].lower()
+    view = view_lookup.get(command_name)
+    if view is None:
+        print('Error, "%s" is not a recognized command' % command_name)
+        return False, 0.0
+
+    logger.info('Running command: "%s"' % command_name)
+    start = time.perf_counter()
+    succeeded = True
+    try:
+        view.do_command(argv[1:])
+
+    except SystemExit as ex:
+        # Argument parsers exit on bad arguments or --help
+        succeeded = ex.code in (None, 0)
+
+    except Exception as ex:
+        logger.exception('Error running "%s"' % ' '.join(argv))
+        print('Error running "%s": %s' % (command_name, ex))
+        succeeded = False
+
+    finally:
+        src.model.db.EngineWrapper.remove_session()
+        src.model.db.EngineWrapper.set_default_profile('default')
+
+    elapsed = time.perf_counter() - start
+    print('# %s: %.3f s%s' % (
+        ' '.join(argv), elapsed, '' if succeeded else ' (failed)'
+    ), file=sys.stderr)
+    return succeeded, elapsed
+
+
+def parse_command_line(line: str) -> List[str]:
+    """ Splits command line into arguments, ignoring # comments """
+    return shlex.split(line, comments=True)
+
+
+class BatchView(cli_view.CliView):
+    """ Runs commands from a file, one per line, in a single process
+
+    Usage: batch <file name | ->
+
+    Reads commands from standard input when given "-". Lines are split like
+    a shell would, and text after # is ignored. The time of each command,
+    and a summary at the end, are reported on standard error. Commands keep
+    running after one fails.
+    """
+    def __init__(self):
+        super().__init__()
+        self._view_lookup = {}
+
+    @property
+    def view_lookup(self) -> Mapping[str, cli_view.CliView]:
+        """ Returns map of command name to view """
+        return self._view_lookup
+
+    @view_lookup.setter
+    def view_lookup(self, views: Mapping[str, cli_view.CliView]):
+        """ Setter for map of command name to view """
+        self._view_lookup = views
+
+    def get_cli_name(self) -> str:
+        return 'batch'
+
+    def do_command(self, argv: List[str]):
+        if len(argv) != 1:
+            print('Usage: %s <file name | ->' % self.get_cli_name())
+            return
+
+        if argv[0] == '-':
+            self.run_lines(sys.stdin)
+        else:
+            with open(argv[0]) as in_file:
+                self.run_lines(in_file)
+
+    def run_lines(self, lines: Iterable[str]):
+        """ Runs command on each line """
+        num_commands = 0
+        num_failed = 0
+        total_time = 0.0
+        for line in lines:
+            command_argv = parse_command_line(line)
+            if not command_argv:
+                continue
+
+            succeeded, elapsed = run_command(self.view_lookup, command_argv)
+            num_commands += 1
+            num_failed += 0 if succeeded else 1
+            total_time += elapsed
+
+        print('# %s commands, %s failed, %.3f s' % (
+            num_commands, num_failed, total_time
+        ), file=sys.stderr)
+
+
+class CommandShell(cmd.Cmd):
+    """ Interactive prompt running cli commands """
+    intro = 'Type a command, "help" for commands, or "exit" to quit.'
+    prompt = 'cli> '
+
+    def __init__(self, view_lookup: Mapping[str, cli_view.CliView]):
+        super().__init__()
+        self.view_lookup = view_lookup
+
+    def emptyline(self):
+        """ Does nothing, rather than repeating the last command """
+        pass
+
+    def default(self, line: str):
+        try:
+            command_argv = parse_command_line(line)
+        except ValueError as ex:
+            print('Error: %s' % ex)
+            return
+
+        if command_argv:
+            run_command(self.view_lookup, command_argv)
+
+    def do_help(self, arg: str):
+        """ Runs the cli help command, rather than cmd's own """
+        self.default('help ' + arg)
+
+    def do_exit(self, arg: str):
+        """ Leaves the shell """
+        return True
+
+    def do_quit(self, arg: str):
+        """ Leaves the shell """
+        return True
+
+    def do_EOF(self, arg: str):
+        """ Leaves the shell on end of input """
+        print('')
+        return True
+
+
+class ShellView(cli_view.CliView):
+    """ Runs interactive shell of cli commands in a single process
+
+    Usage: shell
+
+    The database engine, connection pool and query cache are shared by
+    every command, and the time of each command is reported on standard
+    error. Leave with "exit" or end of input.
+    """
+    def __init__(self):
+        super().__init__()
+        self._view_lookup = {}
+
+    @property
+    def view_lookup(self) -> Mapping[str, cli_view.CliView]:
+        """ Returns map of command name to view """
+        return self._view_lookup
+
+    @view_lookup.setter
+    def view_lookup(self, views: Mapping[str, cli_view.CliView]):
+        """ Setter for map of command name to view """
+        self._view_lookup = views
+
+    def get_cli_name(self) -> str:
+        return 'shell'
+
+    def do_command(self, argv: List[str]):
+        if argv:
+            print('Usage: %s' % self.get_cli_name())
+            return
+
+        CommandShell(self.view_lookup).cmdloop()
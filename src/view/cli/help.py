@@ -1,5 +1,6 @@
-from typing import Dict, List
+from typing import List
 
+from src.view import cli_registry
 from src.view import cli_view
 
 
@@ -11,16 +12,16 @@ class HelpView(cli_view.CliView):
     """
     def __init__(self):
         super().__init__()
-        self._view_lookup = {}
+        self._view_lookup = None
 
     @property
-    def view_lookup(self) -> Dict[str, cli_view.CliView]:
-        """ Returns list of views """
+    def view_lookup(self) -> cli_registry.ViewRegistry:
+        """ Returns registry of views """
         return self._view_lookup
 
     @view_lookup.setter
-    def view_lookup(self, views: Dict[str, cli_view.CliView]):
-        """ Setter for list of views """
+    def view_lookup(self, views: cli_registry.ViewRegistry):
+        """ Setter for registry of views """
         self._view_lookup = views
 
     def get_cli_name(self) -> str:
@@ -30,7 +31,8 @@ class HelpView(cli_view.CliView):
         if len(argv) == 1:
             command_name = argv[0]
             if command_name in self.view_lookup:
-                print(self.view_lookup[command_name].__doc__.strip())
+                # From the manifest, so the view isn't imported
+                print(self.view_lookup.get_doc(command_name).strip())
 
             else:
                 print('Error, command "%s" not recognized' % command_name)
@@ -38,5 +40,5 @@ class HelpView(cli_view.CliView):
         else:
             print('Use help <command> to get help on a command')
             print('Available commands:')
-            for view in self.view_lookup.values():
-                print('\t%s' % view.get_cli_name())
+            for command_name in self.view_lookup:
+                print('\t%s' % command_name)
@@ -1,300 +1,418 @@
+import argparse
 import logging
+import os
 import pandas as pd
-import re
-from typing import List
+from typing import Dict, List, Set, Tuple
 
+import src.controller.load
 import src.controller.movie
 import src.controller.fields
 import src.controller.person
+import src.controller.stats
+import src.controller.version
+import src.dataset_cache
 import src.model.db
 import src.model.movie
+import src.model.stats
+import src.profiling
 import src.utils
 from src.view import cli_view
+from src.view import ingest
 
 logger = logging.getLogger(__name__)
 
 
-# Regular expression for pulling out id from IMDB url
-IMDB_URL_ID_RE = re.compile('title/tt(\d+)/')
-
-
 class LoadDataView(cli_view.CliView):
-    """ Loads data into database """
-    def get_cli_name(self) -> str:
-        return 'load-data'
+    """ Loads data into database
 
-    def do_command(self, argv: List[str]):
-        if len(argv) == 0:
-            file_name = src.utils.get_default_dataset_filename()
+    Usage: load-data [--batch-size N] [--chunk-size N] [--workers N]
+        [--full] [--delete-missing] [file name]
 
-        elif len(argv) == 1:
-            file_name = argv[0]
+    File name defaults to 'data/movie_metadata.csv'. Movie records are written
+    in batches of --batch-size rows (default 500).
 
-        else:
-            print('Usage: %s [file name]' % self.get_cli_name())
-            return
+    With --chunk-size, the file is streamed in chunks of that many records,
+    each committed before the next is read, so files larger than memory can
+    be loaded.
 
-        logger.info('Loading file "%s"' % file_name)
-        data = src.utils.load_df_from_dataset(file_name)
+    With --workers, records are normalized in that many worker processes,
+    while the database is written from this process in file order.
 
-        # Build db and get session
-        engine = src.model.db.EngineWrapper.get_engine()
-        src.model.db.ModelBase.metadata.create_all(engine)
-        session = src.model.db.EngineWrapper.get_session()
+    Loads are incremental: a file with the same contents as the last one
+    loaded is skipped, and only movies whose record changed since they were
+    last loaded are written. --full writes every movie regardless. With
+    --delete-missing, movies not in the file are deleted.
 
-        # Process movie category fields
-        print('Updating initial field tables')
-        src.controller.fields.AddMovieColors(logger).execute(
-            color_names=get_clean_category_names(data['color'])
-        )
-        src.controller.fields.AddCountries(logger).execute(
-            country_names=get_clean_category_names(data['country'])
-        )
-        src.controller.fields.AddLanguages(logger).execute(
-            language_names=get_clean_category_names(data['language'])
-        )
-        src.controller.fields.AddContentRating(logger).execute(
-            rating_names=get_clean_category_names(data['content_rating'])
-        )
-        src.controller.fields.AddGenres(logger).execute(
-            genre_names=get_clean_keyword_names(data['genres'])
-        )
-        src.controller.fields.AddPlotKeywords(logger).execute(
-            keyword_names=get_clean_keyword_names(data['plot_keywords'])
-        )
+    Uses the bulk-load database profile unless another one is given with
+    cli.py --db-profile or DB_PROFILE.
+    """
+    def get_cli_name(self) -> str:
+        return 'load-data'
 
-        # Get personnel
-        person_names = (
-            get_clean_category_names(data['director_name'])
-            + get_clean_category_names(data['actor_1_name'])
-            + get_clean_category_names(data['actor_2_name'])
-            + get_clean_category_names(data['actor_3_name'])
+    def get_arg_parser(self) -> argparse.ArgumentParser:
+        """ Returns parser for command arguments """
+        parser = argparse.ArgumentParser(prog=self.get_cli_name())
+        parser.add_argument(
+            'file_name', nargs='?',
+            default=src.utils.get_default_dataset_filename()
         )
-        src.controller.person.AddPersons(logger).execute(
-            person_names=person_names
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=src.controller.movie.DEFAULT_BATCH_SIZE
         )
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--delete-missing', action='store_true')
+        return parser
 
-        # Process move record itself
-        process_movie_records(session, data)
-
-        # Attach keywords to movie records
-        process_movie_keywords(session, data)
-
-
-def get_clean_category_names(data_column):
-    """ Returns list of unique categories from data input column """
-    return [
-        raw_name.strip().lower()
-        for raw_name in data_column.unique()
-        if not pd.isna(raw_name)
-    ]
-
-
-def get_clean_keyword_names(data_column, delim='|'):
-    """ Returns list of unique keywords from data input column """
-    keyword_set = set()
-    for raw_keywords in data_column:
-        if pd.isna(raw_keywords):
-            continue
-
-        for raw_keyword in raw_keywords.split(delim):
-            keyword = raw_keyword.strip().lower()
-            if not keyword:
-                continue
-            keyword_set.add(keyword)
-
-    return list(keyword_set)
-
-
-def lookup_category_id(raw_name: str, lookup):
-    """ Looks up category id by name """
-    if not pd.isna(raw_name):
-        return lookup[raw_name.strip().lower()]
-    else:
-        return None
-
-
-def process_movie_records(session, data: pd.DataFrame):
-    """ Adds list of movie records to database from data input """
-    # Category lookup fiels
-    movie_color_lookup = src.controller.fields.MovieColorIndexLookup(
-        logger
-    ).query()
-    country_lookup = src.controller.fields.CountryIndexLookup(
-        logger
-    ).query()
-    language_lookup = src.controller.fields.LanguageIndexLookup(
-        logger
-    ).query()
-    rating_lookup = src.controller.fields.ContentRatingIndexLookup(
-        logger
-    ).query()
-    person_lookup = src.controller.person.PersonIndexLookup(
-        logger
-    ).query()
-
-    # Lookup of movie record number by title+year
-    movie_title_index = {}
-    print('Updating movie records')
-    for i, record in data.iterrows():
-        record_no = i+1
-
-        if record_no % 500 == 0:
-            print('\tProcessing record #%s' % record_no)
+    def do_command(self, argv: List[str]):
+        args = self.get_arg_parser().parse_args(argv)
+        file_name = args.file_name
 
-        # Get searchable title+year of movie record
-        movie_title = record['movie_title'].strip()
-        movie_title_l = movie_title.lower()
-        movie_year = record['title_year']
+        # Build db and get session
+        src.model.db.EngineWrapper.set_default_profile('bulk-load')
+        engine = src.model.db.EngineWrapper.get_engine()
+        src.model.db.ModelBase.metadata.create_all(engine)
+        session = src.model.db.EngineWrapper.get_session()
 
-        if pd.isna(movie_title_l):
-            logger.warning(
-                'Movie with no title on record #%s' % record_no
+        with src.profiling.stage('check file'):
+            file_stamp = src.dataset_cache.get_file_stamp(file_name)
+            is_loaded = not args.full and is_file_loaded(
+                session, file_stamp, args.delete_missing
             )
-            continue
+        if is_loaded:
+            print('File "%s" is unchanged since the last load' % file_name)
+            return
 
-        if pd.isna(movie_year):
-            movie_year = ''
-        else:
-            movie_year = str(movie_year)
+        # Content hashes of loaded movies, for skipping unchanged records
+        movie_hashes = {}
+        if not args.full:
+            movie_hashes = src.controller.load.MovieContentHashes(
+                logger, session=session
+            ).query()
 
-        movie_record_index = (movie_title_l, movie_year)
+        # Movie (title, year) keys to record id, for skipping duplicates
+        seen_movie_keys = {}
+        first_movie_keys = set()
+        hash_args = (movie_hashes, first_movie_keys, seen_movie_keys)
 
-        if movie_record_index in movie_title_index:
-            logger.warning(
-                'Duplicate movie "%s" (#%s, #%s)' % (
-                    movie_title, movie_title_index[movie_title_l], record_no
+        logger.info('Loading file "%s"' % file_name)
+        if args.chunk_size is None:
+            # Whole file is one chunk, normalized in shards when parallel
+            with src.profiling.stage('read dataset'):
+                data = src.utils.load_df_from_dataset(file_name, file_stamp)
+                data = drop_unchanged_records(data, *hash_args)
+            with src.profiling.stage('normalize records'):
+                chunks = [pd.concat(ingest.iter_normalized_records(
+                    ingest.split_frame(data, 4 * args.workers), args.workers
+                ))] if len(data) else []
+        else:
+            # Chunks are read and normalized as they are iterated
+            chunks = src.profiling.iter_stage(
+                'read and normalize chunk',
+                ingest.iter_normalized_records(
+                    (
+                        drop_unchanged_records(data, *hash_args)
+                        for data in src.utils.iter_df_chunks_from_dataset(
+                            file_name, args.chunk_size, file_stamp
+                        )
+                    ),
+                    args.workers
                 )
             )
-            continue
 
-        else:
-            # Mark movie by record number in dataframe
-            movie_title_index[movie_title_l] = record_no
-
-        # Get category ids by name
-        movie_color_pk = lookup_category_id(record['color'], movie_color_lookup)
-        country_pk = lookup_category_id(record['country'], country_lookup)
-        language_pk = lookup_category_id(record['language'], language_lookup)
-        rating_pk = lookup_category_id(record['content_rating'], rating_lookup)
-        director_pk = lookup_category_id(record['director_name'], person_lookup)
-
-        # Get movie's imdb id
-        imdb_link = record['movie_imdb_link']
-        if imdb_link:
-            search_results = IMDB_URL_ID_RE.search(imdb_link)
-            if search_results is None:
-                imdb_id = None
-            else:
-                imdb_id = search_results.group(1)
-        else:
-            imdb_id = None
-
-        # Get movie's numerical stats
-        aspect_ratio = src.utils.nan_to_none(record['aspect_ratio'])
-        budget = src.utils.nan_to_none(record['budget'])
-        cast_likes = src.utils.nan_to_none(record['cast_total_facebook_likes'])
-        duration = src.utils.nan_to_none(record['duration'])
-        facenum = src.utils.nan_to_none(record['facenumber_in_poster'])
-        gross = src.utils.nan_to_none(record['gross'])
-        imdb_score = src.utils.nan_to_none(record['imdb_score'])
-        facebook_likes = src.utils.nan_to_none(record['movie_facebook_likes'])
-        num_critic = src.utils.nan_to_none(record['num_critic_for_reviews'])
-        num_user = src.utils.nan_to_none(record['num_user_for_reviews'])
-        num_voted = src.utils.nan_to_none(record['num_voted_users'])
-
-        # Add movie record. Manaully take over session and comitting
-        src.controller.movie.AddMovie(
-            logger=logger, session=session, commit_enabled=False
-        ).execute(
-            movie_title=movie_title, title_year=movie_year,
-            content_rating_pk=rating_pk, color_pk=movie_color_pk,
-            country_pk=country_pk, director_pk=director_pk,
-            language_pk=language_pk, aspect_ratio=aspect_ratio, budget=budget,
-            cast_facebook_likes=cast_likes, duration=duration, facenum=facenum,
-            gross=gross, imdb_id=imdb_id, imdb_score=imdb_score,
-            movie_facebook_likes=facebook_likes,
-            num_critic_for_reviews=num_critic, num_user_for_reviews=num_user,
-            num_voted_users=num_voted
+        for records in chunks:
+            if args.chunk_size is not None and len(records):
+                print('Loading records #%s to #%s' % (
+                    records.index[0]+1, records.index[-1]+1
+                ))
+            load_chunk(session, records, seen_movie_keys, args.batch_size)
+
+        if args.delete_missing:
+            with src.profiling.stage('delete missing movies'):
+                delete_missing_movies(session, seen_movie_keys)
+
+        src.controller.load.RecordDataLoad(logger, session=session).execute(
+            file_name=os.path.abspath(file_name),
+            file_size=file_stamp['size'], file_sha256=file_stamp['sha256'],
+            delete_missing=args.delete_missing
         )
 
-    session.commit()
 
+def drop_unchanged_records(
+        data: pd.DataFrame,
+        movie_hashes: Dict[Tuple[str, str], Tuple[int, str]],
+        first_keys: Set[Tuple[str, str]],
+        seen_keys: Dict[Tuple[str, str], int]
+) -> pd.DataFrame:
+    """ Drops records of unchanged movies from cleaned dataset frame, see
+    ingest.drop_unchanged_records()
+    """
+    num_records = len(data)
+    data = ingest.drop_unchanged_records(
+        data, movie_hashes, first_keys, seen_keys
+    )
+    if movie_hashes:
+        print('Skipping %s unchanged movie records' % (
+            num_records - len(data)
+        ))
+    return data
+
+
+def is_file_loaded(session, file_stamp: Dict, delete_missing: bool) -> bool:
+    """ Returns whether the last load was of a file with the same contents,
+    and deleted missing movies if asked to
+    """
+    last_load = src.controller.load.LastDataLoad(
+        logger, session=session
+    ).query()
+    return (
+        last_load is not None
+        and last_load['file_size'] == file_stamp['size']
+        and last_load['file_sha256'] == file_stamp['sha256']
+        and (last_load['delete_missing'] or not delete_missing)
+    )
+
+
+def load_chunk(
+        session, records: pd.DataFrame,
+        seen_movie_keys: Dict[Tuple[str, str], int], batch_size: int
+):
+    """ Loads frame of normalized movie records and commits them
+
+    :param session: Session movie data and summaries are written with
+    :param records: Normalized records, from ingest.normalize_records().
+        If they have a content_hash column, their movies' content hashes
+        are set to it.
+    :param seen_movie_keys: Keys of movies loaded so far, updated in place
+    :param batch_size: Number of movie rows to write at once
+    """
+    # Unchanged movies can still have later duplicate records in the chunk
+    records = ingest.drop_duplicate_movies(records, seen_movie_keys)
+    if records.empty:
+        return
+
+    with src.profiling.stage('category fields'):
+        lookups = process_category_fields(records, session)
+
+    # Process movie records along with their genres, keywords and actors
+    with src.profiling.stage('movies'):
+        movie_changes, mapped_pks = process_movies(
+            session, records, lookups, batch_size
+        )
+        if 'content_hash' in records:
+            src.controller.load.SetMovieContentHashes(
+                logger, session=session, commit_enabled=False
+            ).execute(content_hashes={
+                movie_changes.movie_pks[movie_key]: content_hash
+                for movie_key, content_hash in zip(
+                    zip(records['title_key'], records['title_year']),
+                    records['content_hash']
+                )
+            })
+
+    # Refresh profit summaries of genres and persons touched by the load,
+    # committing them along with the movie data. Cached query results only
+    # go stale if a movie or one of its mappings changed.
+    print('Updating profit summaries')
+    with src.profiling.stage('profit summaries and commit'):
+        genre_pks, person_pks = src.controller.stats.ProfitSummaryGroups(
+            logger, session=session
+        ).query(movie_pks=movie_changes.changed_pks)
+        genre_pks.update(mapped_pks['genre'])
+        person_pks.update(mapped_pks['actor'])
+        person_pks.update(movie_changes.replaced_director_pks)
+        refresh_and_commit(
+            session, genre_pks, person_pks, bump_version=bool(
+                movie_changes.changed_pks or any(mapped_pks.values())
+            )
+        )
 
-def process_movie_keywords(session, data: pd.DataFrame):
-    """ Attaches genre keywords to movie records """
-    movie_title_index = {}
-    movie_index = src.controller.movie.MovieLookupIndex(logger).query()
-    genre_index = src.controller.fields.GenreIndexLookup(logger).query()
-    keyword_index = src.controller.fields.PlotKeywordIndexLookup(logger).query()
-    actor_index = src.controller.person.PersonIndexLookup(logger).query()
-
-    print('Updating movie mappings')
-    for i, record in data.iterrows():
-        record_no = i+1
 
-        if record_no % 500 == 0:
-            print('\tProcessing record #%s' % record_no)
+def delete_missing_movies(
+        session, seen_movie_keys: Dict[Tuple[str, str], int]
+):
+    """ Deletes movies not among the loaded keys, and commits
+
+    Profit summaries of their genres and persons are refreshed in the same
+    transaction.
+    """
+    movie_pks = [
+        movie_pk
+        for movie_key, movie_pk in src.controller.movie.MovieLookupIndex(
+            logger, session=session
+        ).query().items()
+        if movie_key not in seen_movie_keys
+    ]
+    print('Deleting %s movies missing from file' % len(movie_pks))
+    if not movie_pks:
+        return
+
+    genre_pks, person_pks = src.controller.stats.ProfitSummaryGroups(
+        logger, session=session
+    ).query(movie_pks=movie_pks)
+    src.controller.movie.DeleteMovies(
+        logger, session=session, commit_enabled=False
+    ).execute(movie_pks=movie_pks)
+    refresh_and_commit(session, genre_pks, person_pks)
+
+
+def refresh_and_commit(
+        session, genre_pks, person_pks, bump_version: bool=True
+):
+    """ Refreshes profit summaries of genres and persons, bumps the data
+    version unless bump_version is false, and commits
+    """
+    src.controller.stats.RefreshProfitSummaries(
+        logger, session=session, commit_enabled=False
+    ).execute(genre_pks=genre_pks, person_pks=person_pks)
+
+    # Cached query results go stale along with the commit
+    if bump_version:
+        src.controller.version.BumpDataVersion(
+            logger, session=session, commit_enabled=False
+        ).execute()
+    session.commit()
 
-        # Get searchable title+year of movie record
-        movie_title = record['movie_title'].strip()
-        movie_title_l = movie_title.lower()
-        movie_year = record['title_year']
 
-        if pd.isna(movie_title_l):
-            continue
+def process_category_fields(
+        records: pd.DataFrame, session=None
+) -> Dict[str, Dict[str, int]]:
+    """ Adds movie category fields and persons found in records
+
+    :param records: Normalized movie records
+    :param session: Optional session to add them with
+    :return: Map of lookup name to dictionary of the records' category names
+        to pks
+    """
+    print('Updating initial field tables')
+    kwargs = {'logger': logger, 'session': session}
+    lookups = {}
+    lookups['color'] = src.controller.fields.AddMovieColors(**kwargs).execute(
+        color_names=ingest.get_unique_names(records, 'color')
+    )
+    lookups['country'] = src.controller.fields.AddCountries(**kwargs).execute(
+        country_names=ingest.get_unique_names(records, 'country')
+    )
+    lookups['language'] = src.controller.fields.AddLanguages(
+        **kwargs
+    ).execute(
+        language_names=ingest.get_unique_names(records, 'language')
+    )
+    lookups['rating'] = src.controller.fields.AddContentRating(
+        **kwargs
+    ).execute(
+        rating_names=ingest.get_unique_names(records, 'content_rating')
+    )
+    lookups['genre'] = src.controller.fields.AddGenres(**kwargs).execute(
+        genre_names=ingest.get_unique_names(records, 'genre_names')
+    )
+    lookups['keyword'] = src.controller.fields.AddPlotKeywords(
+        **kwargs
+    ).execute(
+        keyword_names=ingest.get_unique_names(records, 'keyword_names')
+    )
+    lookups['person'] = src.controller.person.AddPersons(**kwargs).execute(
+        person_names=ingest.get_unique_names(
+            records, 'director_name', 'actor_names'
+        )
+    )
+    return lookups
 
-        if pd.isna(movie_year):
-            movie_year = ''
-        else:
-            movie_year = str(movie_year)
 
-        movie_record_index = (movie_title_l, movie_year)
+def process_movies(
+        session, records: pd.DataFrame, lookups: Dict[str, Dict[str, int]],
+        batch_size: int
+):
+    """ Adds movie records and their genre, keyword and actor mappings
 
-        if movie_record_index in movie_title_index:
-            continue
-        else:
-            # Mark movie by record number in dataframe
-            movie_title_index[movie_title_l] = record_no
+    Records are streamed through in batches. Each batch of movies is
+    converted column-wise and written, and the pks that come back are used
+    to attach that batch's mappings right away.
 
-        # Get movies, keywords, and genre ids
-        movie_pk = movie_index[movie_record_index]
+    :return: Merged MovieChanges of every batch, plus map of 'genre',
+        'keyword' and 'actor' to sets of their pks newly attached to or
+        removed from movies
+    """
+    movie_changes = src.controller.movie.MovieChanges({}, set(), set())
+    mapped_pks = {'genre': set(), 'keyword': set(), 'actor': set()}
 
-        if pd.isna(record['genres']):
-            genre_names = []
-        else:
-            genre_names = [
-                name.strip().lower() for name in record['genres'].split('|')
-            ]
-        genre_pks = [genre_index[name] for name in genre_names]
+    print('Updating movie records and mappings')
+    for start in range(0, len(records), batch_size):
+        batch = records.iloc[start:start+batch_size]
+        print('\tProcessing record #%s' % (batch.index[0]+1))
 
-        if pd.isna(record['plot_keywords']):
-            keyword_names = []
-        else:
-            keyword_names = [
-                name.strip().lower()
-                for name in record['plot_keywords'].split('|')
-            ]
-        keyword_pks = [keyword_index[name] for name in keyword_names]
-
-        # Get actor ids
-        actor_names = []
-        for actor_field in ('actor_1_name', 'actor_2_name', 'actor_3_name'):
-            if not pd.isna(record[actor_field]):
-                actor_names.append(record[actor_field].strip().lower())
-        actor_pks = [actor_index[name] for name in actor_names]
-
-        # Add genres and keywords to movie
-        src.controller.movie.AttachMovieGenre(
+        batch_changes = src.controller.movie.BulkAddMovies(
             logger=logger, session=session, commit_enabled=False
-        ).execute(movie_pk=movie_pk, genre_pks=genre_pks)
-        src.controller.movie.AttachMoviePlotKeywords(
-            logger=logger, session=session, commit_enabled=False
-        ).execute(movie_pk=movie_pk, keyword_pks=keyword_pks)
+        ).execute(
+            movie_rows=ingest.build_movie_rows(batch, lookups),
+            batch_size=batch_size
+        )
+        movie_changes.movie_pks.update(batch_changes.movie_pks)
+        movie_changes.changed_pks.update(batch_changes.changed_pks)
+        movie_changes.replaced_director_pks.update(
+            batch_changes.replaced_director_pks
+        )
 
-        # Add actors to movie
-        src.controller.movie.AttachMovieActors(
-            logger=logger, session=session, commit_enabled=False
-        ).execute(movie_pk=movie_pk, actor_pks=actor_pks)
+        for name, pks in process_movie_mappings(
+                session, batch, batch_changes.movie_pks, lookups
+        ).items():
+            mapped_pks[name].update(pks)
+
+    return movie_changes, mapped_pks
+
+
+def process_movie_mappings(
+        session, records: pd.DataFrame,
+        movie_pks: Dict[Tuple[str, str], int],
+        lookups: Dict[str, Dict[str, int]]
+):
+    """ Sets genres, keywords and actors of movie records in bulk
+
+    The records' movies end up with exactly the records' genres, keywords
+    and actors, so those a changed record no longer has are removed.
+
+    :param movie_pks: Map of movie (lower title, year) key to pk
+    :return: Map of 'genre', 'keyword' and 'actor' to sets of their pks
+        newly attached to or removed from movies
+    """
+    genre_pairs = []
+    keyword_pairs = []
+    actor_pairs = []
+    for title_key, title_year, genres, keywords, actors in zip(
+            records['title_key'], records['title_year'],
+            records['genre_names'], records['keyword_names'],
+            records['actor_names']
+    ):
+        movie_pk = movie_pks[(title_key, title_year)]
+        genre_pairs.extend(
+            (movie_pk, lookups['genre'][name]) for name in genres
+        )
+        keyword_pairs.extend(
+            (movie_pk, lookups['keyword'][name]) for name in keywords
+        )
+        actor_pairs.extend(
+            (movie_pk, lookups['person'][name]) for name in actors
+        )
 
-    session.commit()
+    kwargs = {'logger': logger, 'session': session, 'commit_enabled': False}
+    replaced_movie_pks = set(movie_pks.values())
+    changes = {
+        'genre': src.controller.movie.BulkAttachMovieGenres(**kwargs).execute(
+            pairs=genre_pairs, replaced_movie_pks=replaced_movie_pks
+        ),
+        'keyword': src.controller.movie.BulkAttachMoviePlotKeywords(
+            **kwargs
+        ).execute(pairs=keyword_pairs, replaced_movie_pks=replaced_movie_pks),
+        'actor': src.controller.movie.BulkAttachMovieActors(**kwargs).execute(
+            pairs=actor_pairs, replaced_movie_pks=replaced_movie_pks
+        ),
+    }
+    return {
+        name: {
+            other_pk
+            for _, other_pk in pair_changes.attached + pair_changes.detached
+        }
+        for name, pair_changes in changes.items()
+    }
@@ -1,79 +1,152 @@
 """ Views for ranking stats """
+import argparse
+import importlib
 import logging
 from typing import List
 
+import src.controller.rank
 import src.controller.stats
 from src.view import cli_view
 
 
 logger = logging.getLogger(__name__)
 
+#: Choices of --engine, computing rankings from the SQL summary tables or
+#: from NumPy arrays held in memory
+ENGINES = ('sql', 'memory')
 
-def profit_map_to_sorted_list(profit_map, num_limit):
-    """ Returns sorted descending list from profit map of names to values """
-    return sorted(
-        [(name, profit) for name, profit in profit_map.items()],
-        key=lambda x: x[1],
-        reverse=True
-    )[:num_limit]
 
+def get_profit_actions(engine: str):
+    """ Returns genre and person profit action classes of engine
 
-class RankGenresView(cli_view.CliView):
-    """ Lists top n=10 genres ranked by profitability """
+    The memory engine's module is only imported when chosen, as it pulls in
+    numpy and pandas.
+    """
+    if engine == 'memory':
+        memory_stats = importlib.import_module('src.controller.memory_stats')
+        return memory_stats.MemoryGenreProfit, memory_stats.MemoryPersonProfit
+    return src.controller.stats.GenreProfit, src.controller.stats.PersonProfit
+
+
+def get_rank_arg_parser(prog: str, count_name: str) -> argparse.ArgumentParser:
+    """ Returns parser for rank command arguments """
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(count_name, nargs='?', type=int, default=10)
+    parser.add_argument('--engine', choices=ENGINES, default='sql')
+    return parser
+
+
+def positive_int(value: str) -> int:
+    """ Parses argument as a number above zero """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('%s is not positive' % value)
+    return number
+
+
+class RankView(cli_view.CliView):
+    """ Lists groups of movies ranked by an aggregate of a movie metric
+
+    Usage: rank <dimension> [--metric METRIC]
+        [--aggregate avg|count|median|sum] [--min-count N] [--limit N]
+
+    Dimensions: actor, color, content_rating, country, director, genre,
+    keyword, language, person (actor or director), year.
+    Metrics: profit (default), roi (gross / budget), or a numeric movie
+    column such as imdb_score or num_voted_users.
+
+    Groups need at least --min-count movies with the metric (default 1).
+    Lists the top --limit groups (default 10), eg `rank country --metric
+    imdb_score --aggregate median --min-count 20`.
+    """
     def get_cli_name(self) -> str:
-        return 'rank-genre'
+        return 'rank'
+
+    def get_arg_parser(self) -> argparse.ArgumentParser:
+        """ Returns parser for command arguments """
+        parser = argparse.ArgumentParser(prog=self.get_cli_name())
+        parser.add_argument(
+            'dimension', choices=src.controller.rank.DIMENSIONS
+        )
+        parser.add_argument(
+            '--metric', choices=src.controller.rank.METRICS, default='profit'
+        )
+        parser.add_argument(
+            '--aggregate', choices=src.controller.rank.AGGREGATES,
+            default='avg'
+        )
+        parser.add_argument('--min-count', type=positive_int, default=1)
+        parser.add_argument('--limit', type=positive_int, default=10)
+        return parser
 
     def do_command(self, argv: List[str]):
-        if len(argv) == 0:
-            num_genres = 10
+        args = self.get_arg_parser().parse_args(argv)
+
+        logger.info('Loading top %s %s by %s %s' % (
+            args.limit, args.dimension, args.aggregate, args.metric
+        ))
+        group_values = src.controller.rank.GroupRank(logger).query(
+            args.dimension, args.metric, args.aggregate, args.min_count,
+            args.limit
+        )
 
-        elif len(argv) == 1:
-            num_genres = int(argv[0])
+        header = '%s\t%s %s' % (
+            args.dimension.capitalize(), args.aggregate.capitalize(),
+            args.metric
+        )
+        print(header)
+        print('\t'.join('-' * len(title) for title in header.split('\t')))
+        for name, value in group_values.items():
+            if args.aggregate == 'count':
+                print('%s\t%s' % (name, value))
+            else:
+                print('%s\t%.2f' % (name, value))
 
-        else:
-            print('Usage: %s [num_genres]' % self.get_cli_name())
-            return
 
-        # Get genre profitability
-        logger.info('Loading top %s genres' % num_genres)
-        genre_profit_map = src.controller.stats.GenreProfit(logger).query()
+class RankGenresView(cli_view.CliView):
+    """ Lists top n=10 genres ranked by profitability
 
-        # Convert to list
-        genre_profit_list = profit_map_to_sorted_list(
-            genre_profit_map, num_genres
-        )
+    Usage: rank-genre [num_genres] [--engine sql|memory]
+    """
+    def get_cli_name(self) -> str:
+        return 'rank-genre'
+
+    def do_command(self, argv: List[str]):
+        args = get_rank_arg_parser(
+            self.get_cli_name(), 'num_genres'
+        ).parse_args(argv)
+        genre_profit, _ = get_profit_actions(args.engine)
+
+        # Get genre profitability
+        logger.info('Loading top %s genres' % args.num_genres)
+        genre_profit_map = genre_profit(logger).query(limit=args.num_genres)
 
         print('Genre\tAverage Profit')
         print('-----\t--------------')
-        for genre, profit in genre_profit_list:
+        for genre, profit in genre_profit_map.items():
             print('%s\t%s' % (genre, int(profit)))
 
 
 class RankPersonnelView(cli_view.CliView):
-    """ Lists top actors and directors """
+    """ Lists top actors and directors
+
+    Usage: rank-personnel [num_persons] [--engine sql|memory]
+    """
     def get_cli_name(self) -> str:
         return 'rank-personnel'
 
     def do_command(self, argv: List[str]):
-        if len(argv) == 0:
-            num_persons = 10
-
-        elif len(argv) == 1:
-            num_persons = int(argv[0])
-
-        else:
-            print('Usage: %s [num_genres]' % self.get_cli_name())
-            return
-
-        logger.info('Loading top %s persons' % num_persons)
-        person_profit_map = src.controller.stats.PersonProfit(logger).query()
-
-        # Convert to list
-        person_profit_list = profit_map_to_sorted_list(
-            person_profit_map, num_persons
+        args = get_rank_arg_parser(
+            self.get_cli_name(), 'num_persons'
+        ).parse_args(argv)
+        _, person_profit = get_profit_actions(args.engine)
+
+        logger.info('Loading top %s persons' % args.num_persons)
+        person_profit_map = person_profit(logger).query(
+            limit=args.num_persons
         )
 
         print('Name\tAverage Profit')
         print('----\t--------------')
-        for name, profit in person_profit_list:
+        for name, profit in person_profit_map.items():
             print('%s\t%s' % (name, int(profit)))
@@ -0,0 +1,60 @@
+""" Views for maintaining the database schema """
+import argparse
+import logging
+from typing import List
+
+import src.controller.schema
+from src.view import cli_view
+
+
+logger = logging.getLogger(__name__)
+
+
+class CreateIndexesView(cli_view.CliView):
+    """ Adds missing tables and indexes to an existing database
+
+    Usage: create-indexes [--no-explain]
+
+    Databases loaded before the current index set get the new indexes
+    without a reload, and new profit summary tables are filled from the
+    loaded movies. Afterwards the query plans of the queries run by data
+    loads and rank views are printed, unless --no-explain is given.
+    """
+    def get_cli_name(self) -> str:
+        return 'create-indexes'
+
+    def get_arg_parser(self) -> argparse.ArgumentParser:
+        """ Returns parser for command arguments """
+        parser = argparse.ArgumentParser(prog=self.get_cli_name())
+        parser.add_argument('--no-explain', action='store_true')
+        return parser
+
+    def do_command(self, argv: List[str]):
+        args = self.get_arg_parser().parse_args(argv)
+
+        created = src.controller.schema.CreateMissingIndexes(logger).execute()
+        if created:
+            print('Created indexes:')
+            for index_name in created:
+                print('\t%s' % index_name)
+        else:
+            print('No missing indexes')
+
+        rebuilt = src.controller.schema.FillEmptyProfitSummaries(
+            logger
+        ).execute()
+        if rebuilt:
+            print('Rebuilt summary tables:')
+            for table_name in rebuilt:
+                print('\t%s' % table_name)
+
+        if args.no_explain:
+            return
+
+        plans = src.controller.schema.ExplainHotQueries(logger).query()
+        for name, plan in plans.items():
+            print('')
+            print(name)
+            print('-' * len(name))
+            for line in plan:
+                print(line)
@@ -0,0 +1,52 @@
+""" View for running the rest service """
+import argparse
+import logging
+from typing import List
+
+import src.model.db
+from src.view import cli_view
+from src.view import rest_server
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServeView(cli_view.CliView):
+    """ Runs JSON rest service until interrupted
+
+    Usage: serve [--host HOST] [--port PORT] [--threads N]
+
+    Serves on 127.0.0.1:8080 by default. Database work runs in --threads
+    worker threads (default 8), which should not exceed the connection pool
+    size plus overflow. Uses the read database profile unless another one
+    is given with cli.py --db-profile or DB_PROFILE.
+
+    Endpoints:
+        GET /rank?dimension=DIMENSION[&metric=METRIC][&aggregate=AGGREGATE]
+            [&min_count=N][&limit=N]
+        GET /rank-genre?limit=N
+        GET /rank-personnel?limit=N
+        GET /movie?title=TITLE[&year=YEAR]
+    """
+    def get_cli_name(self) -> str:
+        return 'serve'
+
+    def get_arg_parser(self) -> argparse.ArgumentParser:
+        """ Returns parser for command arguments """
+        parser = argparse.ArgumentParser(prog=self.get_cli_name())
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8080)
+        parser.add_argument('--threads', type=int, default=8)
+        return parser
+
+    def do_command(self, argv: List[str]):
+        args = self.get_arg_parser().parse_args(argv)
+        src.model.db.EngineWrapper.set_default_profile('read')
+
+        server = rest_server.RestServer(
+            rest_server.load_rest_views(), args.threads
+        )
+        print('Serving on http://%s:%s' % (args.host, args.port))
+        for path in sorted(server.view_lookup):
+            print('\t%s' % path)
+        server.run(args.host, args.port)
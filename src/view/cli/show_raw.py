@@ -1,3 +1,4 @@
+import argparse
 import logging
 from typing import List
 
@@ -7,28 +8,61 @@ from src.view import cli_view
 
 logger = logging.getLogger(__name__)
 
+#: Number of records shown by default
+DEFAULT_ROWS = 5
+
+
+def non_negative_int(value: str) -> int:
+    """ Parses argument as a whole number """
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError('%s is negative' % value)
+    return number
+
 
 class ShowRawView(cli_view.CliView):
     """ Displays raw data from input csv
 
-    Takes optional argument for file to load, otherwise defaults to
+    Usage: show-raw [--rows N] [--offset N | --tail N] [file name]
+
+    Shows --rows records (default 5) starting at record --offset (default
+    0), or the last --tail records. File name defaults to
     'data/movie_metadata.csv'.
+
+    Only the records shown are parsed and checked for suspicious entries,
+    and --tail reads backwards from the end of the file, so previews of
+    large files are quick. Tail records are numbered back from the end of
+    the file, the last one being -1.
     """
-    def do_command(self, argv: List[str]):
-        if len(argv) == 0:
-            file_name = utils.get_default_dataset_filename()
+    def get_arg_parser(self) -> argparse.ArgumentParser:
+        """ Returns parser for command arguments """
+        parser = argparse.ArgumentParser(prog=self.get_cli_name())
+        parser.add_argument(
+            'file_name', nargs='?',
+            default=utils.get_default_dataset_filename()
+        )
+        parser.add_argument('--rows', type=non_negative_int, default=None)
+        position = parser.add_mutually_exclusive_group()
+        position.add_argument('--offset', type=non_negative_int, default=0)
+        position.add_argument('--tail', type=non_negative_int, default=None)
+        return parser
 
-        elif len(argv) == 1:
-            file_name = argv[0]
+    def do_command(self, argv: List[str]):
+        parser = self.get_arg_parser()
+        args = parser.parse_args(argv)
+        if args.tail is not None and args.rows is not None:
+            parser.error('--rows can not be used with --tail')
 
+        logger.info('Loading file "%s"' % args.file_name)
+        if args.tail is not None:
+            df = utils.load_df_tail_preview(args.file_name, args.tail)
         else:
-            print('Usage: %s [file name]' % self.get_cli_name())
-            return
-
-        logger.info('Loading file "%s"' % file_name)
-        df = utils.load_df_from_dataset(file_name)
+            df = utils.load_df_preview(
+                args.file_name,
+                DEFAULT_ROWS if args.rows is None else args.rows, args.offset
+            )
 
-        print(df.head(5))
+        print(df)
 
     def get_cli_name(self) -> str:
         return 'show-raw'
@@ -0,0 +1,248 @@
+""" Registry of cli commands, found without importing their views
+
+View modules are scanned with ast for classes, their bases, command names
+and docstrings, and views are the classes that inherit CliView through
+bases defined in any scanned module. Scans are cached in a manifest file, keyed by
+each module's size and modification time, so only changed modules are
+parsed again. A view's module is only imported when the view is used, so
+commands don't pay for the imports of others.
+"""
+import ast
+import collections
+import collections.abc
+import glob
+import importlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.view import cli_view
+
+
+logger = logging.getLogger(__name__)
+
+#: Version of manifest file layout, bumped when it changes
+MANIFEST_VERSION = 2
+
+#: Command found in a view module
+#: name: Command name, as returned by the view's get_cli_name()
+#: module_name: Importable name of the view's module
+#: class_name: Name of the view class
+#: doc: View class docstring, printed by help
+CommandInfo = collections.namedtuple(
+    'CommandInfo', ['name', 'module_name', 'class_name', 'doc']
+)
+
+#: Class found in a view module
+#: class_name: Name of the class
+#: base_names: Names of its bases, without module prefixes
+#: name: String literal returned by its get_cli_name(), or None
+#: doc: Class docstring
+ClassInfo = collections.namedtuple(
+    'ClassInfo', ['class_name', 'base_names', 'name', 'doc']
+)
+
+
+def script_name_to_module(file_name: str) -> str:
+    """ Converts python file name to importable module name """
+    if file_name[-3:] != '.py':
+        raise ValueError('Script name "%s" should end in ".py' % file_name)
+    parts = os.path.normpath(file_name[:-3]).split(os.path.sep)
+    return '.'.join(parts)
+
+
+def get_base_name(node: ast.expr) -> Optional[str]:
+    """ Returns name of class base expression, without module prefix """
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def get_cli_name_literal(class_node: ast.ClassDef) -> Optional[str]:
+    """ Returns string literal returned by a class's get_cli_name(), if any """
+    for node in class_node.body:
+        if isinstance(node, ast.FunctionDef) and node.name == 'get_cli_name':
+            for statement in node.body:
+                if (
+                        isinstance(statement, ast.Return)
+                        and isinstance(statement.value, ast.Constant)
+                        and isinstance(statement.value.value, str)
+                ):
+                    return statement.value.value
+    return None
+
+
+def scan_view_file(file_name: str) -> List[ClassInfo]:
+    """ Returns classes defined at the top level of a python file """
+    with open(file_name, encoding='utf-8') as in_file:
+        tree = ast.parse(in_file.read(), filename=file_name)
+
+    classes = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        base_names = [get_base_name(base) for base in node.bases]
+        classes.append(ClassInfo(
+            node.name, [name for name in base_names if name is not None],
+            get_cli_name_literal(node),
+            ast.get_docstring(node, clean=False) or ''
+        ))
+    return classes
+
+
+def get_view_commands(
+        module_classes: List[Tuple[str, ClassInfo]]
+) -> List[CommandInfo]:
+    """ Returns commands of classes inheriting CliView, in the given order
+
+    Bases are matched by class name against the given classes, so views can
+    inherit CliView through bases in any of the scanned modules. Views must
+    return their command name as a string literal from get_cli_name(),
+    otherwise they're skipped with a warning. Classes starting with _ are
+    only used as bases.
+
+    :param module_classes: Pairs of module name and class in it
+    """
+    view_names = {cli_view.CliView.__name__}
+    num_views = 0
+    while len(view_names) != num_views:
+        num_views = len(view_names)
+        view_names.update(
+            info.class_name for _, info in module_classes
+            if view_names.intersection(info.base_names)
+        )
+
+    commands = []
+    for module_name, info in module_classes:
+        if (
+                info.class_name[0] == '_'
+                or not view_names.intersection(info.base_names)
+        ):
+            continue
+
+        if info.name is None:
+            logger.warning(
+                'Skipping view %s.%s: get_cli_name() should return a string'
+                ' literal' % (module_name, info.class_name)
+            )
+            continue
+
+        commands.append(CommandInfo(
+            info.name.lower(), module_name, info.class_name, info.doc
+        ))
+    return commands
+
+
+def get_file_stamp(file_name: str) -> List[int]:
+    """ Returns size and modification time of file, for spotting changes """
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ViewRegistry(collections.abc.Mapping):
+    """ Lazy map of command name to cli view
+
+    Views are imported and created on first lookup. Views with a
+    view_lookup attribute, like help, get the registry itself.
+    """
+    def __init__(self, path_name: str, manifest_file: Optional[str]=None):
+        """
+        :param path_name: Glob of view module files
+        :param manifest_file: Optional file to cache module scans in
+        """
+        self._commands = self.load_commands(path_name, manifest_file)
+        self._views = {}
+
+    def __getitem__(self, name: str) -> cli_view.CliView:
+        view = self._views.get(name)
+        if view is None:
+            command = self._commands[name]
+            logger.info('Loading class: "%s.%s"' % (
+                command.module_name, command.class_name
+            ))
+            module = importlib.import_module(command.module_name)
+            view = getattr(module, command.class_name)()
+            if hasattr(view, 'view_lookup'):
+                view.view_lookup = self
+            self._views[name] = view
+        return view
+
+    def __contains__(self, name) -> bool:
+        # Mapping's version looks the view up, which would import it
+        return name in self._commands
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._commands)
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def get_doc(self, name: str) -> str:
+        """ Returns docstring of a command's view, without importing it """
+        return self._commands[name].doc
+
+    @staticmethod
+    def load_commands(
+            path_name: str, manifest_file: Optional[str]
+    ) -> Dict[str, CommandInfo]:
+        """ Returns map of command name to command info, in file order
+
+        Reuses scans from the manifest file for modules that haven't
+        changed, and rewrites it if any had.
+        """
+        manifest = {}
+        if manifest_file is not None:
+            try:
+                with open(manifest_file, encoding='utf-8') as in_file:
+                    manifest = json.load(in_file)
+            except (OSError, ValueError):
+                pass
+        if manifest.get('version') != MANIFEST_VERSION:
+            manifest = {'version': MANIFEST_VERSION, 'files': {}}
+
+        old_files = manifest['files']
+        new_files = {}
+        module_classes = []
+        for file_name in sorted(glob.glob(path_name)):
+            stamp = get_file_stamp(file_name)
+            entry = old_files.get(file_name)
+            if entry is None or entry['stamp'] != stamp:
+                logger.info('Scanning view module "%s"' % file_name)
+                entry = {
+                    'stamp': stamp,
+                    'classes': [
+                        list(info) for info in scan_view_file(file_name)
+                    ],
+                }
+            new_files[file_name] = entry
+
+            module_name = script_name_to_module(file_name)
+            module_classes.extend(
+                (module_name, ClassInfo(*info)) for info in entry['classes']
+            )
+
+        if manifest_file is not None and new_files != old_files:
+            manifest['files'] = new_files
+            write_manifest(manifest_file, manifest)
+
+        return collections.OrderedDict(
+            (command.name, command)
+            for command in get_view_commands(module_classes)
+        )
+
+
+def write_manifest(manifest_file: str, manifest: Dict):
+    """ Writes manifest file, replacing it in one step """
+    try:
+        directory = os.path.dirname(manifest_file) or '.'
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as out_file:
+            json.dump(manifest, out_file, indent=1)
+        os.replace(temp_name, manifest_file)
+    except OSError as ex:
+        logger.warning('Could not write view manifest: %s' % ex)
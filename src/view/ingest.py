@@ -0,0 +1,299 @@
+""" Column-wise conversion of dataset frames into database rows
+
+Used by views that bulk load the dataset. Dataset frames are first parsed
+into compact normalized movie records with vectorized pandas operations,
+which can run in worker processes, then turned into table rows.
+"""
+import collections
+import concurrent.futures
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Regular expression for pulling out id from IMDB url
+IMDB_URL_ID_RE = re.compile(r'title/tt(\d+)/')
+
+#: Movie model fields loaded as-is from numerical dataset columns
+MOVIE_STAT_COLUMNS = {
+    'aspect_ratio': 'aspect_ratio',
+    'budget': 'budget',
+    'cast_facebook_likes': 'cast_total_facebook_likes',
+    'duration': 'duration',
+    'facenum': 'facenumber_in_poster',
+    'gross': 'gross',
+    'imdb_score': 'imdb_score',
+    'movie_facebook_likes': 'movie_facebook_likes',
+    'num_critic_for_reviews': 'num_critic_for_reviews',
+    'num_user_for_reviews': 'num_user_for_reviews',
+    'num_voted_users': 'num_voted_users',
+}
+
+#: Movie model foreign key fields, mapped to their dataset column and lookup
+MOVIE_CATEGORY_COLUMNS = {
+    'movie_color_pk': ('color', 'color'),
+    'country_pk': ('country', 'country'),
+    'language_pk': ('language', 'language'),
+    'content_rating_pk': ('content_rating', 'rating'),
+    'director_pk': ('director_name', 'person'),
+}
+
+#: Dataset columns holding actor names
+ACTOR_COLUMNS = ('actor_1_name', 'actor_2_name', 'actor_3_name')
+
+#: Version of content hashes, bumped when normalization changes, so movies
+#: loaded before are all seen as changed
+CONTENT_HASH_VERSION = 1
+
+
+def series_to_values(series: pd.Series) -> list:
+    """ Converts series to list of python values, with None for missing """
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def clean_names(series: pd.Series) -> pd.Series:
+    """ Returns stripped, lower case version of name column """
+    return series.astype(object).str.strip().str.lower()
+
+
+def split_names(series: pd.Series, delim: str='|') -> List[Tuple[str, ...]]:
+    """ Splits column of delimited names into tuples of clean names """
+    return [
+        () if pd.isna(raw_names) else tuple(
+            name for name in (
+                raw_name.strip().lower() for raw_name in raw_names.split(delim)
+            ) if name
+        )
+        for raw_names in series
+    ]
+
+
+def get_movie_keys(data: pd.DataFrame) -> pd.DataFrame:
+    """ Returns frame of stripped title, lower case title, and year string
+
+    Year is empty string if missing, to match how the movie table stores it.
+    """
+    titles = data['movie_title'].astype(object).str.strip()
+    years = data['title_year']
+    return pd.DataFrame({
+        'movie_title': titles,
+        'title_key': titles.str.lower(),
+        'title_year': years.map(str).where(years.notna(), ''),
+    }, index=data.index)
+
+
+def normalize_records(data: pd.DataFrame) -> pd.DataFrame:
+    """ Parses cleaned dataset frame into normalized movie records
+
+    Records keep the dataset index and have the movie key columns from
+    get_movie_keys(), the imdb id, clean category and director names, movie
+    stats as floats, and tuples of clean genre, keyword and actor names.
+    The content_hash column from drop_unchanged_records() is kept.
+    Only depends on its input, so it can run in a worker process.
+    """
+    records = get_movie_keys(data)
+    records['imdb_id'] = data['movie_imdb_link'].astype(object).str.extract(
+        IMDB_URL_ID_RE, expand=False
+    )
+
+    for column, _ in MOVIE_CATEGORY_COLUMNS.values():
+        records[column] = clean_names(data[column])
+
+    # The dataset loaders already made values that aren't numbers missing
+    for column in MOVIE_STAT_COLUMNS.values():
+        records[column] = data[column]
+
+    if 'content_hash' in data:
+        records['content_hash'] = data['content_hash']
+
+    records['genre_names'] = split_names(data['genres'])
+    records['keyword_names'] = split_names(data['plot_keywords'])
+
+    actor_names = [clean_names(data[column]) for column in ACTOR_COLUMNS]
+    records['actor_names'] = [
+        tuple(name for name in names if not pd.isna(name))
+        for names in zip(*actor_names)
+    ]
+    return records
+
+
+def iter_normalized_records(
+        frames: Iterable[pd.DataFrame], workers: int=1
+) -> Iterator[pd.DataFrame]:
+    """ Normalizes dataset frames, optionally across worker processes
+
+    Results come back in input order, so output doesn't depend on the number
+    of workers. At most two frames per worker are in flight at once.
+    """
+    if workers <= 1:
+        for frame in frames:
+            yield normalize_records(frame)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        for frame in frames:
+            pending.append(executor.submit(normalize_records, frame))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def split_frame(data: pd.DataFrame, num_shards: int) -> List[pd.DataFrame]:
+    """ Splits frame into up to num_shards frames of consecutive rows """
+    bounds = np.linspace(0, len(data), num_shards+1).astype(int)
+    return [
+        data.iloc[start:end]
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def get_unique_names(records: pd.DataFrame, *columns: str) -> List[str]:
+    """ Returns unique names in name columns or name tuple columns """
+    names = {}
+    for column in columns:
+        for value in records[column]:
+            if isinstance(value, tuple):
+                names.update(dict.fromkeys(value))
+            elif not pd.isna(value):
+                names[value] = None
+    return list(names)
+
+
+def get_content_hashes(data: pd.DataFrame) -> pd.Series:
+    """ Returns hash of each cleaned dataset record's values
+
+    Normalizing equal records gives equal movies, so loads can skip records
+    whose hash hasn't changed. Hashes are 64 bit, from pandas' vectorized
+    row hashing, which hashes values rather than dtypes.
+    """
+    hashes = pd.util.hash_pandas_object(
+        data[sorted(data.columns)], index=False
+    )
+    return pd.Series([
+        '%s-%016x' % (CONTENT_HASH_VERSION, value) for value in hashes.tolist()
+    ], index=data.index, dtype=object)
+
+
+def drop_unchanged_records(
+        data: pd.DataFrame,
+        movie_hashes: Dict[Tuple[str, str], Tuple[int, str]],
+        first_keys: Set[Tuple[str, str]],
+        seen_keys: Dict[Tuple[str, str], int]
+) -> pd.DataFrame:
+    """ Returns cleaned dataset records that may change movies, with their
+    content_hash column added
+
+    Drops the first record of each movie whose content hash matches the one
+    it was loaded with, so only the rest are normalized and loaded. Later
+    records of a movie are kept, for drop_duplicate_movies() to log.
+
+    :param data: Cleaned dataset frame
+    :param movie_hashes: Map of movie (lower title, year) key to pk and
+        content hash of loaded movies
+    :param first_keys: Keys of movies whose first record was seen in
+        earlier frames. Updated in place.
+    :param seen_keys: Keys of loaded movies to record id, as kept by
+        drop_duplicate_movies(). Keys of dropped records are added.
+    """
+    data = data.assign(content_hash=get_content_hashes(data))
+    if not movie_hashes:
+        return data
+
+    keys = get_movie_keys(data)
+    keep = []
+    for record_id, title_key, title_year, content_hash in zip(
+            data.index.tolist(), keys['title_key'].tolist(),
+            keys['title_year'].tolist(), data['content_hash'].tolist()
+    ):
+        movie_key = (title_key, title_year)
+        if not isinstance(title_key, str) or movie_key in first_keys:
+            keep.append(True)
+            continue
+
+        first_keys.add(movie_key)
+        if movie_hashes.get(movie_key, (None, None))[1] == content_hash:
+            seen_keys[movie_key] = record_id
+            keep.append(False)
+        else:
+            keep.append(True)
+
+    return data[keep]
+
+
+def drop_duplicate_movies(
+        records: pd.DataFrame,
+        seen_keys: Optional[Dict[Tuple[str, str], int]]=None
+) -> pd.DataFrame:
+    """ Returns records without untitled or repeated (title, year) movies
+
+    The first record of a title+year wins; the rest are logged and skipped.
+
+    :param records: Normalized movie records
+    :param seen_keys: Optional map of (lower title, year) to record id of
+        movies already loaded, eg from earlier chunks. Updated in place.
+    """
+    if seen_keys is None:
+        seen_keys = {}
+
+    keep = []
+    for record_id, movie_title, title_key, title_year in zip(
+            records.index, records['movie_title'], records['title_key'],
+            records['title_year']
+    ):
+        if pd.isna(title_key):
+            logger.warning('Movie with no title on record #%s' % (record_id+1))
+            keep.append(False)
+            continue
+
+        movie_key = (title_key, title_year)
+        if movie_key in seen_keys:
+            logger.warning('Duplicate movie "%s" (#%s, #%s)' % (
+                movie_title, seen_keys[movie_key]+1, record_id+1
+            ))
+            keep.append(False)
+            continue
+
+        seen_keys[movie_key] = record_id
+        keep.append(True)
+
+    return records[keep]
+
+
+def build_movie_rows(
+        records: pd.DataFrame, lookups: Dict[str, Dict[str, int]]
+) -> List[Dict]:
+    """ Builds movie table rows column-wise from normalized records
+
+    :param records: Normalized records, already cleared of duplicate movies
+    :param lookups: Map of lookup name (color, country, language, rating,
+        person) to dictionary of lower case name to pk
+    :return: List of movie field dicts for BulkAddMovies
+    """
+    columns = {
+        'movie_title': records['movie_title'].tolist(),
+        'title_year': records['title_year'].tolist(),
+        'imdb_id': series_to_values(records['imdb_id']),
+    }
+
+    for field, (column, lookup_name) in MOVIE_CATEGORY_COLUMNS.items():
+        columns[field] = series_to_values(
+            records[column].map(lookups[lookup_name]).astype('Int64')
+        )
+
+    for field, column in MOVIE_STAT_COLUMNS.items():
+        columns[field] = series_to_values(records[column])
+
+    field_names = list(columns.keys())
+    return [
+        dict(zip(field_names, values))
+        for values in zip(*columns.values())
+    ]
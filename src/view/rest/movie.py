@@ -0,0 +1,41 @@
+""" Rest views for movies """
+import logging
+from typing import Dict, List, Optional
+
+import src.controller.movie
+from src.view import rest_view
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_year(value: str) -> str:
+    """ Parses year into the form movie years are stored in, eg '2009.0' """
+    return str(float(value))
+
+
+def format_year(value: str) -> Optional[int]:
+    """ Returns stored movie year as a number, or None if it's unknown """
+    if not value:
+        return None
+    return int(float(value))
+
+
+class MovieLookupView(rest_view.RestView):
+    """ Looks up movies by title, with their genres, keywords and actors
+
+    Query parameters: title, year (optional)
+    """
+    def get_path(self) -> str:
+        return '/movie'
+
+    def do_request(self, params: Dict[str, List[str]]):
+        title = self.get_param(params, 'title', required=True)
+        year = self.get_param(params, 'year', parse_year)
+        movies = src.controller.movie.FindMovies(logger).query(
+            movie_title=title, title_year=year
+        )
+        for movie in movies:
+            del movie['pk']
+            movie['title_year'] = format_year(movie['title_year'])
+        return {'movies': movies}
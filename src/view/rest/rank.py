@@ -0,0 +1,80 @@
+""" Rest views for ranking stats """
+import logging
+from typing import Dict, List
+
+import src.controller.rank
+import src.controller.stats
+from src.view import rest_view
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_limit(value: str) -> int:
+    """ Parses positive ranking limit """
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('Limit should be positive')
+    return limit
+
+
+class RankView(rest_view.RestView):
+    """ Lists groups of movies ranked by an aggregate of a movie metric
+
+    Query parameters: dimension (required), metric (default profit),
+    aggregate (default avg), min_count (default 1), limit (default 10)
+    """
+    def get_path(self) -> str:
+        return '/rank'
+
+    def do_request(self, params: Dict[str, List[str]]):
+        dimension = self.get_param(params, 'dimension', required=True)
+        metric = self.get_param(params, 'metric', default='profit')
+        aggregate = self.get_param(params, 'aggregate', default='avg')
+        min_count = self.get_param(params, 'min_count', parse_limit, 1)
+        limit = self.get_param(params, 'limit', parse_limit, 10)
+        group_values = src.controller.rank.GroupRank(logger).query(
+            dimension, metric, aggregate, min_count, limit
+        )
+        return {'groups': [
+            {'name': name, 'value': value}
+            for name, value in group_values.items()
+        ]}
+
+
+class RankGenresView(rest_view.RestView):
+    """ Lists top genres ranked by profitability
+
+    Query parameters: limit (default 10)
+    """
+    def get_path(self) -> str:
+        return '/rank-genre'
+
+    def do_request(self, params: Dict[str, List[str]]):
+        limit = self.get_param(params, 'limit', parse_limit, 10)
+        genre_profit_map = src.controller.stats.GenreProfit(logger).query(
+            limit=limit
+        )
+        return {'genres': [
+            {'name': genre, 'average_profit': profit}
+            for genre, profit in genre_profit_map.items()
+        ]}
+
+
+class RankPersonnelView(rest_view.RestView):
+    """ Lists top actors and directors ranked by profitability
+
+    Query parameters: limit (default 10)
+    """
+    def get_path(self) -> str:
+        return '/rank-personnel'
+
+    def do_request(self, params: Dict[str, List[str]]):
+        limit = self.get_param(params, 'limit', parse_limit, 10)
+        person_profit_map = src.controller.stats.PersonProfit(logger).query(
+            limit=limit
+        )
+        return {'persons': [
+            {'name': name, 'average_profit': profit}
+            for name, profit in person_profit_map.items()
+        ]}
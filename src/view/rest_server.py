@@ -0,0 +1,235 @@
+""" Asyncio HTTP server for the JSON rest views
+
+Dynamically loads classes in view/rest/*.py that inherit rest views, and
+serves each on its path. Connections are handled on the event loop, while
+views, and the blocking database work they do, run in a bounded pool of
+worker threads.
+"""
+import asyncio
+import concurrent.futures
+import http
+import importlib
+import inspect
+import json
+import logging
+import pkgutil
+import urllib.parse
+from typing import Dict, List, Tuple
+
+import src.model.db
+import src.view.rest
+from src.view import rest_view
+
+
+logger = logging.getLogger(__name__)
+
+#: Largest request line or header line accepted, in bytes
+MAX_LINE_SIZE = 8192
+
+#: Most header lines accepted per request
+MAX_HEADERS = 100
+
+
+class BadRequest(Exception):
+    """ Raised for malformed HTTP requests """
+    pass
+
+
+def load_rest_views() -> List[rest_view.RestView]:
+    """ Loads rest views in the src.view.rest package """
+    views = []
+    for module_info in pkgutil.iter_modules(src.view.rest.__path__):
+        module_name = 'src.view.rest.%s' % module_info.name
+        logger.info('Loading module "%s"' % module_name)
+        module = importlib.import_module(module_name)
+
+        for attr_name, module_attr in inspect.getmembers(
+                module, inspect.isclass
+        ):
+            if attr_name[0] == '_':
+                continue
+
+            if (
+                    issubclass(module_attr, rest_view.RestView)
+                    and not inspect.isabstract(module_attr)
+            ):
+                logger.info(
+                    'Loading class: "%s.%s"' % (module_name, attr_name)
+                )
+                views.append(module_attr())
+
+    return views
+
+
+def run_view(view: rest_view.RestView, params: Dict[str, List[str]]):
+    """ Runs view in a worker thread, then releases the thread's session """
+    try:
+        return view.do_request(params)
+    finally:
+        src.model.db.EngineWrapper.remove_session()
+
+
+class RestServer(object):
+    """ Serves rest views over HTTP/1.1 with keep-alive connections """
+    def __init__(self, views: List[rest_view.RestView], num_threads: int):
+        """
+        :param views: Views to serve, by their paths
+        :param num_threads: Number of worker threads running views
+        """
+        self._view_lookup = {view.get_path(): view for view in views}
+        self._num_threads = num_threads
+        self._executor = None
+
+    @property
+    def view_lookup(self) -> Dict[str, rest_view.RestView]:
+        """ Returns map of url path to view """
+        return self._view_lookup
+
+    def run(self, host: str, port: int):
+        """ Serves until interrupted """
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            logger.info('Server interrupted')
+
+    async def serve(self, host: str, port: int):
+        """ Serves forever on host and port """
+        with concurrent.futures.ThreadPoolExecutor(
+                self._num_threads, thread_name_prefix='rest'
+        ) as executor:
+            self._executor = executor
+            server = await asyncio.start_server(
+                self.handle_connection, host, port, limit=MAX_LINE_SIZE
+            )
+            logger.info('Serving on %s:%s' % (host, port))
+            async with server:
+                await server.serve_forever()
+
+    async def handle_connection(
+            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """ Handles requests on a connection until either side closes it """
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await self.read_request(reader)
+                except BadRequest as ex:
+                    await self.write_response(
+                        writer, http.HTTPStatus.BAD_REQUEST,
+                        {'error': str(ex)}, False
+                    )
+                    break
+
+                if request is None:
+                    break
+
+                method, target, keep_alive = request
+                status, data = await self.dispatch(method, target)
+                await self.write_response(writer, status, data, keep_alive)
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        """ Reads request line and headers, discarding any body
+
+        :return: Method, target, and whether to keep the connection alive,
+            or None if the connection closed before a request
+        """
+        try:
+            request_line = await reader.readline()
+        except ValueError:
+            raise BadRequest('Request line too long')
+        if not request_line:
+            return None
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise BadRequest('Malformed request line')
+        method, target, version = parts
+
+        headers = {}
+        for _ in range(MAX_HEADERS + 1):
+            try:
+                header_line = await reader.readline()
+            except ValueError:
+                raise BadRequest('Header line too long')
+            if header_line in (b'\r\n', b'\n', b''):
+                break
+
+            name, _, value = header_line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise BadRequest('Too many headers')
+
+        try:
+            content_length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest('Bad Content-Length header')
+        if content_length > 0:
+            await reader.readexactly(content_length)
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+        return method, target, keep_alive
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, Dict]:
+        """ Runs view for request in a worker thread
+
+        :return: HTTP status and response data
+        """
+        url = urllib.parse.urlsplit(target)
+        view = self.view_lookup.get(url.path)
+        if view is None:
+            return http.HTTPStatus.NOT_FOUND, {
+                'error': 'Unknown path "%s"' % url.path,
+                'paths': sorted(self.view_lookup),
+            }
+
+        if method != 'GET':
+            return http.HTTPStatus.METHOD_NOT_ALLOWED, {
+                'error': 'Method %s not allowed' % method
+            }
+
+        params = urllib.parse.parse_qs(url.query)
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(
+                self._executor, run_view, view, params
+            )
+        except ValueError as ex:
+            return http.HTTPStatus.BAD_REQUEST, {'error': str(ex)}
+        except Exception:
+            logger.exception('Error handling "%s"' % target)
+            return http.HTTPStatus.INTERNAL_SERVER_ERROR, {
+                'error': 'Internal server error'
+            }
+
+        return http.HTTPStatus.OK, data
+
+    @staticmethod
+    async def write_response(
+            writer: asyncio.StreamWriter, status: http.HTTPStatus, data,
+            keep_alive: bool
+    ):
+        """ Writes JSON response """
+        body = json.dumps(data).encode('utf-8')
+        head = (
+            'HTTP/1.1 %s %s\r\n'
+            'Content-Type: application/json\r\n'
+            'Content-Length: %s\r\n'
+            'Connection: %s\r\n'
+            '\r\n'
+        ) % (
+            status.value, status.phrase, len(body),
+            'keep-alive' if keep_alive else 'close'
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
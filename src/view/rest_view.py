@@ -0,0 +1,44 @@
+""" Base class for rest service """
+import abc
+from typing import Dict, List
+
+
+class RestView(abc.ABC):
+    """ Base class for JSON rest service views
+
+    Views run in worker threads of the server, so they should only keep
+    state that is safe to share between threads.
+    """
+    @abc.abstractmethod
+    def get_path(self) -> str:
+        """ Returns url path the view is served on """
+        pass
+
+    @abc.abstractmethod
+    def do_request(self, params: Dict[str, List[str]]):
+        """ Handles GET request given query string parameters
+
+        Raise ValueError for bad parameters.
+
+        :return: JSON serializable response data
+        """
+        pass
+
+    @staticmethod
+    def get_param(
+            params: Dict[str, List[str]], name: str, parse=str, default=None,
+            required: bool=False
+    ):
+        """ Returns last value of a query parameter, parsed, or default """
+        values = params.get(name)
+        if not values:
+            if required:
+                raise ValueError('Missing parameter "%s"' % name)
+            return default
+
+        try:
+            return parse(values[-1])
+        except ValueError:
+            raise ValueError('Bad value for parameter "%s": "%s"' % (
+                name, values[-1]
+            ))
@@ -0,0 +1,46 @@
+""" Shared fixtures: a database per test and small data sets """
+import os
+
+import pytest
+
+import src.controller.cache
+import src.model.db
+from tests import helpers
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch, tmp_path):
+    """ Runs each test against its own database, with caches in tmp_path
+    and engine and cache settings reset before and after
+    """
+    monkeypatch.setenv('DATASET_CACHE', 'off')
+    monkeypatch.setenv('QUERY_CACHE', 'off')
+    monkeypatch.setenv('QUERY_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.delenv('DB_PROFILE', raising=False)
+    monkeypatch.setattr(
+        src.model.db.EngineWrapper, '_default_profile', 'default'
+    )
+    monkeypatch.setattr(src.model.db.EngineWrapper, '_profile', None)
+    src.controller.cache.reset_default_cache()
+    helpers.use_database(monkeypatch, os.path.join(tmp_path, 'test.sqlite'))
+    yield
+    src.model.db.EngineWrapper.reset()
+    src.controller.cache.reset_default_cache()
+
+
+@pytest.fixture
+def dataset(tmp_path) -> str:
+    """ Returns name of csv of the bundled data set's first records """
+    return helpers.write_dataset(
+        os.path.join(tmp_path, 'dataset.csv'),
+        helpers.read_dataset_lines()[1:]
+    )
+
+
+@pytest.fixture
+def loaded_dataset(dataset) -> str:
+    """ Returns name of csv of the bundled data set's first records, loaded
+    into the test database
+    """
+    helpers.load_data(dataset)
+    return dataset
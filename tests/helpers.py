@@ -0,0 +1,115 @@
+""" Helpers shared by tests: temporary databases and small data sets """
+import sqlalchemy
+
+import src.controller.rank
+import src.controller.stats
+import src.model.common
+import src.model.db
+import src.model.fields
+import src.model.movie
+import src.model.person
+import src.utils
+import src.view.cli.load_data
+
+
+#: Number of records of the bundled data set in small data sets
+NUM_RECORDS = 300
+
+
+def use_database(monkeypatch, file_name: str) -> str:
+    """ Points the application at sqlite database file, returning its url """
+    url = 'sqlite:///%s' % file_name
+    monkeypatch.setenv('DB_CONNECTION', url)
+    src.model.db.EngineWrapper.reset()
+    return url
+
+
+def read_dataset_lines(num_records: int=NUM_RECORDS):
+    """ Returns header and first num_records lines of the bundled data set
+    """
+    lines = []
+    with open(
+            src.utils.get_default_dataset_filename(), encoding='utf-8'
+    ) as in_file:
+        for line in in_file:
+            lines.append(line)
+            if len(lines) > num_records:
+                break
+    return lines
+
+
+def write_dataset(file_name: str, lines) -> str:
+    """ Writes data set of the bundled one's header and given lines """
+    with open(file_name, 'w', encoding='utf-8') as out_file:
+        out_file.write(read_dataset_lines(0)[0])
+        out_file.writelines(lines)
+    return file_name
+
+
+def change_avatar(line: str) -> str:
+    """ Returns Avatar's record with genres, an actor and keywords
+    changed
+    """
+    return line.replace(
+        'Action|Adventure|Fantasy|Sci-Fi', 'Action'
+    ).replace(
+        'CCH Pounder', 'Someone New'
+    ).replace(
+        'avatar|future|marine|native|paraplegic', 'future|marine'
+    )
+
+
+def write_changed_dataset(file_name: str) -> str:
+    """ Writes the bundled data set's first records, with Avatar's changed
+    by change_avatar()
+    """
+    lines = read_dataset_lines()[1:]
+    return write_dataset(file_name, [change_avatar(lines[0])] + lines[1:])
+
+
+def load_data(file_name: str, *argv: str):
+    """ Runs load-data command on file """
+    src.view.cli.load_data.LoadDataView().do_command(list(argv) + [file_name])
+    src.model.db.EngineWrapper.remove_session()
+
+
+def get_rankings():
+    """ Returns profit rankings, and sorted (title, name) pairs of each
+    association table
+    """
+    logger = src.view.cli.load_data.logger
+    session = src.model.db.EngineWrapper.get_session()
+    rankings = {
+        'genre': src.controller.stats.GenreProfit(logger).query(),
+        'person': src.controller.stats.PersonProfit(logger).query(),
+        'keyword': src.controller.rank.GroupRank(logger).query(
+            'keyword', 'profit', 'count'
+        ),
+    }
+    movie_table = src.model.movie.Movie.__table__
+    for table, column_name, name_class in (
+            (
+                src.model.common.movie_genres, 'genre_pk',
+                src.model.fields.Genre
+            ),
+            (
+                src.model.common.movie_keywords, 'keyword_pk',
+                src.model.fields.Keyword
+            ),
+            (
+                src.model.common.movie_actors, 'actor_pk',
+                src.model.person.Person
+            ),
+    ):
+        name_table = name_class.__table__
+        rankings[table.name] = sorted(
+            tuple(row) for row in session.execute(sqlalchemy.select(
+                movie_table.c.movie_title, name_table.c.name
+            ).join_from(
+                table, movie_table, movie_table.c.pk == table.c.movie_pk
+            ).join(
+                name_table, name_table.c.pk == table.c[column_name]
+            ))
+        )
+    src.model.db.EngineWrapper.remove_session()
+    return rankings
@@ -0,0 +1,66 @@
+""" Tests of running many commands in one process """
+import io
+import os
+
+import src.controller.stats
+import src.model.db
+import src.view.cli.batch
+import src.view.cli.load_data
+import src.view.cli.rank
+
+
+def get_view_lookup():
+    """ Returns map of command name to the views the tests run """
+    views = [
+        src.view.cli.load_data.LoadDataView(),
+        src.view.cli.rank.RankGenresView(),
+        src.view.cli.rank.RankView(),
+    ]
+    return {view.get_cli_name(): view for view in views}
+
+
+def test_batch_runs_past_failures(capsys, tmp_path, dataset):
+    commands_file = os.path.join(tmp_path, 'commands.txt')
+    with open(commands_file, 'w') as out_file:
+        out_file.write('\n'.join([
+            '# Load, then rank what was loaded',
+            'load-data "%s"' % dataset,
+            '',
+            'unknown-command',
+            'rank genre --limit 0',
+            'rank-genre 3  # top three',
+        ]))
+
+    view = src.view.cli.batch.BatchView()
+    view.view_lookup = get_view_lookup()
+    view.do_command([commands_file])
+
+    out, err = capsys.readouterr()
+    assert 'Error, "unknown-command" is not a recognized command' in out
+    assert '# rank genre --limit 0: ' in err
+    assert err.splitlines()[-3].endswith('(failed)')
+    assert err.splitlines()[-1].startswith('# 4 commands, 2 failed, ')
+
+    # Each command gets a fresh session and the default engine profile
+    assert src.model.db.EngineWrapper.get_profile() == 'default'
+    genre_profit = src.controller.stats.GenreProfit(
+        src.view.cli.rank.logger
+    ).query(limit=3)
+    assert out.splitlines()[-3:] == [
+        '%s\t%s' % (genre, int(profit))
+        for genre, profit in genre_profit.items()
+    ]
+
+
+def test_shell_reads_commands_until_exit(monkeypatch, capsys, loaded_dataset):
+    shell = src.view.cli.batch.CommandShell(get_view_lookup())
+    shell.use_rawinput = False
+    monkeypatch.setattr(shell, 'stdin', io.StringIO(
+        'rank-genre 1\n\n"unclosed\nexit\nrank-genre 2\n'
+    ))
+    shell.cmdloop()
+
+    out, err = capsys.readouterr()
+    assert out.count('Genre\tAverage Profit') == 1
+    assert 'Error: No closing quotation' in out
+    assert err.startswith('# rank-genre 1: ')
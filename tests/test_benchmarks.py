@@ -0,0 +1,73 @@
+""" Tests of the benchmark data sets and regression checks """
+import os
+
+import sqlalchemy
+
+import src.model.db
+import src.model.movie
+import src.utils
+from benchmarks import bench_suite
+from benchmarks import synthetic_dataset
+from tests import helpers
+
+
+#: Number of records of the synthetic data sets
+NUM_RECORDS = 400
+
+#: Seed of a data set with duplicate and defective records at NUM_RECORDS
+SEED = 4
+
+
+def test_synthetic_dataset_loads(tmp_path):
+    file_name = os.path.join(tmp_path, 'synthetic.csv')
+    num_duplicates, num_defects = synthetic_dataset.generate_dataset(
+        file_name, NUM_RECORDS, SEED
+    )
+    assert num_duplicates > 0
+    assert num_defects > 0
+    with open(file_name, 'rb') as in_file:
+        contents = in_file.read()
+
+    # The same seed writes the same file
+    other_file_name = os.path.join(tmp_path, 'other.csv')
+    synthetic_dataset.generate_dataset(other_file_name, NUM_RECORDS, SEED)
+    with open(other_file_name, 'rb') as in_file:
+        assert in_file.read() == contents
+
+    df = src.utils.load_df_from_dataset(file_name)
+    assert len(df) == NUM_RECORDS - num_defects
+    assert df.index[-1] == NUM_RECORDS - 1
+
+    helpers.load_data(file_name)
+    session = src.model.db.EngineWrapper.get_session()
+    num_movies = session.execute(sqlalchemy.select(
+        sqlalchemy.func.count()
+    ).select_from(src.model.movie.Movie.__table__)).scalar()
+    src.model.db.EngineWrapper.remove_session()
+    assert num_movies == NUM_RECORDS - num_defects - num_duplicates
+
+
+def test_compare_results_flags_regressions(capsys):
+    baseline = {'timings': {'1000': {
+        'load-data': 10.0, 'rank-genre': 1.0, 'rank-personnel': 1.0,
+    }}}
+    results = {'timings': {
+        '1000': {
+            'load-data': 11.0,
+            # Slower beyond tolerance, but within start up noise
+            'rank-genre': 1.2,
+            'rank-personnel': 1.0 + bench_suite.MIN_REGRESSION_SECONDS + 0.1,
+        },
+        '2000': {'load-data': 20.0},
+    }}
+
+    regressions = bench_suite.compare_results(results, baseline, 0.05)
+    assert regressions == ['1000 load-data', '1000 rank-personnel']
+
+    lines = capsys.readouterr().out.splitlines()[2:]
+    assert [line.split('\t')[-1] for line in lines] == [
+        'REGRESSION', 'ok', 'REGRESSION', 'new',
+    ]
+    assert bench_suite.compare_results(results, baseline, 0.2) == [
+        '1000 rank-personnel'
+    ]
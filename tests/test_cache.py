@@ -0,0 +1,101 @@
+""" Tests of the query result cache """
+import logging
+import os
+
+import pytest
+import sqlalchemy
+
+import src.controller.cache
+import src.controller.stats
+import src.model.db
+from tests import helpers
+
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def summary_selects():
+    """ Returns list that statements ranking genres from genre_profit are
+    appended to while the test runs
+    """
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, many):
+        if 'JOIN genre_profit' in statement:
+            statements.append(statement)
+
+    engine_class = sqlalchemy.engine.Engine
+    sqlalchemy.event.listen(engine_class, 'before_cursor_execute', on_execute)
+    yield statements
+    sqlalchemy.event.remove(engine_class, 'before_cursor_execute', on_execute)
+
+
+def query_genre_profit():
+    """ Returns genre profit ranking, in a fresh session """
+    result = src.controller.stats.GenreProfit(logger).query()
+    src.model.db.EngineWrapper.remove_session()
+    return result
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = src.controller.cache.QueryCache(max_entries=2)
+    cache.put('db', '1-a', 'x', [1])
+    cache.put('db', '1-a', 'y', [2])
+    assert cache.get('db', '1-a', 'x') == (True, [1])
+    cache.put('db', '1-a', 'z', [3])
+
+    assert cache.get('db', '1-a', 'y') == (False, None)
+    assert cache.get('db', '1-a', 'x') == (True, [1])
+    assert cache.get('db', '1-a', 'z') == (True, [3])
+    assert cache.get('db', '2-b', 'x') == (False, None)
+
+
+def test_query_cache_disk_tier(tmp_path):
+    directory = os.path.join(tmp_path, 'cache')
+    cache = src.controller.cache.QueryCache(directory=directory)
+    cache.put('db', '1-a', 'x', {'drama': 1.5})
+
+    # Another process finds results on disk, until the data version moves
+    other_cache = src.controller.cache.QueryCache(directory=directory)
+    assert other_cache.get('db', '1-a', 'x') == (True, {'drama': 1.5})
+    other_cache.put('db', '2-b', 'x', {'drama': 2.5})
+    assert not os.path.exists(os.path.dirname(
+        cache.get_file_name('db', '1-a', 'x')
+    ))
+    assert src.controller.cache.QueryCache(directory=directory).get(
+        'db', '1-a', 'x'
+    ) == (False, None)
+
+
+@pytest.mark.parametrize('mode', ['memory', 'disk'])
+def test_cached_results_follow_data_version(
+        monkeypatch, tmp_path, dataset, summary_selects, mode
+):
+    monkeypatch.setenv('QUERY_CACHE', mode)
+    src.controller.cache.reset_default_cache()
+    changed_dataset = helpers.write_changed_dataset(
+        os.path.join(tmp_path, 'changed.csv')
+    )
+
+    helpers.load_data(dataset)
+    result = query_genre_profit()
+    assert query_genre_profit() == result
+    assert len(summary_selects) == 1
+
+    # Loads that change nothing keep cached results
+    helpers.load_data(dataset, '--full')
+    assert query_genre_profit() == result
+    assert len(summary_selects) == 1
+
+    helpers.load_data(changed_dataset)
+    changed_result = query_genre_profit()
+    assert len(summary_selects) == 2
+    assert changed_result != result
+    assert changed_result['fantasy'] != result['fantasy']
+
+    if mode == 'disk':
+        # Another process reads the result from disk
+        src.controller.cache.reset_default_cache()
+        assert query_genre_profit() == changed_result
+        assert len(summary_selects) == 2
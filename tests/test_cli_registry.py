@@ -0,0 +1,134 @@
+""" Tests of finding cli commands without importing their views """
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+
+import src.view.cli_registry
+from src.view import cli_view
+
+
+#: View modules of the tests, by file name: views inheriting CliView
+#: directly, through a base of another module, and through a private base
+VIEW_MODULES = {
+    'base.py': '''
+        from src.view import cli_view
+
+
+        class _QuietView(cli_view.CliView):
+            """ Base of views printing nothing """
+            def do_command(self, argv):
+                pass
+
+
+        class ReportView(cli_view.CliView):
+            """ Prints a report """
+            def get_cli_name(self):
+                return 'report'
+
+            def do_command(self, argv):
+                print('report')
+    ''',
+    'reports.py': '''
+        from views import base
+
+
+        class DailyReportView(base.ReportView):
+            """ Prints the daily report """
+            def get_cli_name(self):
+                return 'daily-report'
+
+
+        class NoopView(base._QuietView):
+            """ Does nothing """
+            def get_cli_name(self):
+                return 'noop'
+
+
+        class NotAView(object):
+            def get_cli_name(self):
+                return 'not-a-view'
+    ''',
+}
+
+
+def write_module(directory: str, file_name: str, source: str):
+    """ Writes dedented module source """
+    with open(os.path.join(directory, file_name), 'w') as out_file:
+        out_file.write(textwrap.dedent(source).lstrip())
+
+
+@pytest.fixture
+def view_path(monkeypatch, tmp_path) -> str:
+    """ Returns glob of view modules in package views, under tmp_path which
+    is the working directory, and unloads the modules afterwards
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    os.mkdir('views')
+    for file_name, source in VIEW_MODULES.items():
+        write_module('views', file_name, source)
+    yield os.path.join('views', '*.py')
+
+    for module_name in list(sys.modules):
+        if module_name.split('.')[0] == 'views':
+            del sys.modules[module_name]
+
+
+@pytest.fixture
+def scanned_files(monkeypatch):
+    """ Returns list that names of scanned files are appended to """
+    file_names = []
+    scan_view_file = src.view.cli_registry.scan_view_file
+
+    def record_scan(file_name):
+        file_names.append(file_name)
+        return scan_view_file(file_name)
+
+    monkeypatch.setattr(
+        src.view.cli_registry, 'scan_view_file', record_scan
+    )
+    return file_names
+
+
+def test_indirect_subclasses_are_views(view_path):
+    registry = src.view.cli_registry.ViewRegistry(view_path)
+    assert list(registry) == ['report', 'daily-report', 'noop']
+    assert registry.get_doc('daily-report') == ' Prints the daily report '
+
+    view = registry['daily-report']
+    assert isinstance(view, cli_view.CliView)
+    assert type(view).__module__ == 'views.reports'
+    assert registry['daily-report'] is view
+
+
+def test_manifest_rescans_changed_modules(view_path, scanned_files):
+    manifest_file = 'manifest.json'
+    registry = src.view.cli_registry.ViewRegistry(view_path, manifest_file)
+    assert sorted(scanned_files) == sorted(
+        os.path.join('views', file_name) for file_name in VIEW_MODULES
+    )
+    with open(manifest_file) as in_file:
+        manifest = json.load(in_file)
+    assert manifest['version'] == src.view.cli_registry.MANIFEST_VERSION
+
+    del scanned_files[:]
+    assert list(src.view.cli_registry.ViewRegistry(
+        view_path, manifest_file
+    )) == list(registry)
+    assert scanned_files == []
+
+    # Same size, so only the modification time shows the change
+    reports_file = os.path.join('views', 'reports.py')
+    write_module('views', 'reports.py', VIEW_MODULES['reports.py'].replace(
+        "'daily-report'", "'dayly-report'"
+    ))
+    stat = os.stat(reports_file)
+    os.utime(reports_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    registry = src.view.cli_registry.ViewRegistry(view_path, manifest_file)
+    assert scanned_files == [reports_file]
+    assert list(registry) == ['report', 'dayly-report', 'noop']
+    assert registry['dayly-report'].get_cli_name() == 'dayly-report'
@@ -0,0 +1,111 @@
+""" Tests of the on-disk cache of cleaned dataset frames """
+import os
+
+import pandas as pd
+import pytest
+
+import src.dataset_cache
+import src.utils
+from tests import helpers
+
+
+@pytest.fixture
+def parsed_files(monkeypatch, tmp_path):
+    """ Turns the dataset cache on, returning list that names of csv files
+    parsed rather than read from it are appended to
+    """
+    monkeypatch.setenv('DATASET_CACHE', 'on')
+    monkeypatch.setenv('DATASET_CACHE_DIR', str(tmp_path / 'dataset_cache'))
+    file_names = []
+    find_suspicious_records = src.utils.find_suspicious_records
+
+    def record_parse(file_name):
+        file_names.append(file_name)
+        return find_suspicious_records(file_name)
+
+    monkeypatch.setattr(src.utils, 'find_suspicious_records', record_parse)
+    return file_names
+
+
+def parse_dataset(monkeypatch, file_name: str) -> pd.DataFrame:
+    """ Returns frame of csv file parsed without the cache """
+    with monkeypatch.context() as context:
+        context.setenv('DATASET_CACHE', 'off')
+        return src.utils.load_df_from_dataset(file_name)
+
+
+def test_cache_hit_matches_parse(monkeypatch, dataset, parsed_files):
+    expected = parse_dataset(monkeypatch, dataset)
+    del parsed_files[:]
+
+    pd.testing.assert_frame_equal(
+        src.utils.load_df_from_dataset(dataset), expected
+    )
+    assert parsed_files == [dataset]
+
+    df = src.utils.load_df_from_dataset(dataset)
+    assert parsed_files == [dataset]
+    pd.testing.assert_frame_equal(df, expected)
+    assert df['color'].dtype == 'category'
+
+    chunks = list(src.utils.iter_df_chunks_from_dataset(dataset, 70))
+    assert parsed_files == [dataset]
+    assert [len(chunk) for chunk in chunks] == [70] * 4 + [len(df) - 280]
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks), expected, check_categorical=False
+    )
+
+
+def test_changed_files_are_parsed_again(tmp_path, dataset, parsed_files):
+    src.utils.load_df_from_dataset(dataset)
+    assert len(parsed_files) == 1
+
+    # Touched but unchanged files keep their entry
+    stat = os.stat(dataset)
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    src.utils.load_df_from_dataset(dataset)
+    assert len(parsed_files) == 1
+
+    # Same size and a new time, but different content
+    with open(dataset, encoding='utf-8') as in_file:
+        text = in_file.read()
+    assert 'James Cameron' in text
+    with open(dataset, 'w', encoding='utf-8') as out_file:
+        out_file.write(text.replace('James Cameron', 'Jamie Cameron', 1))
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+
+    df = src.utils.load_df_from_dataset(dataset)
+    assert len(parsed_files) == 2
+    assert df['director_name'][0] == 'Jamie Cameron'
+
+    changed_dataset = helpers.write_changed_dataset(
+        os.path.join(tmp_path, 'changed.csv')
+    )
+    src.utils.load_df_from_dataset(changed_dataset)
+    assert len(parsed_files) == 3
+    pd.testing.assert_frame_equal(src.utils.load_df_from_dataset(dataset), df)
+    assert len(parsed_files) == 3
+
+
+def test_loads_hash_file_once(monkeypatch, dataset, parsed_files):
+    hashed_files = []
+    get_file_stamp = src.dataset_cache.get_file_stamp
+
+    def record_hash(file_name, with_hash=True):
+        if with_hash:
+            hashed_files.append(file_name)
+        return get_file_stamp(file_name, with_hash)
+
+    monkeypatch.setattr(src.dataset_cache, 'get_file_stamp', record_hash)
+    helpers.load_data(dataset)
+    assert hashed_files == [dataset]
+    assert parsed_files == [dataset]
+
+    # Touched files are hashed to tell whether they changed
+    stat = os.stat(dataset)
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    for argv in [('--full',), ('--full', '--chunk-size', '100')]:
+        del hashed_files[:]
+        helpers.load_data(dataset, *argv)
+        assert hashed_files == [dataset]
+    assert parsed_files == [dataset]
@@ -0,0 +1,101 @@
+""" Tests of engine and session management """
+import concurrent.futures
+import logging
+import threading
+import time
+
+import src.controller.stats
+import src.controller.version
+import src.model.db
+
+
+logger = logging.getLogger(__name__)
+
+#: Number of threads running queries at once
+NUM_THREADS = 8
+
+#: Number of queries each thread runs
+NUM_QUERIES = 20
+
+
+def test_sessions_are_per_thread():
+    barrier = threading.Barrier(NUM_THREADS)
+
+    def get_sessions():
+        # Wait for every thread, so none reuses a finished thread's session
+        barrier.wait()
+        session = src.model.db.EngineWrapper.get_session()
+        same_session = src.model.db.EngineWrapper.get_session() is session
+        engine = src.model.db.EngineWrapper.get_engine()
+        src.model.db.EngineWrapper.remove_session()
+        return session, same_session, engine
+
+    with concurrent.futures.ThreadPoolExecutor(NUM_THREADS) as executor:
+        results = list(executor.map(
+            lambda _: get_sessions(), range(NUM_THREADS)
+        ))
+
+    sessions, same_sessions, engines = zip(*results)
+    assert all(same_sessions)
+    assert len({id(session) for session in sessions}) == NUM_THREADS
+    assert len({id(engine) for engine in engines}) == 1
+
+
+def test_concurrent_queries(loaded_dataset):
+    expected = (
+        src.controller.stats.GenreProfit(logger).query(),
+        src.controller.stats.PersonProfit(logger).query(10),
+    )
+    src.model.db.EngineWrapper.remove_session()
+    assert expected[0]
+
+    def run_queries():
+        try:
+            return [
+                (
+                    src.controller.stats.GenreProfit(logger).query(),
+                    src.controller.stats.PersonProfit(logger).query(10),
+                )
+                for _ in range(NUM_QUERIES)
+            ]
+        finally:
+            src.model.db.EngineWrapper.remove_session()
+
+    # A fresh engine, so threads race to create it
+    src.model.db.EngineWrapper.reset()
+    with concurrent.futures.ThreadPoolExecutor(NUM_THREADS) as executor:
+        futures = [
+            executor.submit(run_queries) for _ in range(NUM_THREADS)
+        ]
+        for future in futures:
+            assert future.result() == [expected] * NUM_QUERIES
+
+
+def test_exclusive_profile_shares_one_connection(monkeypatch, loaded_dataset):
+    monkeypatch.setenv('DB_POOL_SIZE', '4')
+    src.model.db.EngineWrapper.set_profile('bulk-load')
+    engine = src.model.db.EngineWrapper.get_engine()
+    assert engine.pool.size() == 1
+    assert engine.pool._max_overflow == 0
+
+    # A connection that wrote holds the exclusive lock while it's open, so
+    # others wait for it rather than finding the database locked
+    expected = src.controller.stats.PersonProfit(logger).query(10)
+    session = src.model.db.EngineWrapper.get_session()
+    src.controller.version.BumpDataVersion(logger, session=session).execute()
+    session.connection()
+
+    def run_query():
+        try:
+            return src.controller.stats.PersonProfit(logger).query(10)
+        finally:
+            src.model.db.EngineWrapper.remove_session()
+
+    with concurrent.futures.ThreadPoolExecutor(NUM_THREADS) as executor:
+        futures = [
+            executor.submit(run_query) for _ in range(NUM_QUERIES)
+        ]
+        time.sleep(0.1)
+        src.model.db.EngineWrapper.remove_session()
+        for future in futures:
+            assert future.result() == expected
@@ -0,0 +1,83 @@
+""" Tests of category field lookups """
+import logging
+
+import pytest
+
+import src.controller.fields
+import src.controller.movie
+import src.controller.person
+import src.model.db
+import src.model.fields
+import src.model.movie
+import src.model.person
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_sorted_lookup_matches_dict():
+    items = [('drama', 3), ('action', 1), ('comedy', 7), ('biography', 2)]
+    lookup = src.controller.fields.SortedLookup(items)
+
+    assert lookup == dict(items)
+    assert len(lookup) == 4
+    assert list(lookup) == ['action', 'biography', 'comedy', 'drama']
+    assert list(lookup.items()) == sorted(items)
+    assert lookup['comedy'] == 7
+    assert 'western' not in lookup
+    assert lookup.get('western') is None
+    with pytest.raises(KeyError):
+        lookup['western']
+
+
+def test_sorted_lookup_keeps_last_duplicate():
+    items = [('b', 1), ('a', 2), ('b', 3), ('c', 4), ('b', 5), ('a', 6)]
+    lookup = src.controller.fields.SortedLookup(items)
+
+    assert lookup == dict(items)
+    assert list(lookup.items()) == [('a', 6), ('b', 5), ('c', 4)]
+
+
+def test_sorted_lookup_empty_and_unorderable_keys():
+    assert len(src.controller.fields.SortedLookup([])) == 0
+
+    lookup = src.controller.fields.SortedLookup([('a', 1)])
+    assert None not in lookup
+    assert 1 not in lookup
+
+
+def test_movie_key_lookup():
+    items = [
+        (('avatar', '2009.0'), 1), (('avatar', ''), 2),
+        (('spectre', '2015.0'), 3), (('avatar', '2009.0'), 4),
+    ]
+    lookup = src.controller.movie.MovieKeyLookup(items)
+
+    assert lookup == dict(items)
+    assert lookup['avatar', '2009.0'] == 4
+    assert ('avatar', '2015.0') not in lookup
+    assert ('avatar',) not in lookup
+    assert set(lookup) == {
+        ('avatar', '2009.0'), ('avatar', ''), ('spectre', '2015.0')
+    }
+
+
+def test_index_lookups_match_records(loaded_dataset):
+    session = src.model.db.EngineWrapper.get_session()
+    genre_lookup = src.controller.fields.GenreIndexLookup(logger).query()
+    person_lookup = src.controller.person.PersonIndexLookup(logger).query()
+    movie_lookup = src.controller.movie.MovieLookupIndex(logger).query()
+
+    assert genre_lookup == {
+        record.name.lower(): record.pk
+        for record in session.query(src.model.fields.Genre)
+    }
+    assert person_lookup == {
+        record.name.lower(): record.pk
+        for record in session.query(src.model.person.Person)
+    }
+    assert movie_lookup == {
+        (record.movie_title.lower(), record.title_year): record.pk
+        for record in session.query(src.model.movie.Movie)
+    }
+    src.model.db.EngineWrapper.remove_session()
@@ -0,0 +1,37 @@
+""" Tests of dataset record normalization """
+import os
+
+import pandas as pd
+import pytest
+
+import src.utils
+import src.view.ingest
+from tests import helpers
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_split_normalization_matches_whole(dataset, workers):
+    data = src.utils.load_df_from_dataset(dataset)
+    expected = src.view.ingest.normalize_records(data)
+
+    shards = src.view.ingest.split_frame(data, 7)
+    assert len(shards) == 7
+    records = pd.concat(
+        src.view.ingest.iter_normalized_records(shards, workers)
+    )
+    pd.testing.assert_frame_equal(records, expected)
+
+
+@pytest.mark.parametrize('argv', [
+    ('--workers', '3'),
+    ('--workers', '2', '--chunk-size', '40'),
+])
+def test_worker_loads_match_single_process(
+        monkeypatch, tmp_path, dataset, argv
+):
+    helpers.load_data(dataset)
+    expected = helpers.get_rankings()
+
+    helpers.use_database(monkeypatch, os.path.join(tmp_path, 'workers.sqlite'))
+    helpers.load_data(dataset, *argv)
+    assert helpers.get_rankings() == expected
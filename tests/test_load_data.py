@@ -0,0 +1,85 @@
+""" Tests of load-data """
+import os
+
+import src.controller.stats
+import src.controller.version
+import src.model.db
+import src.model.stats
+import src.view.cli.load_data
+from tests import helpers
+
+
+def get_version_stamp():
+    """ Returns current data version stamp """
+    stamp = src.controller.version.CurrentDataVersion(
+        src.view.cli.load_data.logger
+    ).query()
+    src.model.db.EngineWrapper.remove_session()
+    return stamp
+
+
+def test_delta_load_matches_full_load(monkeypatch, tmp_path, dataset):
+    avatar_line = helpers.read_dataset_lines(1)[1]
+    assert 'Action|Adventure|Fantasy|Sci-Fi' in avatar_line
+    changed_dataset = helpers.write_changed_dataset(
+        os.path.join(tmp_path, 'changed.csv')
+    )
+
+    helpers.load_data(dataset)
+    helpers.load_data(changed_dataset)
+    delta_rankings = helpers.get_rankings()
+
+    helpers.use_database(monkeypatch, os.path.join(tmp_path, 'full.sqlite'))
+    helpers.load_data(changed_dataset)
+    full_rankings = helpers.get_rankings()
+
+    assert delta_rankings == full_rankings
+    assert 'fantasy' in delta_rankings['genre']
+
+
+def test_unchanged_load_keeps_data_version(tmp_path, dataset):
+    lines = helpers.read_dataset_lines()[1:]
+    duplicated_dataset = helpers.write_dataset(
+        os.path.join(tmp_path, 'duplicated.csv'), lines + [lines[5]]
+    )
+    changed_dataset = helpers.write_changed_dataset(
+        os.path.join(tmp_path, 'changed.csv')
+    )
+
+    helpers.load_data(dataset)
+    stamp = get_version_stamp()
+    assert stamp is not None
+
+    helpers.load_data(dataset, '--full')
+    assert get_version_stamp() == stamp
+    helpers.load_data(duplicated_dataset)
+    assert get_version_stamp() == stamp
+
+    helpers.load_data(changed_dataset)
+    assert get_version_stamp() != stamp
+
+
+def has_genre_summary() -> bool:
+    """ Returns whether genre profit summary has rows, in a fresh session """
+    result = src.controller.stats.HasProfitSummary(
+        src.view.cli.load_data.logger
+    ).query(src.model.stats.GenreProfitSummary)
+    src.model.db.EngineWrapper.remove_session()
+    return result
+
+
+def test_emptied_summaries_are_noticed(tmp_path, dataset):
+    empty_dataset = helpers.write_dataset(
+        os.path.join(tmp_path, 'empty.csv'), []
+    )
+    helpers.load_data(dataset)
+    rankings = helpers.get_rankings()
+    assert has_genre_summary()
+
+    helpers.load_data(empty_dataset, '--delete-missing')
+    assert not has_genre_summary()
+    assert helpers.get_rankings()['genre'] == {}
+
+    helpers.load_data(dataset)
+    assert has_genre_summary()
+    assert helpers.get_rankings() == rankings
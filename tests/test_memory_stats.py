@@ -0,0 +1,59 @@
+""" Tests of the in-memory ranking engine """
+import logging
+import os
+
+import pytest
+
+import src.controller.memory_stats
+import src.controller.stats
+import src.model.db
+from tests import helpers
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_rankings(genre_class, person_class, limit=None):
+    """ Returns genre and person rankings of action classes """
+    rankings = (
+        genre_class(logger).query(limit),
+        person_class(logger).query(limit),
+    )
+    src.model.db.EngineWrapper.remove_session()
+    return rankings
+
+
+def assert_rankings_match(limit=None):
+    """ Asserts memory rankings hold the sql rankings' groups, in the same
+    order, with the same averages
+    """
+    sql_rankings = get_rankings(
+        src.controller.stats.GenreProfit, src.controller.stats.PersonProfit,
+        limit
+    )
+    memory_rankings = get_rankings(
+        src.controller.memory_stats.MemoryGenreProfit,
+        src.controller.memory_stats.MemoryPersonProfit, limit
+    )
+    for sql_ranking, memory_ranking in zip(sql_rankings, memory_rankings):
+        assert sql_ranking
+        assert list(memory_ranking) == list(sql_ranking)
+        assert list(memory_ranking.values()) == pytest.approx(
+            list(sql_ranking.values())
+        )
+    return sql_rankings
+
+
+def test_memory_rankings_match_sql(loaded_dataset):
+    assert_rankings_match()
+    assert_rankings_match(limit=5)
+
+
+def test_memory_rankings_follow_loads(tmp_path, loaded_dataset):
+    rankings = assert_rankings_match()
+    helpers.load_data(helpers.write_changed_dataset(
+        os.path.join(tmp_path, 'changed.csv')
+    ))
+
+    changed_rankings = assert_rankings_match()
+    assert changed_rankings[0]['fantasy'] != rankings[0]['fantasy']
@@ -0,0 +1,110 @@
+""" Tests of action and stage instrumentation """
+import logging
+import tracemalloc
+
+import pytest
+import sqlalchemy
+
+import src.controller.stats
+import src.model.common
+import src.model.db
+import src.model.movie
+import src.profiling
+from tests import helpers
+
+
+logger = logging.getLogger(__name__)
+
+#: Bytes allocated in the test stages
+ALLOCATION_SIZE = 1 << 22
+
+
+@pytest.fixture
+def profiler():
+    """ Returns the process profiler, disabled again after the test """
+    yield src.profiling.profiler
+    src.profiling.profiler.disable()
+    src.profiling.profiler.reset()
+
+
+def count_rows(table: sqlalchemy.Table) -> int:
+    """ Returns number of rows in table """
+    session = src.model.db.EngineWrapper.get_session()
+    count = session.execute(
+        sqlalchemy.select(sqlalchemy.func.count()).select_from(table)
+    ).scalar()
+    src.model.db.EngineWrapper.remove_session()
+    return count
+
+
+def test_actions_record_statements_and_rows(profiler, dataset):
+    profiler.enable()
+    helpers.load_data(dataset)
+    result = src.controller.stats.GenreProfit(logger).query()
+    src.model.db.EngineWrapper.remove_session()
+    profiler.disable()
+    src.controller.stats.GenreProfit(logger).query()
+
+    summary = profiler.get_summary()
+    actions = summary['actions']
+    assert actions['GenreProfit.query']['calls'] == 1
+    assert actions['GenreProfit.query']['rows_returned'] == len(result)
+    assert actions['GenreProfit.query']['statements'] >= 1
+
+    assert actions['BulkAddMovies.execute']['rows_written'] == count_rows(
+        src.model.movie.Movie.__table__
+    )
+    assert actions['BulkAttachMovieGenres.execute']['rows_written'] == (
+        count_rows(src.model.common.movie_genres)
+    )
+    assert summary['statements'] >= sum(
+        stats['statements'] for name, stats in actions.items()
+        if name != 'GenreProfit.query'
+    )
+    assert list(summary['stages'])[0] == 'check file'
+    assert 'BulkAddMovies.execute' in profiler.format_summary(summary)
+
+
+def test_stages_record_calls_and_peaks(profiler):
+    profiler.enable(trace_memory=True)
+    with profiler.stage('outer'):
+        with profiler.stage('small'):
+            pass
+        with profiler.stage('large'):
+            data = bytearray(ALLOCATION_SIZE)
+            del data
+    items = list(src.profiling.iter_stage('items', range(3)))
+    profiler.disable()
+    assert not tracemalloc.is_tracing()
+
+    stages = profiler.get_summary()['stages']
+    assert items == [0, 1, 2]
+    assert list(stages) == ['small', 'large', 'outer', 'items']
+    assert stages['items']['calls'] == 4
+    assert stages['small']['peak_memory'] < ALLOCATION_SIZE
+    assert stages['large']['peak_memory'] >= ALLOCATION_SIZE
+    assert stages['outer']['peak_memory'] >= ALLOCATION_SIZE
+
+
+def test_stage_peaks_without_reset(monkeypatch, profiler):
+    # Python before 3.9 can't reset peaks, so later stages include earlier
+    # ones
+    monkeypatch.delattr(tracemalloc, 'reset_peak')
+    profiler.enable(trace_memory=True)
+    with profiler.stage('large'):
+        data = bytearray(ALLOCATION_SIZE)
+        del data
+    with profiler.stage('small'):
+        pass
+    profiler.disable()
+
+    stages = profiler.get_summary()['stages']
+    assert stages['large']['peak_memory'] >= ALLOCATION_SIZE
+    assert stages['small']['peak_memory'] >= ALLOCATION_SIZE
+
+
+def test_disabled_stages_record_nothing(profiler):
+    with src.profiling.stage('ignored'):
+        pass
+    assert list(src.profiling.iter_stage('ignored', range(2))) == [0, 1]
+    assert profiler.get_summary()['stages'] == {}
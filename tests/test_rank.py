@@ -0,0 +1,118 @@
+""" Tests of generic group rankings """
+import collections
+import logging
+import statistics
+
+import pytest
+import sqlalchemy
+
+import src.controller.rank
+import src.model.common
+import src.model.db
+import src.model.fields
+import src.model.movie
+
+
+logger = logging.getLogger(__name__)
+
+#: Python aggregates of a group's values, to check the sql ones against
+AGGREGATE_FUNCTIONS = {
+    'avg': statistics.mean,
+    'count': len,
+    'median': statistics.median,
+    'sum': sum,
+}
+
+
+def get_group_values(dimension: str, metric: str):
+    """ Returns map of group name to values of movie metric column, for
+    country and genre dimensions
+    """
+    movie_table = src.model.movie.Movie.__table__
+    value_column = movie_table.c[metric]
+    if dimension == 'country':
+        name_table = src.model.fields.Country.__table__
+        select = sqlalchemy.select(name_table.c.name, value_column).join_from(
+            movie_table, name_table,
+            name_table.c.pk == movie_table.c.country_pk
+        )
+    else:
+        genre_table = src.model.fields.Genre.__table__
+        movie_genres = src.model.common.movie_genres
+        select = sqlalchemy.select(genre_table.c.name, value_column).join_from(
+            movie_genres, movie_table,
+            movie_table.c.pk == movie_genres.c.movie_pk
+        ).join(genre_table, genre_table.c.pk == movie_genres.c.genre_pk)
+
+    session = src.model.db.EngineWrapper.get_session()
+    group_values = collections.defaultdict(list)
+    for name, value in session.execute(select.where(value_column.isnot(None))):
+        group_values[name].append(value)
+    src.model.db.EngineWrapper.remove_session()
+    return group_values
+
+
+def query_rank(*args, **kwargs):
+    """ Returns GroupRank result, in a fresh session """
+    result = src.controller.rank.GroupRank(logger).query(*args, **kwargs)
+    src.model.db.EngineWrapper.remove_session()
+    return result
+
+
+@pytest.mark.parametrize('dimension, metric', [
+    ('country', 'imdb_score'),
+    ('genre', 'duration'),
+])
+@pytest.mark.parametrize('aggregate', sorted(AGGREGATE_FUNCTIONS))
+def test_aggregates_match_python(loaded_dataset, dimension, metric, aggregate):
+    group_values = get_group_values(dimension, metric)
+    expected = {
+        name: AGGREGATE_FUNCTIONS[aggregate](values)
+        for name, values in group_values.items()
+    }
+
+    result = query_rank(dimension, metric, aggregate)
+    assert result == pytest.approx(expected)
+    assert list(result.values()) == sorted(result.values(), reverse=True)
+
+
+def test_median_of_odd_and_even_groups(loaded_dataset):
+    group_values = get_group_values('genre', 'duration')
+    result = query_rank('genre', 'duration', 'median')
+
+    counts = {len(values) % 2 for values in group_values.values()}
+    assert counts == {0, 1}
+    for name, values in group_values.items():
+        values = sorted(values)
+        middle = len(values) // 2
+        if len(values) % 2:
+            assert result[name] == values[middle]
+        else:
+            assert result[name] == pytest.approx(
+                (values[middle - 1] + values[middle]) / 2
+            )
+
+
+def test_min_count_and_limit(loaded_dataset):
+    group_values = get_group_values('country', 'imdb_score')
+    result = query_rank('country', 'imdb_score', 'median', min_count=5)
+    assert set(result) == {
+        name for name, values in group_values.items() if len(values) >= 5
+    }
+
+    limited = query_rank('country', 'imdb_score', 'median', 5, 3)
+    assert list(limited.items()) == list(result.items())[:3]
+
+
+def test_year_groups_skip_missing_years(loaded_dataset):
+    session = src.model.db.EngineWrapper.get_session()
+    movie_table = src.model.movie.Movie.__table__
+    years = set(session.execute(sqlalchemy.select(
+        movie_table.c.title_year
+    ).where(movie_table.c.imdb_score.isnot(None))).scalars())
+    src.model.db.EngineWrapper.remove_session()
+    assert '' in years
+
+    for aggregate in sorted(AGGREGATE_FUNCTIONS):
+        result = query_rank('year', 'imdb_score', aggregate)
+        assert set(result) == years - {''}
@@ -0,0 +1,103 @@
+""" Tests of the rest server, over a socket """
+import asyncio
+import http.client
+import json
+import logging
+import socket
+import threading
+import urllib.parse
+
+import pytest
+
+import src.controller.stats
+import src.model.db
+from src.view import rest_server
+
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def server_port(loaded_dataset) -> int:
+    """ Returns port of a rest server with every rest view, running on a
+    background thread until the test ends
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = rest_server.RestServer(rest_server.load_rest_views(), 2)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve('127.0.0.1', port))
+
+    def run_server():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run_server)
+    thread.start()
+
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            break
+        except ConnectionRefusedError:
+            thread.join(0.05)
+
+    yield port
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+
+
+def get_json(connection: http.client.HTTPConnection, target: str):
+    """ Returns status and decoded response of a GET request """
+    connection.request('GET', target)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_requests_on_one_connection(server_port):
+    expected = src.controller.stats.GenreProfit(logger).query(limit=3)
+    src.model.db.EngineWrapper.remove_session()
+
+    connection = http.client.HTTPConnection('127.0.0.1', server_port, 5)
+    try:
+        status, data = get_json(connection, '/rank-genre?limit=3')
+        assert status == 200
+        assert [
+            (genre['name'], genre['average_profit'])
+            for genre in data['genres']
+        ] == list(expected.items())
+
+        status, data = get_json(connection, '/movie?title=avatar&year=2009')
+        assert status == 200
+        assert len(data['movies']) == 1
+        movie = data['movies'][0]
+        assert movie['movie_title'] == 'Avatar'
+        assert movie['title_year'] == 2009
+        assert 'pk' not in movie
+
+        status, data = get_json(connection, '/movie?title=avatar&year=x')
+        assert status == 400
+        assert 'year' in data['error']
+
+        status, data = get_json(connection, '/missing')
+        assert status == 404
+        assert '/movie' in data['paths']
+    finally:
+        connection.close()
+
+
+def test_movies_without_year(server_port):
+    connection = http.client.HTTPConnection('127.0.0.1', server_port, 5)
+    try:
+        status, data = get_json(connection, '/movie?' + urllib.parse.urlencode(
+            {'title': 'Star Wars: Episode VII - The Force Awakens'}
+        ))
+    finally:
+        connection.close()
+    assert status == 200
+    assert [movie['title_year'] for movie in data['movies']] == [None]
@@ -0,0 +1,61 @@
+""" Tests of schema maintenance on databases from older versions """
+import logging
+
+import sqlalchemy
+
+import src.controller.rank
+import src.controller.schema
+import src.controller.stats
+import src.model.db
+import src.model.stats
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_profit_rankings():
+    """ Returns genre and person profit rankings, from the rank actions and
+    the generic group rank
+    """
+    rankings = (
+        src.controller.stats.GenreProfit(logger).query(),
+        src.controller.stats.PersonProfit(logger).query(),
+        src.controller.rank.GroupRank(logger).query('genre'),
+        src.controller.rank.GroupRank(logger).query('person', aggregate='sum'),
+    )
+    src.model.db.EngineWrapper.remove_session()
+    return rankings
+
+
+def drop_summary_tables():
+    """ Drops profit summary tables, as in databases loaded before them """
+    engine = src.model.db.EngineWrapper.get_engine()
+    with engine.begin() as connection:
+        for summary_class in (
+                src.model.stats.GenreProfitSummary,
+                src.model.stats.PersonProfitSummary,
+        ):
+            summary_class.__table__.drop(connection)
+    src.model.db.EngineWrapper.reset()
+
+
+def test_rankings_without_summary_tables(loaded_dataset):
+    drop_summary_tables()
+    aggregated_rankings = get_profit_rankings()
+    assert aggregated_rankings[0]
+
+    src.controller.schema.CreateMissingIndexes(logger).execute()
+    assert get_profit_rankings() == aggregated_rankings
+
+    rebuilt = src.controller.schema.FillEmptyProfitSummaries(logger).execute()
+    assert rebuilt == ['genre_profit', 'person_profit']
+    assert src.controller.schema.FillEmptyProfitSummaries(
+        logger
+    ).execute() == []
+
+    session = src.model.db.EngineWrapper.get_session()
+    assert session.execute(sqlalchemy.select(
+        sqlalchemy.func.count()
+    ).select_from(src.model.stats.GenreProfitSummary.__table__)).scalar()
+    src.model.db.EngineWrapper.remove_session()
+    assert get_profit_rankings() == aggregated_rankings
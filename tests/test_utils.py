@@ -0,0 +1,110 @@
+""" Tests of data set loading and previews """
+import csv
+import os
+
+import pandas as pd
+import pytest
+
+import src.utils
+from tests import helpers
+
+
+#: Number of records of the preview data set
+NUM_RECORDS = 20
+
+
+def write_rows(file_name: str, rows) -> str:
+    """ Writes csv rows, returning file name """
+    with open(file_name, 'w', encoding='utf-8', newline='') as out_file:
+        csv.writer(out_file, lineterminator='\n').writerows(rows)
+    return file_name
+
+
+def get_multiline_rows():
+    """ Returns rows of the bundled data set's header and first records,
+    with line breaks in a quoted title and a record with an extra field
+    """
+    rows = list(csv.reader(helpers.read_dataset_lines(NUM_RECORDS)))
+    title_index = rows[0].index('movie_title')
+    rows[3][title_index] = 'Multi\nLine "Quoted"\nTitle'
+    rows[7][-1] = 'extra'
+    return rows
+
+
+@pytest.fixture
+def multiline_dataset(tmp_path) -> str:
+    """ Returns name of csv of get_multiline_rows() """
+    return write_rows(
+        os.path.join(tmp_path, 'multiline.csv'), get_multiline_rows()
+    )
+
+
+def assert_frames_equal(df, expected):
+    """ Asserts frames have the same index and titles """
+    assert df.index.tolist() == expected.index.tolist()
+    assert df['movie_title'].tolist() == expected['movie_title'].tolist()
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1 << 16])
+def test_previews_count_records(monkeypatch, multiline_dataset, block_size):
+    df = src.utils.load_df_from_dataset(multiline_dataset)
+    assert 'Multi\nLine "Quoted"\nTitle' in df['movie_title'].tolist()
+    assert 6 not in df.index
+
+    monkeypatch.setattr(src.utils, 'PREVIEW_BLOCK_SIZE', block_size)
+    for offset in range(NUM_RECORDS + 2):
+        assert_frames_equal(
+            src.utils.load_df_preview(multiline_dataset, 4, offset),
+            df[(df.index >= offset) & (df.index < offset + 4)]
+        )
+
+    for num_records in range(NUM_RECORDS + 2):
+        tail = src.utils.load_df_tail_preview(multiline_dataset, num_records)
+        tail.index += NUM_RECORDS
+        assert_frames_equal(tail, df[df.index >= NUM_RECORDS - num_records])
+
+
+def test_chunks_count_records(multiline_dataset):
+    df = src.utils.load_df_from_dataset(multiline_dataset)
+    chunks = list(src.utils.iter_df_chunks_from_dataset(multiline_dataset, 4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 4, 4, 3]
+    for chunk in chunks:
+        assert_frames_equal(chunk, df.loc[chunk.index])
+    assert [
+        record_id for chunk in chunks for record_id in chunk.index
+    ] == df.index.tolist()
+
+
+def test_text_in_number_columns_is_missing(
+        caplog, tmp_path, multiline_dataset
+):
+    expected = src.utils.load_df_from_dataset(multiline_dataset)
+    rows = get_multiline_rows()
+    duration_index = rows[0].index('duration')
+    rows[15][duration_index] = 'ninety'
+    file_name = write_rows(os.path.join(tmp_path, 'text.csv'), rows)
+    expected.loc[14, 'duration'] = float('nan')
+
+    df = src.utils.load_df_from_dataset(file_name)
+    pd.testing.assert_frame_equal(df, expected)
+    assert (
+        'Record #14 has "ninety" for number column "duration"' in caplog.text
+    )
+
+    # The chunk with the text is read again, after those before it
+    chunks = list(src.utils.iter_df_chunks_from_dataset(file_name, 4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 4, 4, 3]
+    assert caplog.text.count('Reading numbers as text') == 2
+
+    # Chunks have their own categories, which concat drops
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks).astype(expected.dtypes.to_dict()), expected
+    )
+
+    preview = src.utils.load_df_preview(file_name, 3, 13)
+    assert len(preview.columns) == len(rows[0]) - 1
+    assert preview['duration'].dtype == 'float64'
+    assert preview['duration'].isna().tolist() == [False, True, False]
+    assert preview['movie_facebook_likes'].tolist() == (
+        expected.loc[[13, 14, 15], 'movie_facebook_likes'].tolist()
+    )